@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark local file scanning
+
+Compares `sp_tool.tool.file_lister.list_files` with the previous
+`os.walk`/`fnmatch` implementation on a synthetic tree. The tree has
+`.git` and `node_modules` directories (excluded, as in a typical publish)
+next to the content that is published.
+
+    python benchmarks/bench_file_lister.py --files 500000
+"""
+import argparse
+import fnmatch
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "src"))
+
+from sp_tool.tool.file_lister import iter_files, list_files  # noqa: E402
+
+INCLUDE = ["*.html", "*.css", "*.js", "*.png", "*.txt"]
+EXCLUDE = ["*.tmp", "*.bak", "~*"]
+EXCLUDE_DIRS = [".git", "node_modules", "__pycache__"]
+EXTENSIONS = [".html", ".css", ".js", ".png", ".txt", ".tmp", ".bak", ".md"]
+
+
+def legacy_list_files(directory, recurse=False, include=None, exclude=None,
+                      include_dirs=None, exclude_dirs=None):
+    """ Previous implementation (os.walk + fnmatch per glob) """
+    # pylint: disable=too-many-arguments,unused-argument
+    def matches_one_of(file, globs):
+        for glob in globs:
+            if fnmatch.fnmatch(file, glob):
+                return True
+        return False
+
+    include = include or ['*']
+    exclude = exclude or []
+    exclude_dirs = exclude_dirs or []
+    src_dir = directory.rstrip('/')
+    files = []
+    for root, _folders, local_files in os.walk(src_dir):
+        if not recurse and root != src_dir:
+            continue
+        if any(matches_one_of(path, exclude_dirs)
+               for path in root.split('/')):
+            continue
+        files += [f"{root}/{file}" for file in local_files
+                  if matches_one_of(file, include) and
+                  not matches_one_of(file, exclude)]
+    return files
+
+
+def make_tree(root, no_files, per_dir=100, excluded_share=0.3):
+    """ Create synthetic tree of about `no_files` empty files """
+    excluded = int(no_files * excluded_share)
+    layout = [("site", no_files - excluded),
+              (".git/objects", excluded // 2),
+              ("node_modules/pkg", excluded - excluded // 2)]
+    for base, count in layout:
+        for index in range(count):
+            directory = os.path.join(root, base, f"d{index // per_dir // 10}",
+                                     f"s{index // per_dir}")
+            if index % per_dir == 0:
+                os.makedirs(directory, exist_ok=True)
+            ext = EXTENSIONS[index % len(EXTENSIONS)]
+            with open(os.path.join(directory, f"f{index}{ext}"), 'w'):
+                pass
+
+
+def timed(func, *args, **kwargs):
+    """ Run func, return (seconds, result) """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    """ Run benchmark """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=500000,
+                        help="number of files in the synthetic tree")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per implementation (best is reported)")
+    parser.add_argument("--dir", default=None,
+                        help="existing tree to scan instead of a synthetic "
+                             "one")
+    args = parser.parse_args()
+
+    root = args.dir
+    if root is None:
+        root = tempfile.mkdtemp(prefix="sp-tool-bench-")
+        print(f"Creating {args.files} files in {root} ...", flush=True)
+        make_tree(root, args.files)
+    options = dict(recurse=True, include=INCLUDE, exclude=EXCLUDE,
+                   exclude_dirs=EXCLUDE_DIRS)
+    try:
+        results = {}
+        for name, func in (("os.walk + fnmatch", legacy_list_files),
+                           ("scandir + regex", list_files)):
+            runs = [timed(func, root, **options)
+                    for _ in range(args.repeat)]
+            results[name] = min(runs, key=lambda run: run[0])
+            print(f"{name:20} {results[name][0]:8.3f}s "
+                  f"{len(results[name][1])} files", flush=True)
+        first, _ = timed(lambda: next(iter_files(root, **options), None))
+        print(f"{'first file after':20} {first:8.5f}s")
+        legacy, current = results.values()
+        if sorted(legacy[1]) != sorted(current[1]):
+            print("WARNING: implementations returned different files")
+        print(f"speedup: {legacy[0] / current[0]:.1f}x")
+    finally:
+        if args.dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark folder listing throughput per OData metadata mode
+
+Runs the mock SharePoint server from `src/tests/mock_sharepoint.py` on a
+local port with a folder of `--items` files, and lists it with connectors
+set to `metadata="verbose"`, `"minimal"` and `"nometadata"`: file names
+only (`iter_items` with `$select=Name`, as `list_files` does) and compact
+file items (`file_index`). Each mode is run with the stdlib JSON decoder
+and with orjson if it is installed. Bytes received per listing are
+reported as well, since on a real tenant transfer time grows with them.
+
+The mock server encodes its responses in the same process, so the times
+include server side work, and it adds less per-item metadata than a tenant
+does, so differences between modes are smaller than on a tenant. Compare
+modes and decoders with each other rather than with a tenant.
+
+    python benchmarks/bench_listing.py --items 20000 --page-size 5000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "src"))
+
+from sp_tool.sharepoint import utils  # noqa: E402
+from sp_tool.sharepoint.connector import NAME_FIELDS  # noqa: E402
+from sp_tool.sharepoint.metrics import RequestMetrics  # noqa: E402
+from tests.mock_sharepoint import MockSharepointServer, LIBRARY  # noqa: E402
+
+MODES = ("verbose", "minimal", "nometadata")
+FOLDER = f"{LIBRARY}/listing"
+
+
+def listing_calls(sharepoint, page_size):
+    """ Listing calls to measure, by name """
+    return {
+        "names": lambda: list(sharepoint.iter_items(
+            FOLDER, "File", select=NAME_FIELDS, page_size=page_size)),
+        "file_index": lambda: sharepoint.file_index(FOLDER,
+                                                    page_size=page_size),
+    }
+
+
+def run(call, repeat):
+    """ Best time of `repeat` runs, and number of items listed """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = call()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(items)
+
+
+def bench_mode(server, mode, decoders, args):
+    """ Run listing calls of one metadata mode with each decoder """
+    sharepoint = server.connector(metadata=mode)
+    metrics = RequestMetrics()
+    sharepoint.hooks.add_collector(metrics)
+    try:
+        sharepoint.auth.access_token  # pylint: disable=pointless-statement
+        for call_name, call in listing_calls(sharepoint,
+                                             args.page_size).items():
+            for name, decoder in decoders:
+                utils.orjson = decoder
+                received = metrics.summary()["totals"]["bytes_received"]
+                seconds, count = run(call, args.repeat)
+                size = (metrics.summary()["totals"]["bytes_received"] -
+                        received) / args.repeat / 1024 / 1024
+                print(f"{mode:12} {call_name:10} {size:8.1f} {name:8} "
+                      f"{seconds:8.3f} {count / seconds:10.0f}", flush=True)
+    finally:
+        sharepoint.close()
+
+
+def main():
+    """ Run benchmark """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=20000,
+                        help="files in the listed folder")
+    parser.add_argument("--page-size", type=int, default=5000,
+                        help="items per listing page")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every server response")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    decoders = [("json", None)]
+    if utils.orjson is not None:
+        decoders.append(("orjson", utils.orjson))
+    saved = utils.orjson
+    print(f"{'mode':12} {'call':10} {'MiB':>8} {'decoder':8} "
+          f"{'seconds':>8} {'items/s':>10}")
+    with MockSharepointServer(latency=args.latency) as server:
+        root = f"{server.mock.site_uri}/{FOLDER}"
+        server.library.add_folder(root)
+        for index in range(args.items):
+            server.library.put_file(f"{root}/document-{index:06d}.pdf",
+                                    b"")
+        try:
+            for mode in MODES:
+                bench_mode(server, mode, decoders, args)
+        finally:
+            utils.orjson = saved
+
+
+if __name__ == '__main__':
+    main()
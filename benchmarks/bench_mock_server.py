@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark publish, listing and authentication against a local server
+
+Runs the mock SharePoint server from `src/tests/mock_sharepoint.py` on a
+local port, so no tenant or network access is needed, and measures:
+
+* auth: time from creating a connector to the first successful call
+  (realm discovery and token request), without and with an auth cache
+* publish: files/s and MiB/s of `sp-tool publish` for a generated tree
+* listing: latency of listing a large folder with the different listing
+  calls (`list_files`, `file_index`, `iter_library`, `walk`)
+
+The server adds `--latency` seconds to every response to model the round
+trip to a tenant, and can throttle (`--throttle`) to exercise retries.
+
+    python benchmarks/bench_mock_server.py --files 500 --jobs 8
+    python benchmarks/bench_mock_server.py --only listing --items 20000
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "src"))
+
+from sp_tool.tool.sp_tool import SharepointTool  # noqa: E402
+from tests.mock_sharepoint import MockSharepointServer, LIBRARY  # noqa: E402
+
+BENCHMARKS = ("auth", "publish", "listing")
+MIB = 1024 * 1024
+
+
+def timed(func, *args, **kwargs):
+    """ Call function, return (seconds, result) """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def bench_auth(server, args):
+    """ Connector startup: discovery, token and first call """
+    results = {}
+    cache_dir = tempfile.mkdtemp(prefix="sp-bench-auth-")
+    try:
+        cache = os.path.join(cache_dir, "auth.json")
+        for name, options in (("cold", {}), ("cache-fill", {
+                "auth_cache": cache}), ("cached", {"auth_cache": cache})):
+            best = None
+            for _ in range(args.repeat if name != "cache-fill" else 1):
+                sharepoint = server.connector(**options)
+                seconds, connected = timed(lambda: sharepoint.connected)
+                sharepoint.close()
+                if not connected:
+                    raise Exception("Connection to mock server failed")
+                best = seconds if best is None else min(best, seconds)
+            results[name] = {"seconds": best}
+            print(f"auth {name:10} {best * 1000:10.1f} ms", flush=True)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+def make_tree(root, files, size, per_folder):
+    """ Generate `files` files of `size` bytes, `per_folder` per folder """
+    content = os.urandom(size)
+    for index in range(files):
+        folder = os.path.join(root, f"dir{index // per_folder:04d}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"file{index:06d}.bin"), "wb") as out:
+            out.write(content)
+
+
+def bench_publish(server, args):
+    """ Throughput of `sp-tool publish` """
+    results = {}
+    source = tempfile.mkdtemp(prefix="sp-bench-publish-")
+    try:
+        make_tree(source, args.files, args.size, args.per_folder)
+        total = args.files * args.size / MIB
+        for jobs in sorted({1, args.jobs}):
+            options = server.connector_options()
+            tool = SharepointTool(
+                tenant=options["tenant"], client_id=options["client_id"],
+                secret=options["client_secret"], site=options["site_name"],
+                base_url=options["base_url"], auth_url=options["auth_url"],
+                source_dir=source, path=f"bench-{jobs}", jobs=jobs,
+                retries=args.retries, hash_cache="", debug=False)
+            seconds, code = timed(tool.publish)
+            if code != 0:
+                raise Exception(f"Publish failed with exit code {code}")
+            results[f"jobs={jobs}"] = {
+                "seconds": seconds, "files_per_second": args.files / seconds,
+                "mib_per_second": total / seconds}
+            print(f"publish jobs={jobs:<4} {args.files:7} files "
+                  f"{total:8.1f} MiB {seconds:8.2f} s "
+                  f"{args.files / seconds:8.1f} files/s "
+                  f"{total / seconds:8.2f} MiB/s", flush=True)
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+    return results
+
+
+def bench_listing(server, args):
+    """ Latency of listing a large folder """
+    folder = f"{LIBRARY}/large"
+    root = f"{server.mock.site_uri}/{folder}"
+    server.library.add_folder(root)
+    for index in range(args.items):
+        server.library.put_file(f"{root}/document-{index:06d}.pdf", b"")
+    sharepoint = server.connector(metadata=args.metadata)
+    calls = {
+        "list_files": lambda: sharepoint.list_files(folder),
+        "file_index": lambda: sharepoint.file_index(folder),
+        "iter_library": lambda: list(sharepoint.iter_library(folder)),
+        "walk": lambda: list(sharepoint.walk(folder)),
+    }
+    results = {}
+    try:
+        sharepoint.auth.access_token  # pylint: disable=pointless-statement
+        for name, call in calls.items():
+            best = None
+            for _ in range(args.repeat):
+                sharepoint.invalidate()
+                seconds, _ = timed(call)
+                best = seconds if best is None else min(best, seconds)
+            results[name] = {"seconds": best, "items": args.items}
+            print(f"listing {name:12} {args.items:7} items "
+                  f"{best * 1000:10.1f} ms", flush=True)
+    finally:
+        sharepoint.close()
+    return results
+
+
+def main():
+    """ Run benchmarks """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", choices=BENCHMARKS, action="append",
+                        help="benchmark to run (repeatable, default: all)")
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="seconds added to every server response")
+    parser.add_argument("--throttle", type=float, default=0.0,
+                        help="share of API requests answered with 429")
+    parser.add_argument("--retries", type=int, default=5,
+                        help="retries of throttled requests")
+    parser.add_argument("--files", type=int, default=200,
+                        help="files to publish")
+    parser.add_argument("--size", type=int, default=64 * 1024,
+                        help="bytes per published file")
+    parser.add_argument("--per-folder", type=int, default=50,
+                        help="published files per folder")
+    parser.add_argument("--jobs", type=int, default=8,
+                        help="parallel uploads (compared to 1)")
+    parser.add_argument("--items", type=int, default=10000,
+                        help="files in the listed folder")
+    parser.add_argument("--metadata", default="nometadata",
+                        help="OData metadata mode used for listings")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per measurement (best is reported)")
+    parser.add_argument("--json", metavar="FILE",
+                        help="also write results to FILE as JSON")
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    results = {}
+    with MockSharepointServer(latency=args.latency,
+                              throttle_rate=args.throttle,
+                              retry_after=0) as server:
+        for name in args.only or BENCHMARKS:
+            results[name] = globals()[f"bench_{name}"](server, args)
+        results["server"] = dict(server.mock.stats)
+    print(f"server: {json.dumps(results['server'])}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -41,6 +41,10 @@ PKG_INFO.update({
     'package_dir': {'': 'src'},
     'package_data': {'': ['/package.cfg*']},
     'install_requires': [req.strip() for req in requirements if not req.startswith('#')],
+    'extras_require': {
+        'async': ['aiohttp'],
+        'fast': ['orjson'],
+    },
     'long_description': long_description,
     'long_description_content_type': "text/markdown",
     'classifiers': [
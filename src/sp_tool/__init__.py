@@ -4,4 +4,24 @@ sp_tool package
 Sub-Packages are
 * sharepoint - the core library
 * tool - the frontend tool
+
+`SharepointConnector`, `SharepointTool` and `DEFAULT_CONFIG` can be imported
+from here; they are loaded on first use. Code inside the package imports
+them from their modules.
 """
+from typing import TYPE_CHECKING
+
+from .utils import lazy_exports
+
+if TYPE_CHECKING:  # pragma: no cover - static analysis only
+    from .sharepoint.connector import SharepointConnector
+    from .tool.config import DEFAULT_CONFIG
+    from .tool.sp_tool import SharepointTool
+
+_EXPORTS = {
+    "SharepointConnector": "sp_tool.sharepoint.connector",
+    "SharepointTool": "sp_tool.tool.sp_tool",
+    "DEFAULT_CONFIG": "sp_tool.tool.config",
+}
+__all__ = sorted(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -1,6 +1,34 @@
 """
 Sharepoint interface Library
+
+Names are imported from their modules on first use, so importing one
+module of the package (i.e. `sp_tool.sharepoint.odata`) does not load
+`requests`, and `aiohttp` is only loaded with `AsyncSharepointConnector`.
+Code inside the package imports them from their modules.
 """
+from typing import TYPE_CHECKING
+
+from ..utils import lazy_exports
+
+if TYPE_CHECKING:  # pragma: no cover - static analysis only
+    from .async_connector import AsyncSharepointConnector
+    from .auth_cache import AuthCache
+    from .connector import SharepointConnector
+    from .exceptions import APICallFailedSharepointException, \
+        ChunkedUploadFailedSharepointException
+    from .hooks import RequestHooks
+    from .metrics import RequestMetrics
+    from .session import create_session
 
-from .connector import SharepointConnector
-from .exceptions import APICallFailedSharepointException
+_EXPORTS = {
+    "AsyncSharepointConnector": ".async_connector",
+    "AuthCache": ".auth_cache",
+    "SharepointConnector": ".connector",
+    "APICallFailedSharepointException": ".exceptions",
+    "ChunkedUploadFailedSharepointException": ".exceptions",
+    "RequestHooks": ".hooks",
+    "RequestMetrics": ".metrics",
+    "create_session": ".session",
+}
+__all__ = sorted(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,113 @@
+"""
+Request and response helpers shared by the Sharepoint connectors
+
+Both `SharepointConnector` and `AsyncSharepointConnector` build their
+requests and read their responses with these, so only sending the request
+differs between the two.
+"""
+import json
+import logging
+import os
+
+from .exceptions import APICallFailedSharepointException
+from .utils import expanded_items, from_json, urlencode
+
+LOG = logging.getLogger(__name__)
+
+
+def request_headers(token, accept, content_type, headers=None,
+                    **more_headers):
+    """ Generate API request headers (`headers` take precedence)"""
+    req_headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": accept,
+        "Content-Type": content_type
+    }
+    return {**req_headers, **more_headers, **(headers or {})}
+
+
+def call_options(connector, action, kwargs):
+    """
+    Pop the connector options of an `api_call` from its keyword arguments
+
+    :param connector: connector making the call (for its `ACTIONS` and
+                      `DEFAULT_CONTENT_TYPE`)
+    :param action: 'get', 'post' or 'put'
+    :param kwargs: keyword arguments of the call
+    :return: tuple of (HTTP method, content type, raise_on_error)
+    """
+    method = connector.ACTIONS.get(action.lower(), None)
+    if method is None:
+        raise Exception(f"Invalid action: {action}")
+    return method, \
+        kwargs.pop('content_type', connector.DEFAULT_CONTENT_TYPE), \
+        kwargs.pop('raise_on_error', False)
+
+
+def check_response(res, raise_on_error=False):
+    """ Log a failed API response, raising if asked to """
+    if res.status_code >= 400:
+        LOG.error("API ERROR: %s: '%s'", res.status_code, res.text)
+        if raise_on_error:
+            raise APICallFailedSharepointException(res.status_code, res.text)
+    return res
+
+
+def listing_params(file_fields, folder_fields):
+    """ Query of a folder request expanding its sub-folders and files """
+    select = [f"Folders/{field}" for field in folder_fields] + \
+             [f"Files/{field}" for field in file_fields]
+    return {"$expand": "Folders,Files", "$select": ",".join(select)}
+
+
+def listing_collections(res, file_fields, folder_fields, expand_limit):
+    """
+    Decode the expanded collections of a folder listing response
+
+    :param res: response of a request with `listing_params`
+    :param file_fields: fields requested for files
+    :param folder_fields: fields requested for sub-folders
+    :param expand_limit: see `utils.expanded_items`
+    :return: list of (item type, fields, items) for "Folder" and "File",
+             where items is None if the collection has to be paged. Empty if
+             the request failed
+    """
+    if res.status_code >= 400:
+        return []
+    data = from_json(res.text)
+    data = data.get('d', data)
+    return [(item_type, fields, expanded_items(data, item_type, expand_limit))
+            for item_type, fields in (("Folder", folder_fields),
+                                      ("File", file_fields))]
+
+
+def folder_body(site_uri, folder):
+    """ JSON body of a request creating a folder """
+    return json.dumps({
+        "__metadata": {
+            "type": "SP.Folder"
+        },
+        "ServerRelativeUrl": f"{site_uri}/{folder}"
+    })
+
+
+def upload_source(filename, target_file=None):
+    """
+    Check a local file before uploading it
+
+    :param filename: local file
+    :param target_file: remote file name (defaults to the local name)
+    :return: tuple of (file size, remote file name), or None if the local
+             file does not exist
+    """
+    if not os.path.isfile(filename):
+        LOG.error("Local File %s does not exist, cannot upload", filename)
+        return None
+    return os.stat(filename).st_size, \
+        target_file or os.path.basename(filename)
+
+
+def add_file_url(url, folder, target_file):
+    """ Url to add (or overwrite) a file in a folder """
+    file_uri = urlencode(f"{url.site_uri}/{folder}/{target_file}")
+    return url.folder(folder, f"/Files/Add(url='{file_uri}',overwrite=true)")
@@ -0,0 +1,365 @@
+"""
+Asyncio Sharepoint Connector
+
+Same interface as `SharepointConnector`, but every call is a coroutine and
+runs on `aiohttp`, so a single event loop can keep many requests in flight.
+Requires the optional `aiohttp` dependency (`pip install
+sharepoint-tool[async]`).
+"""
+import asyncio
+import logging
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+from .api import add_file_url, call_options, check_response, \
+    folder_body, listing_collections, listing_params, request_headers, \
+    upload_source
+from .auth import DEFAULT_AUTH_URL, SharepointAuth
+from .connector import DEFAULT_FOLDER, DEFAULT_METADATA, DEFAULT_PAGE_SIZE, \
+    LISTING_FILE_FIELDS, LISTING_FOLDER_FIELDS, METADATA_ACCEPT, NAME_FIELDS, \
+    SharepointConnector
+from .folder_planner import folder_prefixes
+from .retry import AdaptiveLimiter, Attempts, RetryPolicy
+from .session import DEFAULT_TIMEOUT
+from .url import SharepointURL
+from .utils import from_json, next_link, strings_from_list, unwrap_results
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 50
+FILE_CHUNK_SIZE = 1024 * 1024
+
+
+async def read_chunks(body, chunk_size=FILE_CHUNK_SIZE):
+    """ Stream a file body without handing the file over to aiohttp """
+    while True:
+        chunk = body.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class AsyncResponse:
+    """ Fully read HTTP response """
+    # pylint: disable=too-few-public-methods
+    __slots__ = ("status_code", "headers", "content")
+
+    def __init__(self, status_code, headers, content):
+        """ Initialize """
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        """ Response body as text """
+        return self.content.decode("utf-8", errors="replace")
+
+
+class AsyncSharepointConnector:
+    """ Asyncio Sharepoint Connector """
+    # Session, auth, retry policy and limiter shared by concurrent calls
+    # pylint: disable=too-many-instance-attributes
+    ACTIONS = SharepointConnector.ACTIONS
+    DEFAULT_CONTENT_TYPE = SharepointConnector.DEFAULT_CONTENT_TYPE
+    expand_limit = SharepointConnector.expand_limit
+
+    def __init__(self, tenant, client_id, client_secret, site_name="",
+                 session=None, concurrency=DEFAULT_CONCURRENCY, auth=None,
+                 auth_cache=None, metadata=DEFAULT_METADATA, base_url=None,
+                 auth_url=DEFAULT_AUTH_URL, retry=None,
+                 timeout=DEFAULT_TIMEOUT):
+        """
+        Initialize async SharePoint Connector
+
+        :param tenant: prefix for url
+        :param client_id: app client_id for authentication
+        :param client_secret: app client_secret for authentication
+        :param site_name: name of the site without `sites/` prefix
+        :param session: shared `aiohttp.ClientSession`. If omitted, one is
+                        created on first use and owned by this connector
+        :param concurrency: max number of requests in flight at once. Lowered
+                            while the server throttles (see
+                            `AdaptiveLimiter`)
+        :param auth: shared `SharepointAuth` (i.e. from a sync connector)
+        :param auth_cache: `AuthCache` or path of a cache file to persist
+                           realm data and access tokens between runs
+        :param metadata: OData metadata in JSON responses: "verbose",
+                         "minimal" or "nometadata"
+        :param base_url: server base URL overriding the tenant URL
+        :param auth_url: token endpoint (`{realm}` is replaced with the
+                         bearer realm)
+        :param retry: `RetryPolicy` for throttled and failed requests
+        :param timeout: `(connect, read)` timeout in seconds of requests
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        if aiohttp is None:
+            raise ImportError("AsyncSharepointConnector requires aiohttp: "
+                              "pip install sharepoint-tool[async]")
+        if metadata not in METADATA_ACCEPT:
+            raise Exception(f"Invalid metadata mode: {metadata}")
+        self.accept = METADATA_ACCEPT[metadata]
+        self.url = SharepointURL(tenant, site_name, base_url)
+        self.auth = auth if auth is not None else SharepointAuth(
+            self.url.host, client_id, client_secret, cache=auth_cache,
+            base_url=self.url.base, auth_url=auth_url, timeout=timeout)
+        self.concurrency = concurrency
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.limiter = AdaptiveLimiter(concurrency)
+        self.timeout = timeout
+        self._session = session
+        self._owns_session = session is None
+        self._slot_freed = None
+
+    async def __aenter__(self):
+        """ Async context manager entry """
+        return self
+
+    async def __aexit__(self, *_args):
+        """ Async context manager exit - close owned session """
+        await self.close()
+
+    async def close(self):
+        """ Close the HTTP session if this connector created it"""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self):
+        """ HTTP session (created on first use inside the event loop)"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def _acquire(self):
+        """ Wait until the limiter lets another request go out """
+        if self._slot_freed is None:
+            self._slot_freed = asyncio.Condition()
+        async with self._slot_freed:
+            await self._slot_freed.wait_for(self.limiter.try_acquire)
+
+    async def _release(self):
+        """ Free a limiter slot and wake up a waiting request """
+        self.limiter.release()
+        async with self._slot_freed:
+            self._slot_freed.notify()
+
+    async def access_token(self, force=False, stale=None):
+        """ Get access token, fetching it off the event loop if needed"""
+        if self.auth.tokens.valid and not force:
+            return self.auth.access_token
+        loop = asyncio.get_running_loop()
+        if force:
+            return await loop.run_in_executor(None, self.auth.refresh, stale)
+        return await loop.run_in_executor(
+            None, lambda: self.auth.access_token)
+
+    async def headers(self, content_type=None, headers=None, **more_headers):
+        """ Generate request headers"""
+        return request_headers(await self.access_token(), self.accept,
+                               content_type or self.DEFAULT_CONTENT_TYPE,
+                               headers, **more_headers)
+
+    async def api_call(self, action, url, headers=None, **kwargs):
+        """
+        Generic web request wrapper with authentication
+
+        Same retry handling as `SharepointConnector.api_call` (both follow
+        `retry.Attempts`), but waiting between attempts does not block the
+        event loop.
+        """
+        connect, read = self.timeout
+        kwargs.setdefault('timeout', aiohttp.ClientTimeout(
+            sock_connect=connect, sock_read=read))
+        method, content_type, raise_on_error = call_options(
+            self, action, kwargs)
+        attempts = Attempts(self.retry, self.limiter, kwargs.get('data'))
+        while True:
+            token = await self.access_token()
+            try:
+                res = await self._request(method, url, content_type, headers,
+                                          **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                delay = attempts.next_delay(error=ex)
+            else:
+                delay = attempts.next_delay(res)
+                if delay is None:
+                    return check_response(res, raise_on_error)
+            if delay == Attempts.REFRESH:
+                await self.access_token(force=True, stale=token)
+            else:
+                await asyncio.sleep(delay)
+
+    async def _request(self, method, url, content_type, headers, **kwargs):
+        """ Make a single request within the concurrency limit"""
+        req_headers = await self.headers(content_type, headers=headers)
+        body = kwargs.get('data', None)
+        if hasattr(body, 'seek'):
+            # aiohttp closes file bodies once sent, which breaks retries
+            kwargs = {**kwargs, 'data': read_chunks(body)}
+        await self._acquire()
+        try:
+            async with self.session.request(method, url, headers=req_headers,
+                                            **kwargs) as res:
+                content = await res.read()
+                return AsyncResponse(res.status, res.headers, content)
+        finally:
+            await self._release()
+
+    async def folder_contents(self, folder=DEFAULT_FOLDER):
+        """ Get folder contents (sub-folders followed by files)"""
+        folders, files = await self.folder_listing(folder)
+        return folders + files
+
+    async def folder_listing(self, folder=DEFAULT_FOLDER,
+                             file_fields=LISTING_FILE_FIELDS,
+                             folder_fields=LISTING_FOLDER_FIELDS):
+        """
+        Get sub-folders and files of a folder in a single request
+
+        Truncated expanded collections are listed again page by page.
+        """
+        res = await self.api_call(
+            'get', self.url.folder(folder),
+            params=listing_params(file_fields, folder_fields))
+        listing = []
+        for item_type, fields, items in listing_collections(
+                res, file_fields, folder_fields, self.expand_limit):
+            if items is None:
+                items = await self._get_items(folder, item_type,
+                                              select=fields)
+            listing.append(items)
+        return tuple(listing) if listing else ([], [])
+
+    async def folders(self, folder=DEFAULT_FOLDER, select=None):
+        """ Get list of folders items in a given folder"""
+        return await self._get_items(folder, "Folder", select=select)
+
+    async def files(self, folder=DEFAULT_FOLDER, select=None):
+        """ Get list of files in a given folder"""
+        return await self._get_items(folder, "File", select=select)
+
+    async def _get_items(self, folder=DEFAULT_FOLDER, item_type="File",
+                         select=None, page_size=DEFAULT_PAGE_SIZE):
+        """ Get list of specific type in a given folder (all pages)"""
+        url = f"{self.url.folder(folder)}/{item_type}s"
+        params = {"$top": page_size}
+        if select:
+            params["$select"] = ",".join(select)
+        items = []
+        while url:
+            res = await self.api_call('get', url, params=params)
+            if res.status_code >= 400:
+                break
+            data = from_json(res.text)
+            items += unwrap_results(data)
+            url, params = next_link(data), None
+        return items
+
+    async def list_folder_contents(self, folder=DEFAULT_FOLDER, sort=True):
+        """ List files and folders in folder as just names"""
+        folders, files = await self.folder_listing(folder, NAME_FIELDS,
+                                                   NAME_FIELDS)
+        desc = f"item from folder '{folder}'"
+        contents = strings_from_list(files, desc=desc, sort=False) + \
+            strings_from_list(folders, desc=desc, sort=False, suffix="/")
+        return sorted(contents) if sort else contents
+
+    async def list_folders(self, folder=DEFAULT_FOLDER):
+        """ Get list of folder names in a given folder"""
+        return await self._list_items(folder, "Folder", suffix="/")
+
+    async def list_files(self, folder=DEFAULT_FOLDER):
+        """ Get list of files in a given folder"""
+        return await self._list_items(folder, "File")
+
+    async def _list_items(self, folder=DEFAULT_FOLDER, item_type="File",
+                          **kwargs):
+        """ Get a list of items of a specific type (just names)"""
+        items = await self._get_items(folder, item_type, select=NAME_FIELDS)
+        desc = f"{item_type.lower()} from folder '{folder}'"
+        return strings_from_list(items, desc=desc, **kwargs)
+
+    async def file_exists(self, filename, folder=DEFAULT_FOLDER):
+        """ Check if file exists in a folder """
+        files = await self.list_files(folder)
+        return filename in files
+
+    async def get_file(self, filename, folder=DEFAULT_FOLDER):
+        """ Get file contents (as bytes) """
+        url = self.url.file(folder, filename, "/$value")
+        LOG.info("Getting file at url %s", url)
+        res = await self.api_call("get", url, headers={
+            "Accept": "application/octet-stream"
+        })
+        if res.status_code < 400:
+            return res.content
+        return False
+
+    async def check_in_file(self, filename, folder=DEFAULT_FOLDER,
+                            comment="Auto Updated"):
+        """ Check-in file in folder"""
+        url = self.url.file(folder, filename,
+                            f"/CheckIn(comment='{comment}',checkintype=0)")
+        LOG.info("Checking in file: %s/%s", folder, filename)
+        return await self.api_call('post', url)
+
+    async def check_out_file(self, filename, folder=DEFAULT_FOLDER):
+        """ Checkout file in folder"""
+        url = self.url.file(folder, filename, "/CheckOut()")
+        LOG.info("Checking out file: %s/%s", folder, filename)
+        return await self.api_call('post', url)
+
+    async def add_folder_path(self, full_folder, known_folders=None):
+        """
+        Add Full folder path as needed
+
+        :param full_folder: folder path to create
+        :param known_folders: folders known to exist (set or list)
+        :return: list of folders a create request was sent for
+        """
+        known_folders = set(known_folders or ())
+        added = []
+        for folder in folder_prefixes(full_folder):
+            if folder in known_folders:
+                continue
+            await self.add_folder(folder)
+            added.append(folder)
+        return added
+
+    async def add_folder(self, folder=DEFAULT_FOLDER):
+        """ Ensure folder exists"""
+        LOG.info("Adding folder %s", folder)
+        res = await self.api_call('post', f"{self.url.web}/folders",
+                                  data=folder_body(self.url.site_uri, folder),
+                                  content_type="application/json;"
+                                               "odata=verbose")
+        return res.text
+
+    async def upload_file(self, filename, target_file=None,
+                          folder=DEFAULT_FOLDER, check_out=True):
+        """ Upload file to sharepoint folder """
+        source = upload_source(filename, target_file)
+        if source is None:
+            return False
+        size, target_file = source
+
+        if await self.file_exists(target_file, folder):
+            await self.check_in_file(filename=target_file, folder=folder)
+
+        LOG.error("Uploading %s to %s/%s", filename, folder, target_file)
+
+        with open(filename, 'rb') as data:
+            res = await self.api_call(
+                'post', add_file_url(self.url, folder, target_file),
+                data=data, content_type="application/octet-stream",
+                headers={"Content-Length": f"{size}"})
+
+        if res.status_code < 400 and check_out:
+            await self.check_out_file(target_file, folder)
+        return res
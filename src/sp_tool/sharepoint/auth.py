@@ -2,10 +2,19 @@
 Sharepoint Authenticator
 
 """
-import functools
 import json
+import logging
+import threading
+import time
 
-import requests
+from .auth_cache import AuthCache
+from .session import create_session, DEFAULT_TIMEOUT
+from .token import TokenManager, DEFAULT_REFRESH_MARGIN, token_expiry
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_AUTH_URL = "https://accounts.accesscontrol.windows.net/" \
+                   "{realm}/tokens/OAuth/2"
 
 
 class SharepointAuth:
@@ -14,25 +23,74 @@ class SharepointAuth:
 
     Authenticates with Sharepoint and gets auth token
     """
+    # Credentials, endpoints, realm and token state of one site
+    # pylint: disable=too-many-instance-attributes
 
-    def __init__(self, host, client_id, client_secret):
+    def __init__(self, host, client_id, client_secret, session=None,
+                 refresh_margin=DEFAULT_REFRESH_MARGIN,
+                 background_refresh=False, cache=None, base_url=None,
+                 auth_url=DEFAULT_AUTH_URL, timeout=DEFAULT_TIMEOUT):
         """
         Initialize Authenticator
 
         :param host: site host
         :param client_id: authentication client id
         :param client_secret: authentication secret
+        :param session: shared `requests.Session` (one is created if omitted)
+        :param refresh_margin: seconds before expiry to refresh the token
+        :param background_refresh: if true, keep the token fresh from a
+                                   background thread
+        :param cache: `AuthCache` (or path to cache file) used to persist
+                      realm data and tokens between runs (disabled if None)
+        :param base_url: server base URL (default `https://<host>`)
+        :param auth_url: token endpoint, `{realm}` is replaced with the
+                         bearer realm
+        :param timeout: `(connect, read)` timeout of discovery and token
+                        requests
         """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
         self.host = host
         self.client_id = client_id
         self.client_secret = client_secret
+        self.base_url = base_url.rstrip('/') if base_url else \
+            f"https://{host}"
+        self._auth_url = auth_url
+        self.timeout = timeout
+        self.session = session if session is not None else create_session()
+        self.cache = AuthCache(cache) if isinstance(cache, str) else cache
+        self._realm_data = None
+        self._realm_cached = False
+        self._realm_lock = threading.Lock()
+        self._cache_checked = False
+        self.tokens = TokenManager(self._request_token,
+                                   refresh_margin=refresh_margin)
+        if background_refresh:
+            self.tokens.start()
 
     @property
-    @functools.lru_cache(maxsize=None)
     def _remote_data(self):
-        """ Get login data"""
-        res = requests.get(f"https://{self.host}/_vti_bin/client.svc/",
-                           headers={'Authorization': 'Bearer'})
+        """ Get login data (bearer realm, app id)"""
+        with self._realm_lock:
+            if self._realm_data is None:
+                cached = self.cache.realm(self.host, self.client_id) \
+                    if self.cache else None
+                if cached:
+                    self._realm_data = tuple(cached)
+                    self._realm_cached = True
+                else:
+                    self._realm_data = self._discover_realm()
+                    self._realm_cached = False
+                    if self.cache:
+                        self.cache.update(self.host, self.client_id,
+                                          bearer_realm=self._realm_data[0],
+                                          app_id=self._realm_data[1])
+            return self._realm_data
+
+    def _discover_realm(self):
+        """ Discover login data from server"""
+        res = self.session.get(f"{self.base_url}/_vti_bin/client.svc/",
+                               headers={'Authorization': 'Bearer'},
+                               timeout=self.timeout)
         resp = {}
         for item in res.headers.get('WWW-Authenticate', '').split(','):
             parts = item.split('=', 1)
@@ -42,51 +100,87 @@ class SharepointAuth:
                 resp.get('client_id', None).strip('"'))
 
     @property
-    @functools.lru_cache(maxsize=None)
     def bearer_realm(self):
         """ Get token Id"""
         bearer_realm, _ = self._remote_data
         return bearer_realm
 
     @property
-    @functools.lru_cache(maxsize=None)
     def app_id(self):
         """ Get token Id"""
         _, app_id = self._remote_data
         return app_id
 
     @property
-    @functools.lru_cache(maxsize=None)
     def resource_id(self):
         """ get resource id"""
         return f"{self.app_id}/{self.host}@{self.bearer_realm}"
 
     @property
-    @functools.lru_cache(maxsize=None)
     def auth_url(self):
         """ Get auth url"""
-        return f"https://accounts.accesscontrol.windows.net/" \
-               f"{self.bearer_realm}/tokens/OAuth/2"
+        return self._auth_url.format(realm=self.bearer_realm)
 
     @property
     def full_client_id(self):
         """ Get qualified client id"""
         return f"{self.client_id}@{self.bearer_realm}"
 
-    @property
-    @functools.lru_cache(maxsize=None)
-    def bearer_token(self):
-        """ Get bearer token """
+    def _request_token(self):
+        """ Get a new bearer token (from cache on first use, if enabled)"""
+        if self.cache and not self._cache_checked:
+            self._cache_checked = True
+            token = self.cache.token(self.host, self.client_id,
+                                     margin=self.tokens.refresh_margin)
+            if token:
+                LOG.debug("Using cached access token for %s", self.host)
+                return token
+        self._cache_checked = True
+
+        now = time.time()
+        bearer_token = self._post_token_request()
+        if not bearer_token.get("access_token") and self._realm_cached:
+            # Cached realm data may be out of date - rediscover and retry
+            LOG.info("Token request failed with cached realm, rediscovering")
+            self.cache.remove(self.host, self.client_id)
+            self._realm_data = None
+            bearer_token = self._post_token_request()
+        if self.cache and bearer_token.get("access_token"):
+            self.cache.update(self.host, self.client_id, token={
+                **bearer_token,
+                "expires_on": str(int(token_expiry(bearer_token, now)))
+            })
+        return bearer_token
+
+    def _post_token_request(self):
+        """ Request a new bearer token from the server"""
         data = {"client_id": self.full_client_id,
                 "client_secret": self.client_secret,
                 "resource": self.resource_id,
                 "grant_type": "client_credentials"}
         headers = {"Content-type": "application/x-www-form-urlencoded"}
-        res = requests.post(self.auth_url, data=data, headers=headers)
+        res = self.session.post(self.auth_url, data=data, headers=headers,
+                                timeout=self.timeout)
 
         bearer_token = json.loads(res.text)
         return bearer_token
 
+    @property
+    def bearer_token(self):
+        """ Get bearer token (refreshed shortly before it expires)"""
+        return self.tokens.get()
+
+    def refresh(self, stale=None):
+        """
+        Force a token refresh
+
+        :param stale: access token that was rejected; if another caller has
+                      already replaced it, no new request is made
+        :return: new access token
+        """
+        return self.tokens.get(force=True, stale=stale).get("access_token",
+                                                             None)
+
     @property
     def access_token(self):
         """ get bearer access token"""
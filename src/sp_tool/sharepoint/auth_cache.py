@@ -0,0 +1,120 @@
+"""
+Persistent authentication cache
+
+Stores realm discovery results and unexpired access tokens on disk, keyed by
+host and client id, so short-lived processes can skip the discovery probe
+and token request. The file is only readable by its owner and is locked
+while being updated so parallel processes can share it.
+"""
+import contextlib
+import json
+import logging
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from ..utils import atomic_write
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_AUTH_CACHE = os.path.join("~", ".cache", "sp-tool", "auth.json")
+
+
+class AuthCache:
+    """ On-disk cache of realm data and access tokens """
+
+    def __init__(self, path=DEFAULT_AUTH_CACHE):
+        """
+        Initialize Auth Cache
+
+        :param path: cache file location
+        """
+        self.path = os.path.abspath(os.path.expanduser(path))
+
+    @staticmethod
+    def key(host, client_id):
+        """ Cache key for a host/client id pair"""
+        return f"{host}|{client_id}"
+
+    def get(self, host, client_id):
+        """ Get cache entry for host and client id (empty dict if none)"""
+        with self._locked(exclusive=False):
+            return self._read().get(self.key(host, client_id), {})
+
+    def update(self, host, client_id, **values):
+        """ Update (or create) cache entry for host and client id"""
+        with self._locked(exclusive=True):
+            data = self._read()
+            entry = data.setdefault(self.key(host, client_id), {})
+            entry.update(values)
+            self._write(data)
+
+    def remove(self, host, client_id, *fields):
+        """ Remove fields (or whole entry if none given) from cache entry"""
+        with self._locked(exclusive=True):
+            data = self._read()
+            key = self.key(host, client_id)
+            if key not in data:
+                return
+            if fields:
+                for field in fields:
+                    data[key].pop(field, None)
+            else:
+                del data[key]
+            self._write(data)
+
+    def realm(self, host, client_id):
+        """ Get cached (bearer realm, app id) or None"""
+        entry = self.get(host, client_id)
+        if entry.get("bearer_realm") and entry.get("app_id"):
+            return entry["bearer_realm"], entry["app_id"]
+        return None
+
+    def token(self, host, client_id, margin=0):
+        """ Get cached token response if it is valid for `margin` seconds"""
+        token = self.get(host, client_id).get("token")
+        if not token or not token.get("access_token"):
+            return None
+        try:
+            if float(token.get("expires_on", 0)) - margin > time.time():
+                return token
+        except (TypeError, ValueError):
+            pass
+        return None
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive=True):
+        """ Hold a lock on the cache file"""
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _read(self):
+        """ Read cache contents (must hold lock)"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as ex:
+            LOG.warning("Ignoring unreadable auth cache %s: %s", self.path, ex)
+            return {}
+
+    def _write(self, data):
+        """ Atomically replace cache contents (must hold exclusive lock)"""
+        # The file is created readable by owner only
+        with atomic_write(self.path, prefix=".auth-") as cache_file:
+            json.dump(data, cache_file)
@@ -0,0 +1,189 @@
+"""
+OData $batch support
+
+Collects small write operations (folder creation, check-in, check-out) and
+sends them as multipart `$batch` requests, then hands each operation its own
+status and body back.
+"""
+import logging
+import re
+import uuid
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+STATUS_LINE = re.compile(r"^HTTP/\d\.\d (\d{3})[^\n]*$", re.MULTILINE)
+BOUNDARY_LINE = re.compile(r"^--[\w\-.]+(?:--)?\s*$", re.MULTILINE)
+
+
+class BatchOperation:
+    """
+    A single operation in a batch
+
+    After the batch is sent, `status_code`, `headers` and `text` hold the
+    operation's own response, so it can be used like a response object.
+    """
+    # Holds the request and the response fields read from a response object
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, method, url, data=None, content_type=None):
+        """ Initialize """
+        self.method = method
+        self.url = url
+        self.data = data
+        self.content_type = content_type
+        self.status_code = None
+        self.headers = {}
+        self.text = ""
+        self.callbacks = []
+
+    @property
+    def done(self):
+        """ True once a response was received """
+        return self.status_code is not None
+
+    @property
+    def ok(self):
+        """ True if operation succeeded """
+        return self.done and self.status_code < 400
+
+    def on_done(self, callback):
+        """ Call `callback(operation)` once the response is in """
+        self.callbacks.append(callback)
+
+    def resolve(self, status_code, headers, text):
+        """ Set operation response and run callbacks """
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        for callback in self.callbacks:
+            callback(self)
+
+
+def encode_batch(operations, boundary, accept):
+    """
+    Encode operations as a multipart $batch body
+
+    Each write goes into its own changeset so one failing operation does not
+    affect the others.
+    """
+    lines = []
+    for operation in operations:
+        changeset = f"changeset_{uuid.uuid4()}"
+        lines += [f"--{boundary}",
+                  f"Content-Type: multipart/mixed; boundary={changeset}",
+                  "",
+                  f"--{changeset}",
+                  "Content-Type: application/http",
+                  "Content-Transfer-Encoding: binary",
+                  "",
+                  f"{operation.method} {operation.url} HTTP/1.1",
+                  f"Accept: {accept}"]
+        if operation.content_type:
+            lines.append(f"Content-Type: {operation.content_type}")
+        lines += ["", operation.data or "", f"--{changeset}--", ""]
+    lines += [f"--{boundary}--", ""]
+    return "\r\n".join(lines)
+
+
+def decode_batch(text):
+    """
+    Decode a multipart $batch response
+
+    :return: list of (status code, headers, body) in request order
+    """
+    responses = []
+    text = text.replace("\r\n", "\n")
+    for part in BOUNDARY_LINE.split(text):
+        match = STATUS_LINE.search(part)
+        if not match:
+            continue
+        head, _, body = part[match.end():].lstrip("\n").partition("\n\n")
+        headers = {}
+        for line in head.splitlines():
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip()] = value.strip()
+        responses.append((int(match.group(1)), headers, body.strip()))
+    return responses
+
+
+class Batch:
+    """
+    Context manager collecting operations into $batch requests
+
+    Operations are sent when `max_size` is reached and when the context
+    exits.
+    """
+
+    def __init__(self, connector, max_size=DEFAULT_BATCH_SIZE):
+        """
+        Initialize Batch
+
+        :param connector: `SharepointConnector` to send requests through
+        :param max_size: max number of operations per request
+        """
+        self.connector = connector
+        self.max_size = max_size
+        self.pending = []
+        self._previous = None
+
+    def __enter__(self):
+        """ Make this the active batch of the calling thread """
+        self._previous = self.connector.active_batch
+        self.connector.active_batch = self
+        return self
+
+    def __exit__(self, *_args):
+        """ Send pending operations and restore previous batch """
+        self.connector.active_batch = self._previous
+        self.flush()
+
+    def add(self, method, url, data=None, content_type=None):
+        """ Queue an operation, sending the batch if full """
+        operation = BatchOperation(method, url, data, content_type)
+        self.pending.append(operation)
+        if len(self.pending) >= self.max_size:
+            self.flush()
+        return operation
+
+    def flush(self):
+        """ Send pending operations """
+        operations, self.pending = self.pending, []
+        if not operations:
+            return operations
+        if len(operations) == 1:
+            self._send_single(operations[0])
+            return operations
+        boundary = f"batch_{uuid.uuid4()}"
+        accept = self.connector.headers()["Accept"]
+        body = encode_batch(operations, boundary, accept)
+        LOG.debug("Sending batch of %d operations", len(operations))
+        res = self.connector.api_call(
+            'post', f"{self.connector.url.api}/$batch",
+            data=body.encode("utf-8"),
+            content_type=f"multipart/mixed; boundary={boundary}")
+        responses = decode_batch(res.text) if res.status_code < 400 else []
+        if len(responses) != len(operations):
+            LOG.error("Batch returned %d responses for %d operations",
+                      len(responses), len(operations))
+        for index, operation in enumerate(operations):
+            if index < len(responses):
+                status_code, headers, text = responses[index]
+            else:
+                status_code, headers, text = res.status_code, {}, res.text
+                status_code = status_code if status_code >= 400 else 500
+            if status_code >= 400:
+                LOG.error("API ERROR: %s %s: %s: '%s'", operation.method,
+                          operation.url, status_code, text)
+            operation.resolve(status_code, headers, text)
+        return operations
+
+    def _send_single(self, operation):
+        """ Send a lone operation as a plain request """
+        kwargs = {"data": operation.data}
+        if operation.content_type:
+            kwargs["content_type"] = operation.content_type
+        res = self.connector.api_call(operation.method.lower(), operation.url,
+                                      **kwargs)
+        operation.resolve(res.status_code, res.headers, res.text)
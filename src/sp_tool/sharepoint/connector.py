@@ -1,32 +1,87 @@
 """
 Sharepoint Connector
 """
+import collections
+import contextlib
 import json
 import os
 import logging
 import socket
+import threading
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import requests
 
-from .exceptions import APICallFailedSharepointException
-from .auth import SharepointAuth
+from .folder_planner import DEFAULT_PLANNER_WORKERS, FolderPlanner, \
+    folder_prefixes
+from .exceptions import APICallFailedSharepointException, \
+    ChunkedUploadFailedSharepointException
+from .auth import DEFAULT_AUTH_URL, SharepointAuth
+from .batch import Batch, DEFAULT_BATCH_SIZE
+from .hooks import RequestHooks
+from .items import ItemIndex, SPFile, SPFolder
+from .listing_cache import ListingCache, DEFAULT_CACHE_TTL, \
+    DEFAULT_CACHE_SIZE
+from .api import add_file_url, call_options, check_response, \
+    folder_body, listing_collections, listing_params, request_headers, \
+    upload_source
+from .odata import DEFAULT_METADATA, METADATA_ACCEPT
+from .retry import AdaptiveLimiter, Attempts, RetryPolicy
+from .session import create_session, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
 from .url import SharepointURL
-from .utils import from_json, strings_from_list, urlencode
+from ..utils import compile_globs
+from .utils import from_json, iter_strings_from_list, list_row_item, \
+    next_link, unwrap_results, urlencode
 
 DEFAULT_FOLDER = "Shared Documents/"
+DEFAULT_CHUNK_SIZE = 10 * 1024 * 1024
+DEFAULT_CHUNK_THRESHOLD = 100 * 1024 * 1024
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DEFAULT_DOWNLOAD_PART_SIZE = 32 * 1024 * 1024
+DEFAULT_PAGE_SIZE = 5000
+DEFAULT_EXPAND_LIMIT = 5000
+DEFAULT_WALK_WORKERS = 8
+NAME_FIELDS = ("Name",)
+LISTING_FILE_FIELDS = SPFile.fields()
+LISTING_FOLDER_FIELDS = SPFolder.fields()
+LIBRARY_FIELDS = ("FileRef", "FileLeafRef", "FSObjType", "File_x0020_Size",
+                  "Modified", "UniqueId", "owshiddenversion")
+LIBRARY_VIEW = "<View Scope='RecursiveAll'><ViewFields>{fields}</ViewFields>" \
+               "<RowLimit Paged='TRUE'>{page_size}</RowLimit></View>"
 LOG = logging.getLogger(__name__)
 
 
+def _matching(items, include, exclude):
+    """ Names of items matching `include` but not `exclude` (regexes) """
+    return [name for name in iter_strings_from_list(items)
+            if include.match(os.path.normcase(name)) and
+            not exclude.match(os.path.normcase(name))]
+
+
 class SharepointConnector:
     """ Sharepoint Connector """
+    # One public method per SharePoint operation, sharing the session, auth,
+    # caches and limits of the connector
+    # pylint: disable=too-many-instance-attributes,too-many-public-methods
     ACTIONS = {
-        'get': requests.get,
-        'post': requests.post,
-        'put': requests.put
+        'get': 'GET',
+        'post': 'POST',
+        'put': 'PUT'
     }
     DEFAULT_CONTENT_TYPE = "multipart/form-data"
-
-    def __init__(self, tenant, client_id, client_secret, site_name=""):
+    expand_limit = DEFAULT_EXPAND_LIMIT
+
+    def __init__(self, tenant, client_id, client_secret, site_name="",
+                 session=None, pool_size=DEFAULT_POOL_SIZE, keep_alive=True,
+                 background_refresh=False, auth_cache=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE,
+                 chunk_threshold=DEFAULT_CHUNK_THRESHOLD,
+                 cache_ttl=DEFAULT_CACHE_TTL, cache_size=DEFAULT_CACHE_SIZE,
+                 retry=None, concurrency=None, metadata=DEFAULT_METADATA,
+                 base_url=None, auth_url=DEFAULT_AUTH_URL, hooks=None,
+                 timeout=DEFAULT_TIMEOUT):
         """
         Initialize SharePoint Connector
 
@@ -34,68 +89,360 @@ class SharepointConnector:
         :param client_id: app client_id for authentication
         :param client_secret: app client_secret for authentication
         :param site_name: name of the site without `sites/` prefix
+        :param session: shared `requests.Session` to use for all calls. If
+                        omitted, a pooled session is created and owned by
+                        this connector
+        :param pool_size: connection pool size for the created session
+        :param keep_alive: keep connections open between calls
+        :param background_refresh: refresh the access token from a
+                                   background thread before it expires
+        :param auth_cache: `AuthCache` or path of a cache file to persist
+                           realm data and access tokens between runs
+        :param chunk_size: chunk size (bytes) for chunked uploads
+        :param chunk_threshold: files larger than this (bytes) are uploaded
+                                in chunks by `upload_file`
+        :param cache_ttl: seconds folder listings are cached for existence
+                          checks (0 to disable)
+        :param cache_size: max number of folder listings cached
+        :param retry: `RetryPolicy` for throttled and failed requests
+                      (default policy if None)
+        :param concurrency: max number of requests in flight. The limit is
+                            lowered while the server throttles (defaults to
+                            `pool_size`)
+        :param metadata: OData metadata in JSON responses: "verbose",
+                         "minimal" or "nometadata" (smallest and fastest)
+        :param base_url: server base URL overriding `https://<tenant>.
+                         sharepoint.com` (i.e. for a local test server)
+        :param auth_url: token endpoint (`{realm}` is replaced with the
+                         bearer realm)
+        :param hooks: `RequestHooks` called for every request of the session
+                      (including authentication). Defaults to the hooks
+                      already installed on `session`, or new empty hooks
+        :param timeout: `(connect, read)` timeout in seconds of every request
+                        (including authentication). Timed out requests are
+                        retried like connection errors
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        # pylint: disable=too-many-locals
+        if metadata not in METADATA_ACCEPT:
+            raise Exception(f"Invalid metadata mode: {metadata}")
+        self.accept = METADATA_ACCEPT[metadata]
+        self._owns_session = session is None
+        self.session = session if session is not None else create_session(
+            pool_size=pool_size, keep_alive=keep_alive, timeout=timeout)
+        self.timeout = timeout
+        self.hooks = hooks or getattr(self.session, 'request_hooks', None) \
+            or RequestHooks()
+        self.hooks.install(self.session)
+        self.url = SharepointURL(tenant, site_name, base_url)
+        self.auth = SharepointAuth(self.url.host, client_id, client_secret,
+                                   session=self.session,
+                                   background_refresh=background_refresh,
+                                   cache=auth_cache, base_url=self.url.base,
+                                   auth_url=auth_url, timeout=timeout)
+        self.chunk_size = chunk_size
+        self.chunk_threshold = chunk_threshold
+        self._upload_sessions = {}
+        self.listing_cache = ListingCache(ttl=cache_ttl,
+                                          max_folders=cache_size)
+        self._local = threading.local()
+        self._upload_sessions_lock = threading.Lock()
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.limiter = AdaptiveLimiter(concurrency or pool_size)
+
+    def __enter__(self):
+        """ Context manager entry """
+        return self
+
+    def __exit__(self, *_args):
+        """ Context manager exit - close owned session """
+        self.close()
+
+    def close(self):
+        """ Stop token refresh and close the session if we created it"""
+        self.auth.tokens.stop()
+        if self._owns_session:
+            self.session.close()
+
+    @property
+    def active_batch(self):
+        """ Batch collecting operations on the calling thread (or None)"""
+        return getattr(self._local, 'batch', None)
+
+    @active_batch.setter
+    def active_batch(self, batch):
+        """ Set batch collecting operations on the calling thread"""
+        self._local.batch = batch
+
+    def batch(self, max_size=DEFAULT_BATCH_SIZE):
+        """
+        Collect folder creation, check-in and check-out calls made on this
+        thread and send them as $batch requests of up to `max_size`
+        operations. Inside the batch those calls return `BatchOperation`
+        objects that hold their own status and body once the batch is sent
+        (on exit, or whenever `max_size` is reached):
+
+            with sharepoint.batch():
+                for name in names:
+                    sharepoint.check_out_file(name, folder)
         """
-        self.url = SharepointURL(tenant, site_name)
-        self.auth = SharepointAuth(self.url.host, client_id, client_secret)
+        return Batch(self, max_size)
+
+    @contextlib.contextmanager
+    def _unbatched(self):
+        """ Temporarily run calls immediately even if a batch is active"""
+        batch = self.active_batch
+        self.active_batch = None
+        try:
+            yield
+        finally:
+            self.active_batch = batch
+
+    def _post(self, url, **kwargs):
+        """ Post now, or queue into the active batch"""
+        batch = self.active_batch
+        if batch is None:
+            return self.api_call('post', url, **kwargs)
+        return batch.add('POST', url, kwargs.get('data'),
+                         kwargs.get('content_type'))
 
     def api_call(self, action, url, headers=None, **kwargs):
-        """ Generic web request wrapper with authentication """
-        headers = headers if headers else {}
-
-        req = self.ACTIONS.get(action.lower(), None)
-        if req is None:
-            raise Exception(f"Invalid action: {action}")
-        content_type = kwargs.pop('content_type', self.DEFAULT_CONTENT_TYPE)
-        raise_on_error = kwargs.pop('raise_on_error', False)
-        req_headers = self.headers(content_type, headers=headers)
-        res = req(url, headers=req_headers, **kwargs)
-        if res.status_code >= 400:
-            LOG.error("API ERROR: %s: '%s'", res.status_code, res.text)
-            if raise_on_error:
-                raise APICallFailedSharepointException(res.status_code,
-                                                       res.text)
-        return res
+        """
+        Generic web request wrapper with authentication
+
+        If the access token is rejected (401), it is refreshed and the call
+        is retried once. Throttled (429/503) and transient failures
+        (including timeouts) are retried according to `self.retry`,
+        rewinding file bodies between attempts. Streamed bodies can only be
+        sent once and are never retried.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        method, content_type, raise_on_error = call_options(
+            self, action, kwargs)
+        attempts = Attempts(self.retry, self.limiter, kwargs.get('data'))
+        while True:
+            token = self.auth.access_token
+            req_headers = self.headers(content_type, headers=headers)
+            error = None
+            try:
+                with self.limiter:
+                    res = self.session.request(method, url,
+                                               headers=req_headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                res, error = None, ex
+            delay = attempts.next_delay(res, error)
+            if delay is None:
+                return check_response(res, raise_on_error)
+            if delay == Attempts.REFRESH:
+                self.auth.refresh(stale=token)
+            else:
+                self.hooks.retried(url, getattr(res, 'status_code', None),
+                                   delay)
+                self.retry.sleep(delay)
 
     def folder_contents(self, folder=DEFAULT_FOLDER):
-        """ Get folder contents"""
-        folders = self.folders(folder)
-        files = self.files(folder)
-        contents = folders + files
-        return contents
+        """ Get folder contents (sub-folders followed by files)"""
+        folders, files = self.folder_listing(folder)
+        return folders + files
+
+    def folder_listing(self, folder=DEFAULT_FOLDER,
+                       file_fields=LISTING_FILE_FIELDS,
+                       folder_fields=LISTING_FOLDER_FIELDS):
+        """
+        Get sub-folders and files of a folder in a single request
+
+        Collections that may have been truncated by SharePoint (see
+        `expanded_items`) are listed again page by page. Also refreshes the
+        listing cache for the folder.
+
+        :param folder: folder to list
+        :param file_fields: fields to return for files
+        :param folder_fields: fields to return for sub-folders
+        :return: tuple of (list of folder items, list of file items)
+        """
+        res = self.api_call('get', self.url.folder(folder),
+                            params=listing_params(file_fields, folder_fields))
+        desc = f"item from folder '{folder}'"
+        listing = []
+        for item_type, fields, items in listing_collections(
+                res, file_fields, folder_fields, self.expand_limit):
+            if items is None:
+                LOG.debug("Expanded %ss of %s truncated, paging", item_type,
+                          folder)
+                items = list(self.iter_items(folder, item_type,
+                                             select=fields))
+            self.listing_cache.put(folder, item_type,
+                                   iter_strings_from_list(items, desc=desc))
+            listing.append(items)
+        return tuple(listing) if listing else ([], [])
 
     @property
     def connected(self):
         """ Check if we are connected"""
         try:
-            socket.gethostbyname(self.url.host)
-            self.api_call('get', f"{self.url.folder('/')}/Folders",
-                          raise_on_error=True)
+            socket.gethostbyname(self.url.hostname)
+            self.api_call('get', self.url.folder('/'),
+                          params={"$select": "Name"}, raise_on_error=True)
             return True
         except socket.gaierror:
-            LOG.error("Invalid host: %s" % self.url.host)
+            LOG.error("Invalid host: %s" % self.url.hostname)
             return False
         except APICallFailedSharepointException as _ex:
             return False
 
-    def folders(self, folder=DEFAULT_FOLDER):
+    def folders(self, folder=DEFAULT_FOLDER, select=None):
         """ Get list of folders items in a given folder"""
-        return self._get_items(folder, "Folder")
+        return self._get_items(folder, "Folder", select=select)
 
-    def files(self, folder=DEFAULT_FOLDER):
+    def files(self, folder=DEFAULT_FOLDER, select=None):
         """ Get list of files in a given folder"""
-        return self._get_items(folder, "File")
+        return self._get_items(folder, "File", select=select)
 
-    def _get_items(self, folder=DEFAULT_FOLDER, item_type="File"):
+    def _get_items(self, folder=DEFAULT_FOLDER, item_type="File", **kwargs):
         """ Get list of specific type in a given folder (full data)"""
-        res = self.api_call('get', f"{self.url.folder(folder)}/{item_type}s")
-        data = from_json(res.text)
-        data = data.get('d', data)
-        data = data.get('results', data)
-        return data
+        return list(self.iter_items(folder, item_type, **kwargs))
+
+    def iter_items(self, folder=DEFAULT_FOLDER, item_type="File", select=None,
+                   page_size=DEFAULT_PAGE_SIZE):
+        """
+        Generate items of specific type in a given folder, page by page
+
+        :param folder: folder to list
+        :param item_type: "File" or "Folder"
+        :param select: fields to return (all fields if None)
+        :param page_size: max items per request
+        :return: generator of item dicts
+        """
+        url = f"{self.url.folder(folder)}/{item_type}s"
+        params = {"$top": page_size}
+        if select:
+            params["$select"] = ",".join(select)
+        while url:
+            res = self.api_call('get', url, params=params)
+            if res.status_code >= 400:
+                return
+            data = from_json(res.text)
+            yield from unwrap_results(data)
+            url, params = next_link(data), None
+
+    def iter_library(self, folder=DEFAULT_FOLDER, page_size=DEFAULT_PAGE_SIZE,
+                     folders=False):
+        """
+        Generate all items below a folder as a flat, paged listing
+
+        Uses `RenderListDataAsStream` with a `RecursiveAll` view, so the
+        number of requests depends on the number of items, not on the
+        number of folders. The first path element of `folder` is the
+        document library.
+
+        :param folder: folder to list (library root or a folder in it)
+        :param page_size: max items per request
+        :param folders: include folder items
+        :return: generator of items (see `utils.list_row_item`)
+        """
+        library = folder.strip('/').split('/', 1)[0]
+        fields = "".join(f"<FieldRef Name='{field}'/>"
+                         for field in LIBRARY_FIELDS)
+        data = json.dumps({"parameters": {
+            "__metadata": {"type": "SP.RenderListDataParameters"},
+            "ViewXml": LIBRARY_VIEW.format(fields=fields, page_size=page_size),
+            "FolderServerRelativeUrl":
+                f"{self.url.site_uri}/{folder.strip('/')}",
+            "RenderOptions": 2
+        }})
+        url = f"{self.url.web}/GetList(@list)/RenderListDataAsStream"
+        params = {"@list": f"'{self.url.site_uri}/{library}'"}
+        while params:
+            res = self.api_call('post', url, params=params, data=data,
+                                content_type="application/json;odata=verbose")
+            if res.status_code >= 400:
+                return
+            page = from_json(res.text)
+            for row in page.get("Row", []):
+                item = list_row_item(row, self.url.site_uri)
+                if folders or not item["Folder"]:
+                    yield item
+            next_href = page.get("NextHref", None)
+            params = {**params, **dict(urllib.parse.parse_qsl(
+                next_href.lstrip('?')))} if next_href else None
+
+    def file_index(self, folder=DEFAULT_FOLDER, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Get files in a folder as compact `SPFile` items indexed by name
+
+        Items are converted page by page, so the full response items are
+        never held for the whole folder.
+        """
+        return ItemIndex(SPFile.from_dict(item) for item in self.iter_items(
+            folder, "File", select=SPFile.fields(), page_size=page_size))
+
+    def folder_index(self, folder=DEFAULT_FOLDER,
+                     page_size=DEFAULT_PAGE_SIZE):
+        """ Get sub-folders of a folder as `SPFolder` items indexed by name"""
+        return ItemIndex(SPFolder.from_dict(item) for item in self.iter_items(
+            folder, "Folder", select=SPFolder.fields(), page_size=page_size))
+
+    def walk(self, folder=DEFAULT_FOLDER, max_depth=None, include=None,
+             exclude=None, include_dirs=None, exclude_dirs=None,
+             workers=DEFAULT_WALK_WORKERS):
+        """
+        Walk remote folder tree, like `os.walk`
+
+        Sub-folders are listed concurrently on a bounded pool and results
+        are yielded as they arrive (not in tree order). As with `os.walk`,
+        removing names from the yielded sub-folder list prunes the walk.
+        Closing the generator early cancels listings not started yet.
+
+        :param folder: folder to start at
+        :param max_depth: levels below `folder` to descend (None: no limit)
+        :param include: file name globs to include (default all)
+        :param exclude: file name globs to exclude
+        :param include_dirs: folder name globs to descend into (default all)
+        :param exclude_dirs: folder name globs not to descend into
+        :param workers: max number of folders listed at once
+        :return: generator of (folder, sub-folder names, file names)
+        """
+        # pylint: disable=too-many-arguments,too-many-locals
+        # pylint: disable=too-many-positional-arguments
+        def list_folder(path, depth):
+            folders, files = self.folder_listing(path, NAME_FIELDS,
+                                                 NAME_FIELDS)
+            return path, depth, folders, files
+
+        include = compile_globs(include or ['*'])
+        exclude = compile_globs(exclude)
+        include_dirs = compile_globs(include_dirs or ['*'])
+        exclude_dirs = compile_globs(exclude_dirs)
+        queue = collections.deque([(folder.strip('/'), 0)])
+        running = set()
+        pool = ThreadPoolExecutor(max_workers=workers,
+                                  thread_name_prefix="sp-walk")
+        try:
+            while queue or running:
+                while queue and len(running) < workers * 2:
+                    running.add(pool.submit(list_folder, *queue.popleft()))
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, depth, folders, files = future.result()
+                    sub_folders = _matching(folders, include_dirs,
+                                            exclude_dirs)
+                    file_names = _matching(files, include, exclude)
+                    yield path, sub_folders, file_names
+                    if max_depth is None or depth < max_depth:
+                        queue.extend((f"{path}/{name}", depth + 1)
+                                     for name in sub_folders)
+        finally:
+            for future in running:
+                future.cancel()
+            pool.shutdown(wait=False)
 
     def list_folder_contents(self, folder=DEFAULT_FOLDER, sort=True):
         """ List files and folders in folder as just names"""
-        contents = self.list_files(folder) + self.list_folders(folder)
+        folders, files = self.folder_listing(folder, NAME_FIELDS,
+                                             NAME_FIELDS)
+        desc = f"item from folder '{folder}'"
+        contents = list(iter_strings_from_list(files, desc=desc)) + \
+            list(iter_strings_from_list(folders, desc=desc, suffix="/"))
         return sorted(contents) if sort else contents
 
     def list_folders(self, folder=DEFAULT_FOLDER):
@@ -109,9 +456,34 @@ class SharepointConnector:
     def _list_items(self, folder=DEFAULT_FOLDER, item_type="File",
                     **kwargs):
         """ Get a list of items of a specific type (just names)"""
-        items = self._get_items(folder, item_type)
+        items = self.iter_items(folder, item_type, select=NAME_FIELDS)
         desc = f"{item_type.lower()} from folder '{folder}'"
-        return strings_from_list(items, desc=desc, **kwargs)
+        names = list(iter_strings_from_list(items, desc=desc))
+        self.listing_cache.put(folder, item_type, names)
+        prefix = kwargs.get('prefix', "")
+        suffix = kwargs.get('suffix', "")
+        if prefix or suffix:
+            names = [f"{prefix}{name}{suffix}" for name in names]
+        return sorted(names) if kwargs.get('sort', True) else names
+
+    def _cached_names(self, folder, item_type):
+        """ Get set of item names in folder, from cache if possible"""
+        names = self.listing_cache.get(folder, item_type)
+        if names is None:
+            folders, files = self.folder_listing(folder, NAME_FIELDS,
+                                                 NAME_FIELDS)
+            items = folders if item_type == "Folder" else files
+            names = set(iter_strings_from_list(items))
+        return names
+
+    def prefetch(self, *folders):
+        """ Load listings of folders into listing cache"""
+        for folder in folders:
+            self.folder_listing(folder, NAME_FIELDS, NAME_FIELDS)
+
+    def invalidate(self, folder=None):
+        """ Drop cached listing of folder (or of all folders if None)"""
+        self.listing_cache.invalidate(folder)
 
     def file_exists(self, filename, folder=DEFAULT_FOLDER):
         """
@@ -121,8 +493,11 @@ class SharepointConnector:
         :param filename:
         :return: true if file exists
         """
-        files = self.list_files(folder)
-        return filename in files
+        return filename in self._cached_names(folder, "File")
+
+    def folder_exists(self, name, folder=DEFAULT_FOLDER):
+        """ Check if sub-folder `name` exists in a folder"""
+        return name in self._cached_names(folder, "Folder")
 
     def get_file_info(self, filename, folder=DEFAULT_FOLDER):
         """ get file """
@@ -139,23 +514,122 @@ class SharepointConnector:
         return ""
 
     def get_file(self, filename, folder=DEFAULT_FOLDER):
-        """ UNFINISHED get file """
-        if not self.file_exists(filename, folder):
-            LOG.error("File %s is not in folder %s", filename, folder)
-            return False
+        """
+        Get file contents as bytes
 
-        folder = urlencode(folder or "")
-        filename = urlencode(filename or "")
-        headers = self.headers(headers={
+        Reads whole file into memory - use `download_file` or
+        `iter_file_chunks` for large files
+        """
+        url = self.url.file(folder, filename, "/$value")
+        LOG.info("Getting file at url %s", url)
+        res = self.api_call("get", url, headers={
             "Accept": "application/octet-stream"
         })
-        url = f"{self.url.file(folder, filename)}"
-        LOG.info("Getting file at url %s", url)
-        res = self.api_call("get", url, headers=headers)
         if res.status_code < 400:
-            return res.text
-        LOG.error("ERROR: %s: '%s'", res.status_code, res.text)
-        return ""
+            return res.content
+        return False
+
+    def iter_file_chunks(self, filename, folder=DEFAULT_FOLDER,
+                         chunk_size=DEFAULT_DOWNLOAD_CHUNK_SIZE, start=0,
+                         end=None):
+        """
+        Stream file contents
+
+        :param filename: remote file name
+        :param folder: remote folder
+        :param chunk_size: size of chunks to yield
+        :param start: first byte to fetch
+        :param end: last byte to fetch (inclusive, None for end of file)
+        :return: generator of byte chunks
+        """
+        # pylint: disable=too-many-arguments
+        headers = {"Accept": "application/octet-stream"}
+        ranged = bool(start) or end is not None
+        if ranged:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+        res = self.api_call("get", self.url.file(folder, filename, "/$value"),
+                            headers=headers, stream=True,
+                            raise_on_error=True)
+        try:
+            if ranged and res.status_code != 206:
+                raise APICallFailedSharepointException(
+                    res.status_code, "Server ignored Range request")
+            yield from res.iter_content(chunk_size)
+        finally:
+            res.close()
+
+    def file_length(self, filename, folder=DEFAULT_FOLDER):
+        """ Get size of remote file in bytes"""
+        url = self.url.file(folder, filename, "?$select=Length")
+        res = self.api_call('get', url, raise_on_error=True)
+        data = from_json(res.text)
+        return int(data.get('d', data).get('Length', 0))
+
+    def download_file(self, filename, folder=DEFAULT_FOLDER, dest=None,
+                      parallel=1, part_size=DEFAULT_DOWNLOAD_PART_SIZE):
+        """
+        Download file to disk without holding it in memory
+
+        :param filename: remote file name
+        :param folder: remote folder
+        :param dest: local file or directory (defaults to current directory)
+        :param parallel: number of parallel Range requests to use for files
+                         larger than `part_size`
+        :param part_size: size of each ranged part
+        :return: path of downloaded file
+        """
+        # pylint: disable=too-many-arguments
+        dest = dest or "."
+        if os.path.isdir(dest):
+            dest = os.path.join(dest, filename)
+        partial = f"{dest}.part"
+        LOG.info("Downloading %s/%s to %s", folder, filename, dest)
+
+        try:
+            size = self.file_length(filename, folder) if parallel > 1 else 0
+            try:
+                if size > part_size:
+                    self._download_parts(filename, folder, partial, size,
+                                         parallel, part_size)
+                else:
+                    self._download_stream(filename, folder, partial)
+            except APICallFailedSharepointException as ex:
+                if size <= part_size or ex.code != 200:
+                    raise
+                LOG.info("Ranged download not supported, using single "
+                         "stream")
+                self._download_stream(filename, folder, partial)
+            os.replace(partial, dest)
+        except BaseException:
+            if os.path.exists(partial):
+                os.unlink(partial)
+            raise
+        return dest
+
+    def _download_stream(self, filename, folder, dest, start=0, end=None):
+        """ Stream (part of) a file into dest at `start` """
+        # pylint: disable=too-many-arguments
+        ranged = bool(start) or end is not None
+        with open(dest, 'r+b' if ranged else 'wb') as out:
+            out.seek(start)
+            for chunk in self.iter_file_chunks(filename, folder, start=start,
+                                               end=end):
+                out.write(chunk)
+
+    def _download_parts(self, filename, folder, dest, size, parallel,
+                        part_size):
+        """ Download file as parallel Range requests, written in place"""
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        with open(dest, 'wb') as out:
+            out.truncate(size)
+        ranges = [(start, min(start + part_size, size) - 1)
+                  for start in range(0, size, part_size)]
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            parts = [pool.submit(self._download_stream, filename, folder,
+                                 dest, start, end)
+                     for start, end in ranges]
+            for part in parts:
+                part.result()
 
     def check_in_file(self, filename, folder=DEFAULT_FOLDER,
                       comment="Auto Updated"):
@@ -164,7 +638,7 @@ class SharepointConnector:
                             f"/CheckIn(comment='{comment}',checkintype=0)")
         LOG.info("Checking in file: %s/%s", folder, filename)
         # LOG.info("Checking in URL: %s", url)
-        res = self.api_call('post', url)
+        res = self._post(url)
         return res
 
     def check_out_file(self, filename, folder=DEFAULT_FOLDER):
@@ -172,93 +646,254 @@ class SharepointConnector:
         url = self.url.file(folder, filename, "/CheckOut()")
         LOG.info("Checking out file: %s/%s", folder, filename)
         # LOG.info("Checking in URL: %s", url)
-        res = self.api_call('post', url)
+        res = self._post(url)
         return res
 
     def add_folder_path(self, full_folder, known_folders=None):
-        """ Add Full folder path as needed """
-        if not known_folders:
-            known_folders = []
-        folder_parts = full_folder.split('/')
-        folder = ""
+        """
+        Add Full folder path as needed (in a single $batch request)
+
+        :param full_folder: folder path to create
+        :param known_folders: folders known to exist (set or list)
+        :return: list of folders a create request was sent for
+        """
+        known_folders = set(known_folders or ())
         added = []
-        for part in folder_parts:
-            folder = f"{folder}/{part}" if folder else part
-            if folder in known_folders:
-                continue
-            self.add_folder(folder)
-            added.append(folder)
+        with self.batch():
+            for folder in folder_prefixes(full_folder):
+                if folder in known_folders:
+                    continue
+                self.add_folder(folder)
+                added.append(folder)
         return added
 
+    def ensure_folders(self, folders, workers=DEFAULT_PLANNER_WORKERS):
+        """
+        Create missing folders of many folder paths, each folder once
+
+        Existing folders are found with one listing per parent and are
+        never POSTed (see `FolderPlanner`).
+
+        :return: `FolderPlanner` (with `created`, `existing` and `failed`)
+        """
+        planner = FolderPlanner(self, workers)
+        planner.plan(folders)
+        return planner
+
     def add_folder(self, folder=DEFAULT_FOLDER):
-        """ Ensure folder exists"""
+        """
+        Ensure folder exists
+
+        :return: response text, or a `BatchOperation` inside a batch
+        """
         LOG.info("Adding folder %s", folder)
-        data = json.dumps({
-            "__metadata": {
-                "type": "SP.Folder"
-            },
-            "ServerRelativeUrl": f"{self.url.site_uri}/{folder}"
-        })
+        data = folder_body(self.url.site_uri, folder)
         url = f"{self.url.web}/folders"
 
         LOG.debug("URL: %s", url)
         LOG.debug("data: %s", data)
-        res = self.api_call('post', url,
-                            data=data,
-                            content_type="application/json;odata=verbose",
-                            headers={
-                                "Content-Length": f"{len(data)}",
-                            })
-        LOG.debug("%s::%s::%s", res.status_code, res.headers, res.text)
+        parent, _, name = folder.strip('/').rpartition('/')
+
+        def added(res):
+            LOG.debug("%s::%s::%s", res.status_code, res.headers, res.text)
+            if res.status_code < 400:
+                self.listing_cache.add(parent, "Folder", name)
+
+        res = self._post(url, data=data,
+                         content_type="application/json;odata=verbose")
+        if self.active_batch is not None:
+            res.on_done(added)
+            return res
+        added(res)
         return res.text
 
     def upload_file(self, filename, target_file=None, folder=DEFAULT_FOLDER,
                     check_out=True):
         """ Upload file to sharepoint folder """
-        if not os.path.isfile(filename):
-            LOG.error("Local File %s does not exist, cannot upload", filename)
+        source = upload_source(filename, target_file)
+        if source is None:
             return False
-        f_info = os.stat(filename)
-        if not target_file:
-            target_file = os.path.basename(filename)
+        size, target_file = source
 
         if self.file_exists(target_file, folder):
-            self.check_in_file(filename=target_file, folder=folder)
+            with self._unbatched():
+                self.check_in_file(filename=target_file, folder=folder)
 
         LOG.error("Uploading %s to %s/%s", filename, folder, target_file)
 
-        file_uri = urlencode(
-            f"{self.url.site_uri}/{folder}/{target_file}")
+        if size > self.chunk_threshold:
+            res = self.upload_file_chunked(filename, target_file, folder)
+            self.listing_cache.add(folder, "File", target_file)
+            if check_out:
+                self.check_out_file(target_file, folder)
+            return res
 
-        url = self.url.folder(folder, f"/Files/"
-                                      f"Add(url='{file_uri}',overwrite=true)")
+        url = add_file_url(self.url, folder, target_file)
 
-        headers = self.headers("application/octet-stream", headers={
-            "Content-Length": f"{f_info.st_size}"
-        })
-        # print(f"Headers: \n{to_yaml(headers)}\n---")
-        # print(f"url={url}")
         with open(filename, 'rb') as data:
-            res = requests.post(url, data=data, headers=headers)
+            res = self.api_call('post', url, data=data,
+                                content_type="application/octet-stream",
+                                headers={"Content-Length": f"{size}"})
 
         if res.status_code < 400:
+            self.listing_cache.add(folder, "File", target_file)
             if check_out:
                 self.check_out_file(target_file, folder)
-            return res
-        LOG.error("ERROR: %s: '%s'", res.status_code, res.text)
+        return res
+
+    def upload_file_chunked(self, filename, target_file=None,
+                            folder=DEFAULT_FOLDER, chunk_size=None,
+                            upload_id=None, offset=0):
+        """
+        Upload file to sharepoint folder in chunks using an upload session
+
+        Only one chunk is held in memory at a time. Chunks are retried by
+        `api_call`; as `ContinueUpload` is not idempotent, a failed chunk is
+        followed by a query of the offset the server committed. If the
+        upload fails, `ChunkedUploadFailedSharepointException` is raised
+        with the upload id and committed offset. Passing the id back in (or
+        uploading the same file again) resumes at the offset the server
+        reports, or starts over if the upload session is gone.
+
+        :param filename: local file to upload
+        :param target_file: remote file name (defaults to local name)
+        :param folder: remote folder
+        :param chunk_size: chunk size in bytes (defaults to `chunk_size`)
+        :param upload_id: upload session to resume
+        :param offset: committed offset of upload session to resume
+        :return: response of the final request
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        f_info = os.stat(filename)
+        if not target_file:
+            target_file = os.path.basename(filename)
+        chunk_size = chunk_size or self.chunk_size
+        key = (os.path.abspath(filename), folder, target_file,
+               f_info.st_size, f_info.st_mtime_ns)
+        with self._upload_sessions_lock:
+            saved = self._upload_sessions.pop(key, None)
+        if upload_id is None and saved:
+            upload_id, offset = saved
+        started = False
+        if upload_id is not None:
+            committed = self.upload_status(folder, target_file, upload_id)
+            if committed is None:
+                LOG.info("Cannot resume upload of %s, restarting", filename)
+                upload_id = None
+            else:
+                LOG.info("Resuming upload of %s at offset %d", filename,
+                         committed)
+                offset, started = committed, True
+        if upload_id is None:
+            upload_id, offset = str(uuid.uuid4()), 0
+
+        try:
+            return self._upload_chunks(filename, target_file, folder,
+                                       f_info.st_size, chunk_size,
+                                       upload_id, offset, started)
+        except ChunkedUploadFailedSharepointException as ex:
+            with self._upload_sessions_lock:
+                self._upload_sessions[key] = (ex.upload_id, ex.offset)
+            raise
+
+    def upload_status(self, folder, target_file, upload_id):
+        """
+        Get the offset committed to an upload session
+
+        :return: committed offset, or None if the upload session is gone
+        """
+        url = self.url.file(folder, target_file,
+                            f"/GetUploadStatus(uploadId=guid'{upload_id}')")
+        try:
+            res = self.api_call('get', url)
+        except requests.RequestException as ex:
+            LOG.info("Upload status of %s/%s failed: %s", folder,
+                     target_file, ex)
+            return None
+        if res.status_code >= 400:
+            return None
+        data = from_json(res.text)
+        data = data.get('d', data)
+        data = data.get('GetUploadStatus', data)
+        expected = str(data.get('ExpectedContentRange', "") or "")
+        start = expected.partition('-')[0].strip()
+        return int(start) if start.isdigit() else None
+
+    def _upload_chunks(self, filename, target_file, folder, size,
+                       chunk_size, upload_id, offset, started=False):
+        """ Send file chunks starting at committed offset """
+        # Upload state (offset, started) is carried across loop passes
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        # pylint: disable=too-many-locals
+        if not started:
+            self._upload_chunk(add_file_url(self.url, folder, target_file), b"",
+                               upload_id, 0)
+        with open(filename, 'rb') as data:
+            while True:
+                data.seek(offset)
+                chunk = data.read(chunk_size)
+                last = offset + len(chunk) >= size
+                if not started:
+                    action = "StartUpload"
+                    suffix = f"/StartUpload(uploadId=guid'{upload_id}')"
+                elif not last:
+                    action = "ContinueUpload"
+                    suffix = f"/ContinueUpload(uploadId=guid'{upload_id}'," \
+                             f"fileOffset={offset})"
+                else:
+                    action = "FinishUpload"
+                    suffix = f"/FinishUpload(uploadId=guid'{upload_id}'," \
+                             f"fileOffset={offset})"
+                url = self.url.file(folder, target_file, suffix)
+                LOG.debug("%s %s/%s at offset %d (%d bytes)", action, folder,
+                          target_file, offset, len(chunk))
+                try:
+                    res = self._upload_chunk(url, chunk, upload_id, offset)
+                except ChunkedUploadFailedSharepointException as ex:
+                    committed = self.upload_status(folder, target_file,
+                                                   upload_id)
+                    if committed is None or committed <= offset:
+                        raise ChunkedUploadFailedSharepointException(
+                            ex.code, ex.err_msg, upload_id,
+                            offset if committed is None else committed) \
+                            from ex
+                    # The chunk was committed, only the response was lost
+                    LOG.info("%s at offset %d failed, but server committed "
+                             "%d bytes, continuing", action, offset,
+                             committed)
+                    offset, started = committed, True
+                    continue
+                if action == "FinishUpload":
+                    return res
+                # If the whole file fit in the first chunk, the next pass
+                # commits it with an empty FinishUpload
+                offset += len(chunk)
+                started = True
+
+    def _upload_chunk(self, url, chunk, upload_id, offset):
+        """ Post a single chunk (retried by `api_call`)"""
+        try:
+            res = self.api_call('post', url, data=chunk,
+                                content_type="application/octet-stream",
+                                headers={"Content-Length": f"{len(chunk)}"})
+        except requests.RequestException as ex:
+            raise ChunkedUploadFailedSharepointException(
+                None, str(ex), upload_id, offset) from ex
+        if res.status_code >= 400:
+            raise ChunkedUploadFailedSharepointException(
+                res.status_code, res.text, upload_id, offset)
         return res
 
     def upload_page(self, filename, target_file=None, folder=DEFAULT_FOLDER,
                     check_out=True):
         """ Upload file to sharepoint folder """
-        if not os.path.isfile(filename):
-            LOG.error("Local File %s does not exist, cannot upload", filename)
+        source = upload_source(filename, target_file)
+        if source is None:
             return False
-        f_info = os.stat(filename)
-        if not target_file:
-            target_file = os.path.basename(filename)
+        size, target_file = source
 
-        self.check_in_file(filename=target_file, folder=folder)
+        with self._unbatched():
+            self.check_in_file(filename=target_file, folder=folder)
 
         LOG.error("Uploading %s to %s/%s", filename, folder, target_file)
 
@@ -271,31 +906,19 @@ class SharepointConnector:
                                       f"templatefiletype=0"
                                       f")")
 
-        headers = self.headers("application/octet-stream", headers={
-            "Content-Length": f"{f_info.st_size}"
-        })
-        # print(f"Headers: \n{to_yaml(headers)}\n---")
-        # print(f"url={url}")
         with open(filename, 'rb') as data:
-            res = requests.post(url, data=data, headers=headers)
+            res = self.api_call('post', url, data=data,
+                                content_type="application/octet-stream",
+                                headers={"Content-Length": f"{size}"})
 
         if res.status_code < 400:
+            self.listing_cache.add(folder, "File", target_file)
             if check_out:
                 self.check_out_file(target_file, folder)
-            return res
-        LOG.error("ERROR: %s: '%s'", res.status_code, res.text)
         return res
 
     def headers(self, content_type=None, headers=None, **more_headers):
         """ Generate request headers"""
-        if content_type is None:
-            content_type = self.DEFAULT_CONTENT_TYPE
-        if headers is None:
-            headers = {}
-
-        req_headers = {
-            "Authorization": f"Bearer {self.auth.access_token}",
-            "Accept": "application/json;odata=verbose",
-            "Content-Type": content_type
-        }
-        return {**req_headers, **more_headers, **headers}
+        return request_headers(self.auth.access_token, self.accept,
+                               content_type or self.DEFAULT_CONTENT_TYPE,
+                               headers, **more_headers)
@@ -15,3 +15,14 @@ class APICallFailedSharepointException(Exception):
         super().__init__(f"Error: {code}: {err_msg}")
         self.code = code
         self.err_msg = err_msg
+
+
+class ChunkedUploadFailedSharepointException(
+        APICallFailedSharepointException):
+    """ Chunked upload failed, can be resumed from `offset` """
+
+    def __init__(self, code, err_msg, upload_id, offset):
+        """ Initializer"""
+        super().__init__(code, err_msg)
+        self.upload_id = upload_id
+        self.offset = offset
@@ -0,0 +1,154 @@
+"""
+Folder creation planner
+
+Works out which remote folders are missing for a set of folder paths and
+creates each of them once. Folders are handled level by level: existing
+sub-folders are found with one listing per parent folder, and the missing
+ones are created with $batch requests sent in parallel within the level.
+Folders that already exist are never POSTed, so read-only parent folders do
+not cause `403` errors.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .batch import DEFAULT_BATCH_SIZE
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_PLANNER_WORKERS = 8
+
+
+def folder_prefixes(folder):
+    """ Get all folder paths leading to folder (including itself)"""
+    parts = [part for part in folder.strip('/').split('/') if part]
+    return ['/'.join(parts[:index]) for index in range(1, len(parts) + 1)]
+
+
+class FolderPlanner:
+    """ Creates missing remote folders, each folder at most once """
+
+    def __init__(self, connector, workers=DEFAULT_PLANNER_WORKERS,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Initialize Folder Planner
+
+        :param connector: `SharepointConnector` to create folders with
+        :param workers: max number of listings/batches sent at once
+        :param batch_size: max number of folders created per request
+        """
+        self.connector = connector
+        self.workers = workers
+        self.batch_size = batch_size
+        self.existing = set()
+        self.created = set()
+        self.failed = {}
+        self._lock = threading.RLock()
+
+    def ready(self, folder):
+        """ True if folder is known to exist"""
+        folder = folder.strip('/')
+        return folder in self.existing or folder in self.created
+
+    def exists(self, folder):
+        """
+        Check if a folder exists without requesting the folder itself
+
+        Each level is looked up in the (cached) sub-folder listing of its
+        parent, from the top down, so a missing folder is never listed.
+
+        :return: True if folder exists
+        """
+        for path in folder_prefixes(folder):
+            if self.ready(path):
+                continue
+            parent, _, name = path.rpartition('/')
+            if name not in self._list(parent):
+                return False
+            with self._lock:
+                self.existing.add(path)
+        return True
+
+    def ensure(self, folder):
+        """
+        Make sure a single folder exists (incremental `plan`)
+
+        :return: True if folder exists
+        """
+        if not self.ready(folder):
+            self.plan([folder])
+        return self.ready(folder)
+
+    def plan(self, folders):
+        """
+        Create all missing folders of the given folder paths
+
+        :param folders: iterable of folder paths (parents are implied)
+        :return: set of folders created by this call
+        """
+        with self._lock:
+            levels = {}
+            for folder in set(folders):
+                for path in folder_prefixes(folder):
+                    if not self.ready(path) and path not in self.failed:
+                        levels.setdefault(path.count('/'), set()).add(path)
+            created = set()
+            with ThreadPoolExecutor(max_workers=self.workers,
+                                    thread_name_prefix="sp-folders") as pool:
+                for depth in sorted(levels):
+                    pending = [path for path in sorted(levels[depth])
+                               if not self._parent_failed(path)]
+                    missing = self._missing(pending, pool)
+                    created.update(self._create(missing, pool))
+            return created
+
+    def _parent_failed(self, folder):
+        """ Check if a parent folder could not be created"""
+        parent = folder.rpartition('/')[0]
+        if parent and parent in self.failed:
+            self.failed[folder] = f"parent folder '{parent}' is missing"
+            return True
+        return False
+
+    def _missing(self, folders, pool):
+        """ Get folders that do not exist yet (one listing per parent)"""
+        parents = {}
+        for folder in folders:
+            parent, _, name = folder.rpartition('/')
+            parents.setdefault(parent, []).append((folder, name))
+        # Folders created by us have no sub-folders yet
+        listed = [parent for parent in parents if parent not in self.created]
+        for parent, names in zip(listed, pool.map(self._list, listed)):
+            for folder, name in parents[parent]:
+                if name in names:
+                    self.existing.add(folder)
+        return [folder for folder in folders if folder not in self.existing]
+
+    def _list(self, parent):
+        """ Get names of sub-folders of parent"""
+        # pylint: disable=protected-access
+        return self.connector._cached_names(parent, "Folder")
+
+    def _create(self, folders, pool):
+        """ Create folders of one level, in parallel batches"""
+        chunks = [folders[index:index + self.batch_size]
+                  for index in range(0, len(folders), self.batch_size)]
+        created = set()
+        for chunk, operations in zip(chunks, pool.map(self._add, chunks)):
+            for folder, operation in zip(chunk, operations):
+                if operation.ok:
+                    created.add(folder)
+                elif operation.status_code == 403:
+                    # Not allowed to create it here - it may still exist and
+                    # be writable further down, so keep going
+                    LOG.debug("No permission to create folder '%s'", folder)
+                    self.existing.add(folder)
+                else:
+                    self.failed[folder] = f"HTTP {operation.status_code}"
+        self.created.update(created)
+        return created
+
+    def _add(self, folders):
+        """ Create folders in a single $batch request (runs on worker)"""
+        with self.connector.batch():
+            return [self.connector.add_folder(folder) for folder in folders]
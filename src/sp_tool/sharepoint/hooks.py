@@ -0,0 +1,123 @@
+"""
+Request hooks
+
+`RequestHooks` wraps `send` of a `requests.Session`, so callbacks see every
+HTTP call made through it: API calls, uploads and downloads of the
+connector as well as realm discovery and token requests of the
+authenticator, which share the connector's session. Callbacks get a
+`RequestEvent` before the request is sent and again once the response (or
+error) is in. Retries decided by `SharepointConnector.api_call` are
+reported separately, since on the wire a retry is just another request.
+"""
+import threading
+import time
+
+
+class RequestEvent:
+    """ A single HTTP request, as seen by hooks """
+    __slots__ = ("request", "stream", "response", "error", "started",
+                 "elapsed", "data")
+
+    def __init__(self, request, stream=False):
+        """
+        Initialize
+
+        :param request: `requests.PreparedRequest` being sent
+        :param stream: true if the response body is streamed (not read yet
+                       when the post-request hooks run)
+        """
+        self.request = request
+        self.stream = stream
+        self.response = None
+        self.error = None
+        self.started = time.time()
+        self.elapsed = None
+        self.data = {}  # free for hooks to pass state from before to after
+
+    @property
+    def method(self):
+        """ HTTP method """
+        return self.request.method
+
+    @property
+    def url(self):
+        """ Request URL """
+        return self.request.url
+
+    @property
+    def status_code(self):
+        """ Response status (None if the request failed)"""
+        return self.response.status_code if self.response is not None \
+            else None
+
+
+class RequestHooks:
+    """ Pre-request, post-request and retry callbacks of a session """
+
+    def __init__(self):
+        """ Initialize """
+        self.before = []
+        self.after = []
+        self.retries = []
+        self._lock = threading.Lock()
+
+    def add(self, before=None, after=None, retry=None):
+        """
+        Register callbacks
+
+        :param before: `before(event)` called before a request is sent
+        :param after: `after(event)` called after the response (or error)
+        :param retry: `retry(url, status_code, delay)` called before a
+                      failed request is retried (status None for connection
+                      errors)
+        """
+        with self._lock:
+            for hooks, hook in ((self.before, before), (self.after, after),
+                                (self.retries, retry)):
+                if hook is not None:
+                    hooks.append(hook)
+
+    def add_collector(self, collector):
+        """ Register a collector's `before`, `after` and `retry` methods """
+        self.add(getattr(collector, "before", None),
+                 getattr(collector, "after", None),
+                 getattr(collector, "retry", None))
+
+    def install(self, session):
+        """
+        Call hooks for every request sent through `session`
+
+        A session carries one `RequestHooks`; installing is a no-op if this
+        one is already installed.
+        """
+        installed = getattr(session, "request_hooks", None)
+        if installed is self:
+            return session
+        if installed is not None:
+            raise Exception("Session already has request hooks installed")
+        send = session.send
+
+        def hooked_send(request, **kwargs):
+            event = RequestEvent(request, kwargs.get("stream", False))
+            for hook in self.before:
+                hook(event)
+            started = time.perf_counter()
+            try:
+                event.response = send(request, **kwargs)
+                return event.response
+            except Exception as ex:
+                event.error = ex
+                raise
+            finally:
+                event.elapsed = time.perf_counter() - started
+                for hook in self.after:
+                    hook(event)
+
+        session.send = hooked_send
+        session.request_hooks = self
+        return session
+
+    def retried(self, url, status_code=None, delay=0.0):
+        """ Report a retry to the retry hooks """
+        for hook in self.retries:
+            hook(url, status_code, delay)
@@ -0,0 +1,131 @@
+"""
+Compact file and folder items
+
+Listing responses carry many properties (and, in verbose mode, metadata and
+deferred links) per item. `SPFile` and `SPFolder` keep only the fields the
+library uses, in `__slots__`, and `ItemIndex` holds them by name for O(1)
+lookups.
+"""
+
+
+class SPItem:
+    """ Base of file and folder items """
+    __slots__ = ("name", "server_relative_url")
+    FIELDS = {"Name": "name", "ServerRelativeUrl": "server_relative_url"}
+
+    def __init__(self, name, server_relative_url=None):
+        """ Initialize """
+        self.name = name
+        self.server_relative_url = server_relative_url
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Build item from a decoded response item (any metadata mode)"""
+        data = data.get('d', data)
+        return cls(**{attr: data.get(field, None)
+                      for field, attr in cls.FIELDS.items()})
+
+    @classmethod
+    def fields(cls):
+        """ Response fields to `$select` for this item type"""
+        return tuple(cls.FIELDS)
+
+    def get(self, field, default=None):
+        """ Get value by response field name (like the decoded dict)"""
+        attr = self.FIELDS.get(field, None)
+        value = getattr(self, attr) if attr else None
+        return default if value is None else value
+
+    def __eq__(self, other):
+        """ Items are equal if all fields are equal """
+        return type(self) is type(other) and all(
+            getattr(self, attr) == getattr(other, attr)
+            for attr in self.FIELDS.values())
+
+    def __hash__(self):
+        """ Hash by type and server relative url """
+        return hash((type(self).__name__, self.server_relative_url,
+                     self.name))
+
+    def __repr__(self):
+        """ Representation """
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class SPFile(SPItem):
+    """ File item """
+    __slots__ = ("length", "time_last_modified", "etag", "check_out_type")
+    FIELDS = {**SPItem.FIELDS, "Length": "length",
+              "TimeLastModified": "time_last_modified", "ETag": "etag",
+              "CheckOutType": "check_out_type"}
+    CHECK_OUT_NONE = 2
+
+    def __init__(self, name, server_relative_url=None, length=None,
+                 time_last_modified=None, etag=None, check_out_type=None):
+        """ Initialize """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        super().__init__(name, server_relative_url)
+        self.length = int(length) if length is not None else None
+        self.time_last_modified = time_last_modified
+        self.etag = etag
+        self.check_out_type = check_out_type
+
+    @property
+    def checked_out(self):
+        """ True if the file is checked out (None if not known)"""
+        if self.check_out_type is None:
+            return None
+        return int(self.check_out_type) != self.CHECK_OUT_NONE
+
+
+class SPFolder(SPItem):
+    """ Folder item """
+    __slots__ = ("item_count",)
+    FIELDS = {**SPItem.FIELDS, "ItemCount": "item_count"}
+
+    def __init__(self, name, server_relative_url=None, item_count=None):
+        """ Initialize """
+        super().__init__(name, server_relative_url)
+        self.item_count = item_count
+
+
+class ItemIndex:
+    """ Items indexed by name, in listing order """
+
+    def __init__(self, items=()):
+        """ Initialize """
+        self._items = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        """ Add (or replace) item """
+        self._items[item.name] = item
+
+    def discard(self, name):
+        """ Remove item by name, if present """
+        self._items.pop(name, None)
+
+    def get(self, name, default=None):
+        """ Get item by name """
+        return self._items.get(name, default)
+
+    def names(self, sort=True):
+        """ List of item names """
+        return sorted(self._items) if sort else list(self._items)
+
+    def __getitem__(self, name):
+        """ Get item by name """
+        return self._items[name]
+
+    def __contains__(self, name):
+        """ Check if an item with given name exists """
+        return name in self._items
+
+    def __iter__(self):
+        """ Iterate over items """
+        return iter(self._items.values())
+
+    def __len__(self):
+        """ Number of items """
+        return len(self._items)
@@ -0,0 +1,95 @@
+"""
+Folder listing cache
+
+Keeps the names of files and sub-folders of recently listed folders so
+existence checks do not have to list the folder again. Entries expire after
+a TTL and the least recently used folders are evicted once the cache is
+full. Writes made through the connector update cached listings in place.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_SIZE = 1024
+
+
+def _key(folder):
+    """ Normalized cache key for a folder"""
+    return (folder or "").strip('/')
+
+
+class ListingCache:
+    """ Thread-safe TTL/LRU cache of folder listings """
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL, max_folders=DEFAULT_CACHE_SIZE,
+                 clock=time.monotonic):
+        """
+        Initialize Listing Cache
+
+        :param ttl: seconds a listing stays valid (0 disables the cache)
+        :param max_folders: max number of folder listings kept
+        :param clock: time source (for testing)
+        """
+        self.ttl = ttl
+        self.max_folders = max_folders
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """ True if the cache keeps anything"""
+        return self.ttl > 0 and self.max_folders > 0
+
+    def get(self, folder, item_type):
+        """
+        Get cached names of given item type ("File" or "Folder")
+
+        :return: set of names, or None if not cached
+        """
+        key = (_key(folder), item_type)
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return None
+            stamp, names = entry
+            if self.clock() - stamp > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return names
+
+    def put(self, folder, item_type, names):
+        """ Store listing of given item type for folder"""
+        if not self.enabled:
+            return
+        key = (_key(folder), item_type)
+        with self._lock:
+            self._entries[key] = (self.clock(), set(names))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_folders:
+                self._entries.popitem(last=False)
+
+    def add(self, folder, item_type, name):
+        """ Record a new item in a cached listing (write-through)"""
+        with self._lock:
+            entry = self._entries.get((_key(folder), item_type), None)
+            if entry is not None:
+                entry[1].add(name)
+
+    def discard(self, folder, item_type, name):
+        """ Remove an item from a cached listing"""
+        with self._lock:
+            entry = self._entries.get((_key(folder), item_type), None)
+            if entry is not None:
+                entry[1].discard(name)
+
+    def invalidate(self, folder=None):
+        """ Drop cached listings of folder (or all folders if None)"""
+        with self._lock:
+            if folder is None:
+                self._entries.clear()
+                return
+            for item_type in ("File", "Folder"):
+                self._entries.pop((_key(folder), item_type), None)
@@ -0,0 +1,264 @@
+"""
+Request metrics
+
+`RequestMetrics` is a `RequestHooks` collector: it counts requests by
+endpoint kind (see `endpoint_kind`), method and status, sums bytes sent
+and received, keeps a latency histogram per kind and counts retries and
+throttled responses. Results can be read as a JSON summary or in the
+Prometheus text format (i.e. for the node exporter textfile collector).
+"""
+import bisect
+import json
+import os
+import re
+import threading
+import urllib.parse
+
+from ..utils import atomic_write
+from .retry import THROTTLE_STATUS
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0)
+METRICS_PREFIX = "sp_tool"
+ENDPOINT_KINDS = (
+    ("discovery", re.compile(r"/_vti_bin/client\.svc")),
+    ("token", re.compile(r"/tokens/oauth/2")),
+    ("batch", re.compile(r"/_api/\$batch")),
+    ("upload_chunk", re.compile(r"/(start|continue|finish)upload\(")),
+    ("upload", re.compile(r"/files/add(templatefile)?\(")),
+    ("download", re.compile(r"/\$value$")),
+    ("check_in", re.compile(r"/checkin\(")),
+    ("check_out", re.compile(r"/checkout\(")),
+    ("add_folder", re.compile(r"/_api/web/folders$")),
+    ("listing", re.compile(r"getfolderbyserverrelativepath|"
+                           r"renderlistdataasstream")),
+    ("file_info", re.compile(r"getfilebyserverrelativepath")),
+)
+
+
+def endpoint_kind(url):
+    """ Kind of endpoint a request URL calls (i.e. "upload", "listing")"""
+    path = urllib.parse.unquote(urllib.parse.urlsplit(url).path).lower()
+    for kind, pattern in ENDPOINT_KINDS:
+        if pattern.search(path):
+            return kind
+    return "other"
+
+
+def request_size(request):
+    """ Bytes in a prepared request's body """
+    length = request.headers.get("Content-Length", None)
+    if length is not None:
+        return int(length)
+    if isinstance(request.body, (bytes, str)):
+        return len(request.body)
+    return 0
+
+
+def response_size(response, stream=False):
+    """ Bytes in a response body (Content-Length if streamed)"""
+    if not stream:
+        return len(response.content)
+    return int(response.headers.get("Content-Length", 0) or 0)
+
+
+class LatencyHistogram:
+    """ Cumulative latency histogram (Prometheus style buckets)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """ Initialize """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        """ Add an observation """
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def count(self):
+        """ Number of observations """
+        return sum(self.counts)
+
+    def cumulative(self):
+        """ List of (upper bound, observations <= bound), last is +Inf """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, quantile):
+        """ Estimate a quantile (upper bound of the bucket it falls in)"""
+        target = quantile * self.count
+        for bound, total in self.cumulative():
+            if total >= target and total:
+                return min(bound, self.max)
+        return 0.0
+
+    def summary(self):
+        """ JSON-friendly summary """
+        count = self.count
+        return {"count": count, "sum": self.sum,
+                "mean": self.sum / count if count else 0.0,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9),
+                "p99": self.quantile(0.99), "max": self.max}
+
+    def to_prometheus(self, metric, labels):
+        """ Prometheus bucket, sum and count lines of `metric` """
+        lines = []
+        for bound, total in self.cumulative():
+            bound = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f'{metric}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{metric}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class _KindStats:
+    """ Counters of one endpoint kind """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, buckets):
+        """ Initialize """
+        self.requests = {}  # (method, status) -> count
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.errors = 0
+        self.throttled = 0
+        self.retries = {}  # reason -> count
+        self.latency = LatencyHistogram(buckets)
+
+
+class RequestMetrics:
+    """ Collector of request counts, sizes, latencies and retries """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, prefix=METRICS_PREFIX):
+        """
+        Initialize
+
+        :param buckets: latency histogram bucket bounds (seconds)
+        :param prefix: prefix of Prometheus metric names
+        """
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self._kinds = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, kind):
+        """ Get counters of kind (call with lock held)"""
+        stats = self._kinds.get(kind, None)
+        if stats is None:
+            stats = self._kinds[kind] = _KindStats(self.buckets)
+        return stats
+
+    def after(self, event):
+        """ Post-request hook: record a finished request """
+        kind = endpoint_kind(event.url)
+        sent = request_size(event.request)
+        received = response_size(event.response, event.stream) \
+            if event.response is not None else 0
+        status = event.status_code
+        with self._lock:
+            stats = self._stats(kind)
+            key = (event.method, str(status) if status else "error")
+            stats.requests[key] = stats.requests.get(key, 0) + 1
+            stats.bytes_sent += sent
+            stats.bytes_received += received
+            stats.latency.observe(event.elapsed)
+            if event.error is not None:
+                stats.errors += 1
+            elif status in THROTTLE_STATUS:
+                stats.throttled += 1
+
+    def retry(self, url, status_code=None, _delay=0.0):
+        """ Retry hook: count a retry by reason (status or "connection")"""
+        reason = str(status_code) if status_code else "connection"
+        with self._lock:
+            retries = self._stats(endpoint_kind(url)).retries
+            retries[reason] = retries.get(reason, 0) + 1
+
+    def summary(self):
+        """ Metrics as a JSON-friendly dict (per kind and totals)"""
+        kinds = {}
+        totals = {"requests": 0, "bytes_sent": 0, "bytes_received": 0,
+                  "errors": 0, "throttled": 0, "retries": 0, "seconds": 0.0}
+        with self._lock:
+            for kind, stats in sorted(self._kinds.items()):
+                by_status = {}
+                for (_method, status), count in stats.requests.items():
+                    by_status[status] = by_status.get(status, 0) + count
+                kinds[kind] = {
+                    "requests": sum(stats.requests.values()),
+                    "by_status": by_status,
+                    "bytes_sent": stats.bytes_sent,
+                    "bytes_received": stats.bytes_received,
+                    "errors": stats.errors,
+                    "throttled": stats.throttled,
+                    "retries": sum(stats.retries.values()),
+                    "latency": stats.latency.summary()}
+                for name in totals:
+                    if name != "seconds":
+                        totals[name] += kinds[kind][name]
+                totals["seconds"] += stats.latency.sum
+        return {"totals": totals, "kinds": kinds}
+
+    def to_json(self):
+        """ JSON summary """
+        return json.dumps(self.summary(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """ Metrics in the Prometheus text exposition format """
+        name = self.prefix
+        lines = []
+
+        def family(metric, metric_type, help_text):
+            lines.extend([f"# HELP {name}_{metric} {help_text}",
+                          f"# TYPE {name}_{metric} {metric_type}"])
+
+        with self._lock:
+            kinds = sorted(self._kinds.items())
+            family("requests_total", "counter", "HTTP requests sent")
+            for kind, stats in kinds:
+                for (method, status), count in sorted(stats.requests.items()):
+                    lines.append(f'{name}_requests_total{{kind="{kind}",'
+                                 f'method="{method}",status="{status}"}} '
+                                 f'{count}')
+            for metric, attr, help_text in (
+                    ("request_bytes_total", "bytes_sent",
+                     "Bytes sent in request bodies"),
+                    ("response_bytes_total", "bytes_received",
+                     "Bytes received in response bodies"),
+                    ("request_errors_total", "errors",
+                     "Requests that failed without a response"),
+                    ("throttled_total", "throttled",
+                     "Throttled (429/503) responses")):
+                family(metric, "counter", help_text)
+                for kind, stats in kinds:
+                    lines.append(f'{name}_{metric}{{kind="{kind}"}} '
+                                 f'{getattr(stats, attr)}')
+            family("retries_total", "counter", "Requests sent again")
+            for kind, stats in kinds:
+                for reason, count in sorted(stats.retries.items()):
+                    lines.append(f'{name}_retries_total{{kind="{kind}",'
+                                 f'reason="{reason}"}} {count}')
+            family("request_duration_seconds", "histogram",
+                   "Request latency")
+            for kind, stats in kinds:
+                lines.extend(stats.latency.to_prometheus(
+                    f"{name}_request_duration_seconds", f'kind="{kind}"'))
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        """ Atomically write the JSON summary to `path` """
+        with atomic_write(os.path.expanduser(path), mode=0o644) as out:
+            out.write(self.to_json() + "\n")
+
+    def write_prometheus(self, path):
+        """ Atomically write Prometheus text format metrics to `path` """
+        with atomic_write(os.path.expanduser(path), mode=0o644) as out:
+            out.write(self.to_prometheus())
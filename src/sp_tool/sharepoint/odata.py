@@ -0,0 +1,12 @@
+"""
+OData response formats
+
+Kept free of heavy imports, so the CLI can offer the metadata modes without
+loading the connector.
+"""
+DEFAULT_METADATA = "verbose"
+METADATA_ACCEPT = {
+    "verbose": "application/json;odata=verbose",
+    "minimal": "application/json;odata=minimalmetadata",
+    "nometadata": "application/json;odata=nometadata"
+}
@@ -0,0 +1,275 @@
+"""
+Retry policy and adaptive concurrency
+
+`RetryPolicy` decides if and when a failed request is sent again: throttled
+responses (429/503) wait as long as their `Retry-After` header asks, other
+transient errors back off exponentially with full jitter.
+
+`AdaptiveLimiter` bounds the number of requests in flight. The limit is
+halved when the server throttles and grows by about one request per
+round of successful requests (AIMD), so parallel work settles just below
+the rate the tenant accepts.
+
+`Attempts` holds the retry state of a single request, so the sync and async
+connectors make the same retry decisions.
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 60.0
+RETRY_STATUS = (429, 500, 502, 503, 504)
+THROTTLE_STATUS = (429, 503)
+DEFAULT_CONCURRENCY = 10
+DEFAULT_DECREASE_INTERVAL = 1.0
+LOG = logging.getLogger(__name__)
+
+
+def retry_after(headers, now=None):
+    """
+    Get seconds to wait from a `Retry-After` header
+
+    :param headers: response headers
+    :param now: current time (epoch seconds) for HTTP-date values
+    :return: seconds (float), or None if header is missing or invalid
+    """
+    value = (headers or {}).get("Retry-After", None)
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, date.timestamp() - now)
+
+
+def rewindable(body):
+    """
+    Check if a request body can be sent again
+
+    :param body: request body (None, bytes, str, dict, file or generator)
+    :return: tuple of (true if the body can be resent, position to seek a
+             file body back to before resending or None)
+    """
+    body_pos = body.tell() if hasattr(body, 'seek') else None
+    # Streamed bodies (generators) can only be sent once
+    can_retry = body is None or body_pos is not None or \
+        isinstance(body, (bytes, str, dict))
+    return can_retry, body_pos
+
+
+class RetryPolicy:
+    """ When and how long to wait before sending a request again """
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, statuses=RETRY_STATUS,
+                 jitter=random.uniform, sleep=time.sleep):
+        """
+        Initialize Retry Policy
+
+        :param retries: max number of retries (0 disables retries)
+        :param backoff: base delay (seconds) of the exponential backoff
+        :param max_backoff: max delay (seconds) between retries
+        :param statuses: HTTP status codes that are retried
+        :param jitter: `jitter(low, high)` random delay (for testing)
+        :param sleep: sleep function (for testing)
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = tuple(statuses)
+        self.jitter = jitter
+        self.sleep = sleep
+
+    def should_retry(self, attempt, status_code=None):
+        """
+        Check if a request should be sent again
+
+        :param attempt: number of retries done so far
+        :param status_code: response status (None for connection errors)
+        """
+        if attempt >= self.retries:
+            return False
+        return status_code is None or status_code in self.statuses
+
+    def delay(self, attempt, headers=None):
+        """ Seconds to wait before retry number `attempt + 1`"""
+        wait = retry_after(headers)
+        if wait is not None:
+            return wait
+        ceiling = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return self.jitter(0, ceiling)
+
+    def wait(self, attempt, headers=None):
+        """ Sleep before retrying, returning the delay"""
+        delay = self.delay(attempt, headers)
+        self.sleep(delay)
+        return delay
+
+
+class Attempts:
+    """ Retry state of a single request """
+    # pylint: disable=too-few-public-methods
+    REFRESH = "refresh"
+
+    def __init__(self, policy, limiter, body=None):
+        """
+        Initialize Attempts
+
+        :param policy: `RetryPolicy` deciding if and when to retry
+        :param limiter: `AdaptiveLimiter` told about every response
+        :param body: request body (see `rewindable`)
+        """
+        self.policy = policy
+        self.limiter = limiter
+        self.body = body
+        self.can_retry, self.body_pos = rewindable(body)
+        self.attempt = 0
+        self.refreshed = False
+
+    def next_delay(self, res=None, error=None):
+        """
+        Decide what to do after sending the request
+
+        A rejected access token (401) is refreshed once, throttled and
+        failed responses and connection errors are retried according to the
+        policy. File bodies are rewound whenever the request is to be sent
+        again.
+
+        :param res: response (None if sending failed)
+        :param error: connection error (or timeout) raised while sending
+        :return: None if `res` is final, `REFRESH` to refresh the access
+                 token and resend at once, or seconds to wait before
+                 resending
+        :raise: `error` if the request cannot be sent again
+        """
+        if error is not None:
+            if not self.can_retry or not self.policy.should_retry(
+                    self.attempt):
+                raise error
+            delay = self.policy.delay(self.attempt)
+            LOG.warning("Connection failed (%s), retrying in %.1fs", error,
+                        delay)
+        elif res.status_code == 401 and not self.refreshed and \
+                self.can_retry:
+            LOG.info("Access token rejected, refreshing and retrying")
+            self.refreshed = True
+            self._rewind()
+            return self.REFRESH
+        else:
+            self.limiter.record(res.status_code)
+            if not self.can_retry or not self.policy.should_retry(
+                    self.attempt, res.status_code):
+                return None
+            delay = self.policy.delay(self.attempt, res.headers)
+            LOG.warning("API ERROR: %s, retrying in %.1fs", res.status_code,
+                        delay)
+        self.attempt += 1
+        self._rewind()
+        return delay
+
+    def _rewind(self):
+        """ Seek a file body back to where the request started """
+        if self.body_pos is not None:
+            self.body.seek(self.body_pos)
+
+
+class AdaptiveLimiter:
+    """ AIMD limit on the number of requests in flight """
+    # Settings plus the limit, in-flight count and condition shared by threads
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, max_limit=DEFAULT_CONCURRENCY, min_limit=1,
+                 decrease=0.5, interval=DEFAULT_DECREASE_INTERVAL,
+                 clock=time.monotonic):
+        """
+        Initialize Adaptive Limiter
+
+        :param max_limit: max (and initial) number of requests in flight
+        :param min_limit: the limit is never lowered below this
+        :param decrease: factor applied to the limit when throttled
+        :param interval: min seconds between two decreases, so a burst of
+                         throttled responses only counts once
+        :param clock: time source (for testing)
+        """
+        # pylint: disable=too-many-arguments
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.decrease = decrease
+        self.interval = interval
+        self.clock = clock
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._decreased = None
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        """ Wait for a free slot """
+        self.acquire()
+        return self
+
+    def __exit__(self, *_args):
+        """ Release slot """
+        self.release()
+
+    def acquire(self):
+        """ Wait until another request may be sent """
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def try_acquire(self):
+        """ Take a slot if one is free, without waiting """
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        """ Mark a request as finished """
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def throttled(self):
+        """ Lower the limit after a throttled response """
+        with self._cond:
+            now = self.clock()
+            if self._decreased is not None and \
+                    now - self._decreased < self.interval:
+                return
+            self._decreased = now
+            self.limit = max(float(self.min_limit), self.limit * self.decrease)
+
+    def record(self, status_code):
+        """ Adjust the limit after a response """
+        if status_code in THROTTLE_STATUS:
+            self.throttled()
+        elif status_code < 400:
+            self.succeeded()
+
+    def succeeded(self):
+        """ Raise the limit after a successful response """
+        with self._cond:
+            if self.limit >= self.max_limit:
+                return
+            previous = int(self.limit)
+            self.limit = min(float(self.max_limit),
+                             self.limit + 1 / self.limit)
+            if int(self.limit) > previous:
+                self._cond.notify_all()
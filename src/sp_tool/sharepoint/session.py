@@ -0,0 +1,56 @@
+"""
+Sharepoint HTTP session factory
+
+All HTTP traffic to Sharepoint goes through a single `requests.Session` so
+that TCP/TLS connections are pooled and kept alive between calls. Requests
+sent without a timeout get `DEFAULT_TIMEOUT`, so a stalled server raises
+`requests.Timeout` instead of blocking forever.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = (10.0, 120.0)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """ HTTP adapter applying a default (connect, read) timeout """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        """
+        Initialize
+
+        :param timeout: `(connect, read)` seconds (or a single number) used
+                        when a request does not set its own timeout
+        """
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        """ Send request with the default timeout if it has none """
+        # pylint: disable=arguments-differ
+        return super().send(request, timeout=timeout or self.timeout,
+                            **kwargs)
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, keep_alive=True,
+                   pool_block=False, timeout=DEFAULT_TIMEOUT):
+    """
+    Create a pooled HTTP session
+
+    :param pool_size: max number of connections kept open per host
+    :param keep_alive: if false, connections are closed after each request
+    :param pool_block: if true, block when the pool is exhausted instead of
+                       opening throw-away connections
+    :param timeout: default `(connect, read)` timeout in seconds
+    :return: configured `requests.Session`
+    """
+    session = requests.Session()
+    adapter = TimeoutHTTPAdapter(timeout=timeout, pool_connections=pool_size,
+                                 pool_maxsize=pool_size,
+                                 pool_block=pool_block)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
@@ -0,0 +1,156 @@
+"""
+Access token manager
+
+Keeps an access token fresh: refreshes it shortly before it expires, either
+on demand or from a background thread, and single-flights refreshes so a
+burst of concurrent callers triggers only one token request.
+"""
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_MARGIN = 300
+DEFAULT_TOKEN_LIFETIME = 3600
+MIN_REFRESH_INTERVAL = 10
+
+
+def token_expiry(token, now=None):
+    """
+    Get expiry time (epoch seconds) of a token response
+
+    Uses `expires_on` if present, otherwise `expires_in` relative to `now`
+
+    :param token: decoded token response
+    :param now: time the token was obtained
+    :return: epoch time the token expires at
+    """
+    now = time.time() if now is None else now
+    try:
+        return float(token["expires_on"])
+    except (KeyError, TypeError, ValueError):
+        pass
+    try:
+        return now + float(token["expires_in"])
+    except (KeyError, TypeError, ValueError):
+        return now + DEFAULT_TOKEN_LIFETIME
+
+
+class TokenManager:
+    """
+    Thread-safe, expiry-aware token holder
+
+    `fetch` is a callable that returns a decoded token response (a dict with
+    `access_token` and `expires_in`/`expires_on`).
+    """
+    # Token state plus the lock, event and thread of background refresh
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, fetch, refresh_margin=DEFAULT_REFRESH_MARGIN,
+                 clock=time.time):
+        """
+        Initialize Token Manager
+
+        :param fetch: callable that requests a new token
+        :param refresh_margin: seconds before expiry to refresh the token
+        :param clock: time source (for testing)
+        """
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def expires_at(self):
+        """ Epoch time current token expires at (0 if no token)"""
+        return self._expires_at
+
+    @property
+    def valid(self):
+        """ True if we have a token that is not about to expire"""
+        return (self._token is not None and
+                self.clock() < self._expires_at - self.refresh_margin)
+
+    def set(self, token, expires_at=None):
+        """ Install a token obtained elsewhere (i.e. from a cache)"""
+        with self._lock:
+            self._token = token
+            self._expires_at = token_expiry(token, self.clock()) \
+                if expires_at is None else expires_at
+
+    def get(self, force=False, stale=None):
+        """
+        Get a valid token, refreshing it if needed
+
+        :param force: refresh even if the current token looks valid
+        :param stale: access token the caller found to be rejected; a forced
+                      refresh is skipped if another caller already replaced
+                      it
+        :return: decoded token response
+        """
+        if self.valid and not force:
+            return self._token
+        with self._lock:
+            current = self._token
+            if current is not None:
+                if force and stale is not None and \
+                        current.get("access_token") != stale:
+                    # Someone else already replaced the rejected token
+                    return current
+                if not force and self.valid:
+                    # Someone else refreshed while we waited for the lock
+                    return current
+            return self._refresh()
+
+    def invalidate(self):
+        """ Drop current token so next `get()` fetches a new one"""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0
+
+    def _refresh(self):
+        """ Fetch a new token (must hold lock)"""
+        now = self.clock()
+        token = self.fetch()
+        self._token = token
+        # Failed responses are kept (for error reporting) but never valid
+        self._expires_at = token_expiry(token, now) \
+            if token.get("access_token") else now
+        LOG.debug("Refreshed access token, expires in %ds",
+                  self._expires_at - now)
+        return token
+
+    def start(self):
+        """ Start refreshing the token in a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name="sp-token-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stop background refresh thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        """ Background refresh loop"""
+        while not self._stop.is_set():
+            delay = self._expires_at - self.refresh_margin - self.clock()
+            if delay <= 0:
+                try:
+                    self.get()
+                    delay = max(self._expires_at - self.refresh_margin -
+                                self.clock(), MIN_REFRESH_INTERVAL)
+                except Exception as ex:  # pylint: disable=broad-except
+                    LOG.warning("Background token refresh failed: %s", ex)
+                    delay = MIN_REFRESH_INTERVAL
+            self._stop.wait(min(delay, 60))
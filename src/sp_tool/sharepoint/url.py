@@ -6,10 +6,18 @@ import urllib.parse
 class SharepointURL:
     """ Represents/generates Sharepoint URLs"""
 
-    def __init__(self, tenant_name, site_name):
-        """ Initialize """
+    def __init__(self, tenant_name, site_name, base_url=None):
+        """
+        Initialize
+
+        :param tenant_name: tenant (`<tenant>.sharepoint.com`)
+        :param site_name: name of the site without `sites/` prefix
+        :param base_url: server base URL overriding the tenant URL (i.e.
+                         `http://127.0.0.1:8080` for a local test server)
+        """
         self.tenant_name = tenant_name
         self.site_name = site_name
+        self.base_url = base_url.rstrip('/') if base_url else None
 
     @property
     @functools.lru_cache(maxsize=None)
@@ -21,13 +29,15 @@ class SharepointURL:
     @functools.lru_cache(maxsize=None)
     def host(self):
         """ Sharepoint Host Name"""
+        if self.base_url:
+            return urllib.parse.urlparse(self.base_url).netloc
         return f"{self.tenant_name}.sharepoint.com"
 
     @property
     @functools.lru_cache(maxsize=None)
     def base(self):
         """ Server Base URL"""
-        return f"https://{self.host}"
+        return self.base_url or f"https://{self.host}"
 
     @property
     @functools.lru_cache(maxsize=None)
@@ -59,6 +69,11 @@ class SharepointURL:
         """ Get web api URL"""
         return f"{self.base}/{self.web_uri}"
 
+    @property
+    def hostname(self):
+        """ Host name of the server (without port)"""
+        return urllib.parse.urlparse(self.base).hostname
+
     def file_uri(self, folder, filename, suffix=""):
         """ Generate a file URI base """
         folder = urllib.parse.quote(folder or "")
@@ -6,6 +6,11 @@ import urllib.parse
 import logging
 import yaml
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
 LOG = logging.getLogger(__name__)
 
 
@@ -19,22 +24,110 @@ def to_yaml(data):
     return yaml.safe_dump(data, default_flow_style=False)
 
 
+NEXT_LINK_FIELDS = ("__next", "odata.nextLink", "@odata.nextLink")
+
+
 def from_json(json_text):
-    """ Decode from JSON from text"""
+    """ Decode from JSON from text (or bytes), using orjson if installed"""
+    if orjson is not None:
+        return orjson.loads(json_text)  # pylint: disable=no-member
     return json.loads(json_text)
 
 
-def strings_from_list(item_list, desc="item", field="Name", **kwargs):
-    """ Convert a list of items into a list of strings by field """
-    sort = bool(kwargs.get('sort', True))
+def unwrap_results(data):
+    """
+    Unwrap list of results from a decoded OData response
+
+    Handles verbose (`{"d": {"results": [...]}}`) as well as minimal and
+    no metadata (`{"value": [...]}` or a plain list) responses.
+    """
+    if not isinstance(data, dict):
+        return data
+    data = data.get('d', data)
+    if isinstance(data, dict):
+        if 'results' in data:
+            return data['results']
+        if 'value' in data:
+            return data['value']
+    return data
+
+
+def next_link(data):
+    """ Get link to next page of a decoded OData response (or None)"""
+    if not isinstance(data, dict):
+        return None
+    data = data.get('d', data)
+    if not isinstance(data, dict):
+        return None
+    for field in NEXT_LINK_FIELDS:
+        if data.get(field):
+            return data[field]
+    return None
+
+
+def expanded_items(data, item_type, limit):
+    """
+    Items of the expanded `Folders` or `Files` collection of a folder
+
+    SharePoint caps expanded collections without paging them, so a
+    collection of `limit` or more items, or one with a next link, may be
+    incomplete.
+
+    :param data: decoded folder response
+    :param item_type: "File" or "Folder"
+    :param limit: max items SharePoint returns in an expanded collection
+    :return: list of item dicts, or None if the collection may be truncated
+    """
+    collection = data.get(f"{item_type}s", {})
+    items = unwrap_results(collection)
+    if len(items) >= limit or next_link(collection) or \
+            data.get(f"{item_type}s@odata.nextLink"):
+        return None
+    return items
+
+
+def iter_strings_from_list(item_list, desc="item", field="Name", **kwargs):
+    """ Generate strings by field from an iterable of items """
     prefix = kwargs.get('prefix', "")
     suffix = kwargs.get('suffix', "")
 
-    items = []
     for item in item_list:
         if field in item:
             value = item.get(field, None)
-            items.append(None if value is None else f"{prefix}{value}{suffix}")
+            yield None if value is None else f"{prefix}{value}{suffix}"
         else:
             LOG.info("Skipping invalid %s : %s", desc, item)
+
+
+def strings_from_list(item_list, desc="item", field="Name", **kwargs):
+    """ Convert a list of items into a list of strings by field """
+    sort = bool(kwargs.get('sort', True))
+    items = list(iter_strings_from_list(item_list, desc=desc, field=field,
+                                        **kwargs))
     return sorted(items) if sort else items
+
+
+def list_row_item(row, site_uri=""):
+    """
+    Convert a `RenderListDataAsStream` row into a file/folder item
+
+    Items carry the same field names as file objects from the files API
+    (`Name`, `ServerRelativeUrl`, `Length`, `TimeLastModified`, `ETag`),
+    plus `Path` relative to the site and `Folder` (True for folders).
+    """
+    url = row.get("FileRef", "")
+    path = url[len(site_uri):] if site_uri and url.startswith(site_uri) \
+        else url
+    unique_id = row.get("UniqueId", "")
+    version = row.get("owshiddenversion", "")
+    folder = str(row.get("FSObjType", "0")) == "1"
+    size = row.get("File_x0020_Size", "")
+    return {
+        "Name": row.get("FileLeafRef", url.rsplit("/", 1)[-1]),
+        "Path": path.strip("/"),
+        "ServerRelativeUrl": url,
+        "Length": None if folder or size == "" else str(size),
+        "TimeLastModified": row.get("Modified.", row.get("Modified")),
+        "ETag": f'"{unique_id},{version}"' if unique_id else None,
+        "Folder": folder
+    }
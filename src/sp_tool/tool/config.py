@@ -0,0 +1,45 @@
+"""
+sp-tool default configuration
+
+Only imports lightweight modules, so the CLI can build its options without
+loading the SharePoint connector and its dependencies.
+"""
+import os.path
+
+from sp_tool.tool.profiler import DEFAULT_PROFILE_PHASE
+
+DEFAULT_HASH_CACHE = os.path.join("~", ".cache", "sp-tool", "hashes.json")
+
+DEFAULT_CONFIG = dict(
+    dry_run=False,
+    exclude=[],
+    exclude_dirs=[],
+    include=[],
+    include_dirs=[],
+    recurse=True,
+    source_dir='.',
+    base_path="Shared Documents",
+    client_id="",
+    path="",
+    secret="",
+    site="",
+    tenant=None,
+    checkout=False,
+    auth_cache="",
+    base_url="",
+    auth_url="",
+    jobs=1,
+    retries=5,
+    metadata="nometadata",
+    chunk_size=10,
+    chunk_threshold=100,
+    sync=False,
+    force=False,
+    manifest="",
+    hash_cache=DEFAULT_HASH_CACHE,
+    metrics="",
+    metrics_prom="",
+    profile=False,
+    profile_output="",
+    profile_phase=DEFAULT_PROFILE_PHASE
+)
@@ -1,81 +1,77 @@
 """ File Lister """
-import fnmatch
 import os
-from typing import List
+from typing import Iterator, List
 
 from sp_tool.tool.logging import LOG
+from sp_tool.utils import compile_globs
 
 
-def _matches(file, glob):
-    """ check if file matches a glob"""
-    return fnmatch.fnmatch(file, glob)
+def _scan(directory):
+    """ List directory entries, logging (and skipping) unreadable dirs """
+    try:
+        with os.scandir(directory) as entries:
+            return list(entries)
+    except OSError as ex:
+        LOG.warning("Unable to scan '%s': %s", directory, ex)
+        return []
 
 
-def _matches_one_of(file, globs):
-    """ check if file one of the provided globs """
-    for glob in globs:
-        if fnmatch.fnmatch(file, glob):
-            return True
-    return False
-
-
-def _filter_files(file_list, include, exclude):
-    """ Filter a list of files """
-    files = []
-    for file in file_list:
-        if not _matches_one_of(file, include):
-            LOG.debug("File %s does not match any of the include patterns",
-                      file)
-            continue
-        if _matches_one_of(file, exclude):
-            LOG.debug("File %s matches an exclude pattern, ignoring", file)
-            continue
-        LOG.debug("Found file '%s'", file)
-        files.append(file)
-    return files
-
-
-def list_files(directory, recurse=False,
+def iter_files(directory, recurse=False,
                include: List[str] = None, exclude: List[str] = None,
-               include_dirs: List[str] = None, exclude_dirs: List[str] = None):
-    """ List files in directory with includes or excludes """
-    # pylint: disable=too-many-arguments
-    files = []
-    src_dir = directory.rstrip('/')
-
-    if not include:
-        include = ['*']
-    if not include_dirs:
-        include_dirs = ['*']
-    if not exclude:
-        exclude = []
-    if not exclude_dirs:
-        exclude_dirs = []
+               include_dirs: List[str] = None,
+               exclude_dirs: List[str] = None) -> Iterator[str]:
+    """
+    Generate files in directory with includes or excludes
 
+    Directories not matching `include_dirs` or matching `exclude_dirs` are
+    not descended into. Files are produced while the tree is scanned, in
+    the same (top-down) order as `os.walk`.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    src_dir = directory.rstrip('/')
     LOG.info("Scanning '%s'.Includes: %s. Excludes: %s "
              "Include Dirs: %s. Exclude Dirs: %s", src_dir,
-             str(include)[1:-1], str(exclude)[1:-1],
-             str(include_dirs)[1:-1], str(exclude_dirs)[1:-1]
+             str(include or ['*'])[1:-1], str(exclude or [])[1:-1],
+             str(include_dirs or ['*'])[1:-1], str(exclude_dirs or [])[1:-1]
              )
+    include = compile_globs(include or ['*'])
+    exclude = compile_globs(exclude)
+    include_dirs = compile_globs(include_dirs or ['*'])
+    exclude_dirs = compile_globs(exclude_dirs)
 
     if not os.path.isdir(src_dir):
         LOG.warning("Directory %s does not exist", src_dir)
-        return files
+        return
+
+    stack = [src_dir]
+    while stack:
+        root = stack.pop()
+        folders = []
+        for entry in _scan(root):
+            name = os.path.normcase(entry.name)
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                # Like os.walk, symlinked directories are not followed
+                if not recurse or entry.is_symlink():
+                    continue
+                if not include_dirs.match(name) or exclude_dirs.match(name):
+                    LOG.debug("Directory %s/%s excluded, skipping", root,
+                              entry.name)
+                    continue
+                folders.append(f"{root}/{entry.name}")
+            elif include.match(name) and not exclude.match(name):
+                LOG.debug("Found file '%s/%s'", root, entry.name)
+                yield f"{root}/{entry.name}"
+        stack.extend(reversed(folders))
+
 
-    for root, folders, local_files in os.walk(src_dir):
-        if not recurse and root != src_dir:
-            continue
-        root_path = root.split('/')
-        excluded = False
-        for path in root_path:
-            if _matches_one_of(path, exclude_dirs):
-                LOG.debug("Directory %s matched an exclude, skipping", root)
-                excluded = True
-                break
-        if excluded:
-            continue
-        LOG.debug("Scanning '%s' - Folders: %s Files: %s", root, folders,
-                  local_files)
-        files += [f"{root}/{file}" for file in _filter_files(local_files,
-                                                             include, exclude)]
-    return files
+def list_files(directory, recurse=False,
+               include: List[str] = None, exclude: List[str] = None,
+               include_dirs: List[str] = None, exclude_dirs: List[str] = None):
+    """ List files in directory with includes or excludes """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    return list(iter_files(directory, recurse, include, exclude,
+                           include_dirs, exclude_dirs))
@@ -0,0 +1,252 @@
+"""
+Content hashing
+
+Hashes files on a process pool, reading large files through `mmap`, and
+keeps digests in an on-disk cache keyed by (device, inode, size, mtime_ns)
+so files that did not change since an earlier run are never read again.
+"""
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from sp_tool.tool.config import DEFAULT_HASH_CACHE
+from sp_tool.tool.logging import LOG
+from sp_tool.utils import atomic_write
+
+HASH_CACHE_VERSION = 1
+HASH_ALGORITHM = "sha256"
+HASH_BLOCK_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 16 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 1000000
+
+
+def hash_file(path, algorithm=HASH_ALGORITHM):
+    """ Get hex digest of a file's contents """
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as data:
+        size = os.fstat(data.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ) as mem:
+                view = memoryview(mem)
+                try:
+                    for start in range(0, size, HASH_BLOCK_SIZE):
+                        digest.update(view[start:start + HASH_BLOCK_SIZE])
+                finally:
+                    view.release()
+        else:
+            for block in iter(lambda: data.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _try_hash_file(path, algorithm=HASH_ALGORITHM):
+    """ Get hex digest of a file, or None if it cannot be read """
+    try:
+        return hash_file(path, algorithm)
+    except OSError as ex:
+        LOG.warning("Unable to hash '%s': %s", path, ex)
+        return None
+
+
+def pool_context():
+    """
+    Multiprocessing context of the hashing pool
+
+    The pool is started while pipeline threads are running, and forking a
+    threaded process can copy locks held by other threads into the
+    workers. Workers are started by a fork server (or spawned where that
+    is not available) instead.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn")
+
+
+def stat_key(stat):
+    """ Cache key of a file's `os.stat` result """
+    return f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class HashCache:
+    """
+    On-disk cache of content digests
+
+    Entries are kept in least recently used order and the oldest are
+    dropped once `max_entries` is exceeded. The file is rewritten
+    atomically.
+    """
+
+    def __init__(self, path=DEFAULT_HASH_CACHE, algorithm=HASH_ALGORITHM,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Initialize Hash Cache
+
+        :param path: cache file (None keeps the cache in memory only)
+        :param algorithm: hash algorithm of the cached digests
+        :param max_entries: max number of digests kept
+        """
+        self.path = os.path.abspath(os.path.expanduser(path)) \
+            if path else None
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self.entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """ Load cache from disk """
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r', encoding="utf-8") as cache:
+                data = json.load(cache)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as ex:
+            LOG.warning("Ignoring unreadable hash cache %s: %s", self.path,
+                        ex)
+            return
+        if data.get("version") == HASH_CACHE_VERSION and \
+                data.get("algorithm") == self.algorithm:
+            self.entries = data.get("entries", {})
+
+    def get(self, stat):
+        """ Get cached digest for a file's stat (None if not cached)"""
+        key = stat_key(stat)
+        with self._lock:
+            digest = self.entries.pop(key, None)
+            if digest is not None:
+                self.entries[key] = digest
+            return digest
+
+    def put(self, stat, digest):
+        """ Store digest for a file's stat """
+        with self._lock:
+            self.entries.pop(stat_key(stat), None)
+            self.entries[stat_key(stat)] = digest
+            self._dirty = True
+
+    def save(self):
+        """ Atomically write cache to disk (if anything changed)"""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            keys = list(self.entries)[-self.max_entries:]
+            data = {"version": HASH_CACHE_VERSION,
+                    "algorithm": self.algorithm,
+                    "entries": {key: self.entries[key] for key in keys}}
+            self._dirty = False
+        with atomic_write(self.path) as cache:
+            json.dump(data, cache)
+
+
+class Hasher:
+    """ Hashes files in parallel, using a `HashCache` """
+
+    def __init__(self, cache=None, workers=None, algorithm=HASH_ALGORITHM):
+        """
+        Initialize Hasher
+
+        :param cache: `HashCache`, or path of the cache file (None keeps
+                      digests in memory for this run only)
+        :param workers: number of hashing processes (default: CPU count;
+                        1 hashes in the calling thread)
+        :param algorithm: hash algorithm
+        """
+        if not isinstance(cache, HashCache):
+            cache = HashCache(cache, algorithm)
+        self.cache = cache
+        self.workers = workers or os.cpu_count() or 1
+        self.algorithm = algorithm
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def close(self):
+        """ Stop worker processes and save the cache """
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+        self.cache.save()
+
+    def __enter__(self):
+        """ Context manager entry """
+        return self
+
+    def __exit__(self, *_args):
+        """ Stop workers and save cache """
+        self.close()
+
+    @property
+    def pool(self):
+        """ Process pool (started on first use)"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=pool_context())
+            return self._pool
+
+    def hash(self, path):
+        """ Get digest of a file (from cache if unchanged)"""
+        stat = os.stat(path)
+        digest = self.cache.get(stat)
+        if digest is None:
+            digest = hash_file(path, self.algorithm)
+            self._store(path, stat, digest)
+        return digest
+
+    def hash_many(self, paths):
+        """
+        Get digests of many files, hashing uncached files in parallel
+
+        :return: dict of path to digest (files that could not be read are
+                 left out)
+        """
+        digests = {}
+        missing = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError as ex:
+                LOG.warning("Unable to hash '%s': %s", path, ex)
+                continue
+            digest = self.cache.get(stat)
+            if digest is None:
+                missing.append((path, stat))
+            else:
+                digests[path] = digest
+        if len(missing) <= 1 or self.workers <= 1:
+            for path, stat in missing:
+                digest = _try_hash_file(path, self.algorithm)
+                if digest is not None:
+                    digests[path] = digest
+                    self._store(path, stat, digest)
+            return digests
+        LOG.debug("Hashing %d files on %d processes", len(missing),
+                  self.workers)
+        chunksize = max(1, min(64, len(missing) // (self.workers * 4)))
+        results = self.pool.map(_try_hash_file, [path for path, _ in missing],
+                                [self.algorithm] * len(missing),
+                                chunksize=chunksize)
+        for (path, stat), digest in zip(missing, results):
+            if digest is None:
+                continue
+            digests[path] = digest
+            self._store(path, stat, digest)
+        return digests
+
+    def _store(self, path, stat, digest):
+        """ Cache digest unless the file changed while it was read """
+        try:
+            after = os.stat(path)
+        except OSError:
+            return
+        if stat_key(after) == stat_key(stat):
+            self.cache.put(stat, digest)
@@ -1,13 +1,18 @@
 """
 Main CLI entry point for sp-tool
+
+Only `click` and lightweight modules are imported here; commands import the
+connector stack (`requests`, `yaml`...) when they run, so `--help`, `config`
+and `register` start fast.
 """
 import logging
 from argparse import Namespace
 
 import click
 
-from sp_tool.sharepoint.utils import to_yaml
-from sp_tool.tool.sp_tool import SharepointTool, DEFAULT_CONFIG
+from sp_tool.sharepoint.odata import METADATA_ACCEPT
+from sp_tool.tool.config import DEFAULT_CONFIG
+from sp_tool.tool.profiler import PHASES
 
 from sp_tool.tool.logging import initialize_logging, LOG
 
@@ -53,8 +58,64 @@ Have fun!
                    'upload(only relevant when recurse is on)')
 @click.option('--path', default=DEF.path, show_default=True,
               help='Path relative to base for uploading to sharepoint')
+@click.option('--jobs', default=DEF.jobs, show_default=True,
+              type=click.IntRange(min=1),
+              help='Number of files to upload in parallel')
+@click.option('--retries', default=DEF.retries, show_default=True,
+              type=click.IntRange(min=0),
+              help='Retries of throttled or failed requests')
+@click.option('--metadata', default=DEF.metadata, show_default=True,
+              type=click.Choice(sorted(METADATA_ACCEPT)),
+              help='OData metadata requested in JSON responses')
+@click.option('--chunk-size', default=DEF.chunk_size, show_default=True,
+              type=click.FloatRange(min=0.25),
+              help='Chunk size (MiB) for chunked uploads of large files')
+@click.option('--chunk-threshold', default=DEF.chunk_threshold,
+              show_default=True, type=click.FloatRange(min=0),
+              help='Files larger than this (MiB) are uploaded in chunks')
+@click.option('--sync/--no-sync', default=DEF.sync, show_default=True,
+              help='Only upload files that changed since the last publish '
+                   '(tracked in a manifest)')
+@click.option('--force', is_flag=True, default=DEF.force,
+              help='With --sync, upload all files regardless of manifest')
+@click.option('--manifest', default=DEF.manifest,
+              type=click.Path(dir_okay=False),
+              help='Manifest file used by --sync [default: '
+                   'SOURCE_DIR/.sp-tool-manifest.json]')
+@click.option('--hash-cache', default=DEF.hash_cache, show_default=True,
+              help='File caching content hashes of local files between '
+                   'runs (empty to disable)')
 @click.option('--client-id', default=DEF.client_id, help='Sharepoint Client ID')
 @click.option('--secret', default=DEF.secret, help='Sharepoint Secret Token')
+@click.option('--auth-cache', default=DEF.auth_cache,
+              type=click.Path(dir_okay=False),
+              help='Cache realm discovery and access tokens in this file '
+                   'between runs (disabled if not set)')
+@click.option('--base-url', default=DEF.base_url,
+              help='Server base URL overriding https://TENANT.sharepoint.com '
+                   '(i.e. a local test server)')
+@click.option('--auth-url', default=DEF.auth_url,
+              help='Token endpoint overriding the Azure ACS one, {realm} is '
+                   'replaced with the bearer realm')
+@click.option('--metrics', default=DEF.metrics,
+              type=click.Path(dir_okay=False),
+              help='Write a JSON summary of request metrics to this file '
+                   'after publishing')
+@click.option('--metrics-prom', default=DEF.metrics_prom,
+              type=click.Path(dir_okay=False),
+              help='Write request metrics in Prometheus text format to this '
+                   'file after publishing')
+@click.option('--profile/--no-profile', default=DEF.profile,
+              show_default=True,
+              help='Log wall and CPU time per publish phase and upload times '
+                   'by file size')
+@click.option('--profile-output', default=DEF.profile_output,
+              type=click.Path(dir_okay=False),
+              help='With --profile, write cProfile stats of --profile-phase '
+                   'to this file')
+@click.option('--profile-phase', default=DEF.profile_phase,
+              show_default=True, type=click.Choice(PHASES),
+              help='Publish phase profiled for --profile-output')
 def cli(ctx, debug, **kwargs):
     """
         Sharepoint API interface tool for publushing to Microsoft-hosted
@@ -123,6 +184,8 @@ def publish(ctx, **kwargs):
         LOG.error("ERROR: Must provide tenant parameter")
         return -1
     if opts.get("secret") and opts.get("client_id"):
+        # pylint: disable=import-outside-toplevel
+        from sp_tool.tool.sp_tool import SharepointTool
         LOG.info("Publishing to sharepoint")
         LOG.debug("Effective Config: \n---\n%s",
                   to_yaml(_normalize_opts(**opts)))
@@ -133,6 +196,13 @@ def publish(ctx, **kwargs):
     return -2
 
 
+def to_yaml(data):
+    """ Dump data as YAML (imports yaml on first use)"""
+    # pylint: disable=import-outside-toplevel
+    from sp_tool.sharepoint.utils import to_yaml as dump
+    return dump(data)
+
+
 def _normalize_opts(**kwargs):
     """ Normalize/Mask options for safe printing"""
     opts = dict(**kwargs)
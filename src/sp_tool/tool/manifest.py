@@ -0,0 +1,183 @@
+""" Publish manifest for incremental (--sync) publishing """
+import json
+import os
+import threading
+
+from sp_tool.sharepoint.items import SPFile
+from sp_tool.tool.hashing import Hasher
+from sp_tool.tool.logging import LOG
+from sp_tool.utils import atomic_write
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST = ".sp-tool-manifest.json"
+REMOTE_FIELDS = ("Length", "TimeLastModified", "ETag")
+
+
+def remote_info(item):
+    """
+    Extract fields used for change detection from a remote file item
+
+    :param item: decoded response item or `SPFile`
+    """
+    if isinstance(item, dict):
+        item = item.get('d', item)
+    elif not isinstance(item, SPFile):
+        return {}
+    return {field: str(item.get(field)) for field in REMOTE_FIELDS
+            if item.get(field) is not None}
+
+
+class Manifest:
+    """
+    Record of what was published from each local file
+
+    Each entry holds local size, mtime and content hash along with the
+    remote Length/TimeLastModified/ETag seen after the upload. The file is
+    rewritten atomically, so an interrupted publish leaves a valid manifest.
+    """
+    # Settings, entries and the locks guarding them across publish threads
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, path, target, flush_every=50, hasher=None,
+                 read_only=False):
+        """
+        Initialize Manifest
+
+        :param path: manifest file
+        :param target: remote location published to (entries recorded for a
+                       different target are ignored)
+        :param flush_every: save after this many updates
+        :param hasher: `Hasher` for content hashes (default: in-process,
+                       uncached)
+        :param read_only: never write the manifest (for dry runs)
+        """
+        self.path = path
+        self.hasher = hasher if hasher is not None else Hasher(workers=1)
+        self.target = target
+        self.flush_every = flush_every
+        self.read_only = read_only
+        self.entries = {}
+        self._dirty = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """ Load manifest from disk """
+        try:
+            with open(self.path, 'r', encoding="utf-8") as manifest:
+                data = json.load(manifest)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as ex:
+            LOG.warning("Ignoring unreadable manifest %s: %s", self.path, ex)
+            return
+        if data.get("version") != MANIFEST_VERSION or \
+                data.get("target") != self.target:
+            LOG.info("Manifest %s is for a different target, ignoring",
+                     self.path)
+            return
+        self.entries = data.get("files", {})
+
+    def save(self):
+        """ Atomically write manifest to disk (unless read only) """
+        if self.read_only:
+            return
+        with self._save_lock:
+            with self._lock:
+                data = {"version": MANIFEST_VERSION, "target": self.target,
+                        "files": dict(self.entries)}
+                self._dirty = 0
+            self._write(data)
+
+    def _write(self, data):
+        """ Write manifest data to a temp file and move it into place """
+        with atomic_write(self.path) as manifest:
+            json.dump(data, manifest, indent=1, sort_keys=True)
+
+    def prepare(self, files):
+        """
+        Hash (in parallel) the files `changed` would have to hash
+
+        Those are files with a manifest entry whose size is unchanged but
+        whose mtime differs.
+
+        :param files: iterable of (rel_file, path)
+        """
+        paths = []
+        for rel_file, path in files:
+            entry = self.entries.get(rel_file)
+            if entry is None:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_size == entry.get("size") and \
+                    stat.st_mtime_ns != entry.get("mtime_ns"):
+                paths.append(path)
+        if paths:
+            self.hasher.hash_many(paths)
+
+    def changed(self, rel_file, path, remote=None):
+        """
+        Check if a file needs to be uploaded
+
+        :param rel_file: file path relative to source directory
+        :param path: local file path
+        :param remote: remote file item (None if file is not on the server)
+        :return: reason for upload, or None if the file is unchanged
+        """
+        entry = self.entries.get(rel_file)
+        if entry is None:
+            return "new"
+        if remote is None:
+            return "missing on server"
+        if remote_info(remote) != entry.get("remote"):
+            return "changed on server"
+        return self._local_change(rel_file, path, entry)
+
+    def _local_change(self, rel_file, path, entry):
+        """ Reason a local file differs from its entry (None if it does not)"""
+        stat = os.stat(path)
+        if stat.st_size != entry.get("size"):
+            return "size changed"
+        if stat.st_mtime_ns == entry.get("mtime_ns"):
+            return None
+        digest = self.hasher.hash(path)
+        if digest != entry.get("sha256"):
+            return "content changed"
+        # Only mtime changed - remember it to avoid hashing again
+        self._update(rel_file, {**entry, "mtime_ns": stat.st_mtime_ns})
+        return None
+
+    def record(self, rel_file, path, response=None, digest=None):
+        """
+        Record a successful upload
+
+        :param rel_file: file path relative to source directory
+        :param path: local file path
+        :param response: upload response (file metadata)
+        :param digest: content hash if already known
+        """
+        stat = os.stat(path)
+        try:
+            remote = remote_info(json.loads(response.text)) \
+                if response is not None else {}
+        except ValueError:
+            remote = {}
+        self._update(rel_file, {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest or self.hasher.hash(path),
+            "remote": remote
+        })
+
+    def _update(self, rel_file, entry):
+        """ Update an entry, saving periodically """
+        with self._lock:
+            self.entries[rel_file] = entry
+            self._dirty += 1
+            flush = self._dirty >= self.flush_every
+        if flush:
+            self.save()
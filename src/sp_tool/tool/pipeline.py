@@ -0,0 +1,147 @@
+"""
+Staged processing pipeline
+
+Stages run on their own threads and hand items to the next stage through
+bounded queues, so the first items flow through all stages while later
+ones are still being produced, and memory use depends on queue depth, not
+on the number of items.
+"""
+import contextlib
+import queue
+import threading
+
+DEFAULT_QUEUE_DEPTH = 256
+
+
+class _Done:  # pylint: disable=too-few-public-methods
+    """ End of stream marker """
+
+
+DONE = _Done()
+
+
+class PipelineAborted(Exception):
+    """ Raised in producers after a stage failed """
+
+
+class Pipeline:
+    """
+    Threads connected by bounded queues
+
+    If a stage raises, the remaining items are drained without being
+    processed and `join` re-raises the first error.
+    """
+
+    def __init__(self, depth=DEFAULT_QUEUE_DEPTH):
+        """
+        Initialize Pipeline
+
+        :param depth: max number of items waiting between two stages
+        """
+        self.depth = depth
+        self.errors = []
+        self._failed = threading.Event()
+        self._threads = []
+
+    def queue(self, depth=None):
+        """ Create a queue to connect two stages """
+        return queue.Queue(self.depth if depth is None else depth)
+
+    def source(self, func, outbox, name="source"):
+        """
+        Start a producing stage
+
+        :param func: `func(emit)`, calls `emit(item)` for every item
+        :param outbox: queue items are sent to
+        :param name: thread name
+        """
+        def emit(item):
+            if self._failed.is_set():
+                raise PipelineAborted()
+            outbox.put(item)
+
+        def run():
+            try:
+                func(emit)
+            except PipelineAborted:
+                pass
+            except BaseException as ex:  # pylint: disable=broad-except
+                self._fail(ex)
+            finally:
+                outbox.put(DONE)
+
+        self._start(run, name)
+
+    def stage(self, func, inbox, outbox=None, workers=1, name="stage",
+              context=None):
+        """
+        Start a processing stage
+
+        :param func: `func(item, emit)` called for every item of `inbox`
+        :param inbox: queue items are read from
+        :param outbox: queue `emit` sends items to (None for a final stage)
+        :param workers: number of threads processing items
+        :param name: thread name prefix
+        :param context: factory of a context manager each worker runs in
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def emit(item):
+            if outbox is None:
+                raise ValueError(f"Stage '{name}' has no outbox")
+            outbox.put(item)
+
+        def run():
+            try:
+                with context() if context else contextlib.nullcontext():
+                    self._consume(func, inbox, emit)
+            except BaseException as ex:  # pylint: disable=broad-except
+                self._fail(ex)
+                self._drain(inbox)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last and outbox is not None:
+                    outbox.put(DONE)
+
+        for index in range(workers):
+            self._start(run, f"{name}-{index}")
+
+    def join(self):
+        """ Wait for all stages to finish, re-raising the first error """
+        for thread in self._threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def _consume(self, func, inbox, emit):
+        """ Process items until the end of the stream """
+        while True:
+            item = inbox.get()
+            if item is DONE:
+                inbox.put(DONE)  # let sibling workers see it too
+                return
+            if not self._failed.is_set():
+                func(item, emit)
+
+    def _drain(self, inbox):
+        """ Discard items until the end of the stream """
+        while True:
+            item = inbox.get()
+            if item is DONE:
+                inbox.put(DONE)
+                return
+
+    def _fail(self, ex):
+        """ Record error and stop processing """
+        self.errors.append(ex)
+        self._failed.set()
+
+    def _start(self, run, name):
+        """ Start a stage thread """
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        self._threads.append(thread)
+        thread.start()
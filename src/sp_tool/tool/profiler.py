@@ -0,0 +1,191 @@
+"""
+Publish profiling
+
+`PhaseProfiler` adds up wall-clock and CPU time spent in each phase of a
+publish (scanning, authentication, connection check, planning, folder
+creation, uploads, check-outs). Phases run concurrently on pipeline
+threads, so besides the time spent in a phase (summed over threads) the
+span from its first start to its last end is kept as well. CPU time is the
+CPU time of the threads while they were in the phase.
+
+Upload times are also bucketed by file size, and sections of one phase can
+be run under `cProfile` with the result dumped in `pstats` format
+(both are only imported when profiling).
+"""
+import bisect
+import contextlib
+import threading
+import time
+
+PHASES = ("scan", "auth", "connect", "plan", "folders", "upload",
+          "check_out")
+DEFAULT_PROFILE_PHASE = "upload"
+KIB = 1024
+MIB = 1024 * KIB
+SIZE_BUCKETS = (64 * KIB, MIB, 10 * MIB, 100 * MIB)
+SIZE_LABELS = ("< 64KiB", "64KiB-1MiB", "1-10MiB", "10-100MiB", ">= 100MiB")
+
+
+class _Phase:
+    """ Totals of a phase """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        """ Initialize """
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.first = None
+        self.last = None
+
+
+class _Uploads:
+    """ Upload totals of a size bucket """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        """ Initialize """
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.max = 0.0
+
+
+class PhaseProfiler:
+    """ Wall and CPU time per publish phase """
+    # Settings, clocks and per-phase totals shared by the publish threads
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, enabled=True, profile_phase=None, clock=time.monotonic,
+                 cpu_clock=time.thread_time):
+        """
+        Initialize
+
+        :param enabled: if false, `phase` and `upload` do nothing
+        :param profile_phase: phase run under `cProfile` (None for none)
+        :param clock: wall clock (for testing)
+        :param cpu_clock: CPU time of the calling thread (for testing)
+        """
+        self.enabled = enabled
+        self.profile_phase = profile_phase
+        self.clock = clock
+        self.cpu_clock = cpu_clock
+        self.started = clock()
+        self.finished = None
+        self._phases = {}
+        self._uploads = [_Uploads() for _ in SIZE_LABELS]
+        self._profile = None
+        if profile_phase:
+            import cProfile  # pylint: disable=import-outside-toplevel
+            self._profile = cProfile.Profile()
+        self._profiling = threading.Lock()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Context manager adding the time spent inside to phase `name` """
+        if not self.enabled:
+            yield
+            return
+        profiling = name == self.profile_phase and \
+            self._profiling.acquire(blocking=False)
+        start, cpu = self.clock(), self.cpu_clock()
+        if profiling:
+            self._profile.enable()
+        try:
+            yield
+        finally:
+            if profiling:
+                self._profile.disable()
+                self._profiling.release()
+            self._add(name, start, self.clock(), self.cpu_clock() - cpu)
+
+    def _add(self, name, start, end, cpu):
+        """ Record a phase section """
+        with self._lock:
+            phase = self._phases.get(name, None)
+            if phase is None:
+                phase = self._phases[name] = _Phase()
+            phase.calls += 1
+            phase.wall += end - start
+            phase.cpu += cpu
+            phase.first = start if phase.first is None else \
+                min(phase.first, start)
+            phase.last = end if phase.last is None else max(phase.last, end)
+
+    def upload(self, size, seconds):
+        """ Record the upload time of a file of `size` bytes """
+        if not self.enabled:
+            return
+        with self._lock:
+            bucket = self._uploads[bisect.bisect_right(SIZE_BUCKETS, size)]
+            bucket.files += 1
+            bucket.bytes += size
+            bucket.seconds += seconds
+            bucket.max = max(bucket.max, seconds)
+
+    def finish(self):
+        """ Mark the end of the profiled run """
+        self.finished = self.clock()
+
+    @property
+    def total(self):
+        """ Wall time of the whole run """
+        end = self.finished if self.finished is not None else self.clock()
+        return end - self.started
+
+    def summary(self):
+        """ Phases and upload buckets as a JSON-friendly dict """
+        with self._lock:
+            phases = {
+                name: {"calls": phase.calls, "wall": phase.wall,
+                       "cpu": phase.cpu,
+                       "span": phase.last - phase.first}
+                for name, phase in sorted(
+                    self._phases.items(),
+                    key=lambda item: _phase_order(item[0]))}
+            uploads = {
+                label: {"files": bucket.files, "bytes": bucket.bytes,
+                        "seconds": bucket.seconds,
+                        "mean": bucket.seconds / bucket.files,
+                        "max": bucket.max,
+                        "mib_per_second": bucket.bytes / MIB /
+                        bucket.seconds if bucket.seconds else 0.0}
+                for label, bucket in zip(SIZE_LABELS, self._uploads)
+                if bucket.files}
+        return {"total": self.total, "phases": phases, "uploads": uploads}
+
+    def table(self):
+        """ Breakdown table (list of lines) """
+        summary = self.summary()
+        total = summary["total"] or 1e-9
+        lines = [f"{'phase':10} {'calls':>7} {'wall s':>9} {'span s':>9} "
+                 f"{'cpu s':>9} {'% total':>8}"]
+        for name, phase in summary["phases"].items():
+            lines.append(f"{name:10} {phase['calls']:7} {phase['wall']:9.3f} "
+                         f"{phase['span']:9.3f} {phase['cpu']:9.3f} "
+                         f"{100 * phase['span'] / total:8.1f}")
+        lines.append(f"{'total':10} {'':7} {summary['total']:9.3f}")
+        if summary["uploads"]:
+            lines.append("")
+            lines.append(f"{'file size':12} {'files':>7} {'MiB':>9} "
+                         f"{'mean s':>9} {'max s':>9} {'MiB/s':>9}")
+            for label, bucket in summary["uploads"].items():
+                lines.append(f"{label:12} {bucket['files']:7} "
+                             f"{bucket['bytes'] / MIB:9.1f} "
+                             f"{bucket['mean']:9.3f} {bucket['max']:9.3f} "
+                             f"{bucket['mib_per_second']:9.2f}")
+        return lines
+
+    def dump_profile(self, path):
+        """ Write `cProfile` stats of the profiled phase to `path` """
+        if self._profile is None:
+            raise Exception("No phase was profiled")
+        import pstats  # pylint: disable=import-outside-toplevel
+        pstats.Stats(self._profile).dump_stats(path)
+
+
+def _phase_order(name):
+    """ Sort key putting known phases in publish order """
+    return (PHASES.index(name), name) if name in PHASES else \
+        (len(PHASES), name)
@@ -0,0 +1,48 @@
+""" Publish result report """
+import threading
+
+from sp_tool.tool.logging import LOG
+
+
+class PublishReport:
+    """ Thread-safe collection of per-file publish results """
+
+    def __init__(self):
+        """ Initialize """
+        self._lock = threading.Lock()
+        self.succeeded = []
+        self.failed = []
+        self.skipped = []
+
+    def success(self, file):
+        """ Record successful upload """
+        with self._lock:
+            self.succeeded.append(file)
+
+    def failure(self, file, reason):
+        """ Record failed upload """
+        with self._lock:
+            self.failed.append((file, str(reason)))
+
+    def skip(self, file, reason=""):
+        """ Record file that was not uploaded on purpose """
+        with self._lock:
+            self.skipped.append((file, str(reason)))
+
+    @property
+    def ok(self):
+        """ True if no uploads failed """
+        return not self.failed
+
+    @property
+    def total(self):
+        """ Total number of files processed """
+        return len(self.succeeded) + len(self.failed) + len(self.skipped)
+
+    def log(self):
+        """ Log summary of results """
+        for file, reason in sorted(self.failed):
+            LOG.error("FAILED: %s: %s", file, reason)
+        LOG.info("Published %d file(s): %d uploaded, %d skipped, %d failed",
+                 self.total, len(self.succeeded), len(self.skipped),
+                 len(self.failed))
@@ -1,33 +1,37 @@
 """
 sp-tool implementation
 """
+import contextlib
+import itertools
 import os.path
+import time
 import traceback
 from argparse import Namespace
+from collections import OrderedDict
 from functools import lru_cache
 
 import yaml
 
-from sp_tool.sharepoint import SharepointConnector
-from sp_tool.tool.file_lister import list_files
+from sp_tool.sharepoint.connector import SharepointConnector
+from sp_tool.sharepoint.auth import DEFAULT_AUTH_URL
+from sp_tool.sharepoint.folder_planner import DEFAULT_PLANNER_WORKERS, \
+    FolderPlanner
+from sp_tool.sharepoint.hooks import RequestHooks
+from sp_tool.sharepoint.metrics import RequestMetrics
+from sp_tool.sharepoint.retry import RetryPolicy
+from sp_tool.sharepoint.session import DEFAULT_POOL_SIZE
+from sp_tool.tool.config import DEFAULT_CONFIG
+from sp_tool.tool.file_lister import iter_files
+from sp_tool.tool.hashing import Hasher
 from sp_tool.tool.logging import LOG
+from sp_tool.tool.manifest import Manifest, DEFAULT_MANIFEST
+from sp_tool.tool.pipeline import DEFAULT_QUEUE_DEPTH, Pipeline
+from sp_tool.tool.profiler import PhaseProfiler
+from sp_tool.tool.report import PublishReport
 
-DEFAULT_CONFIG = dict(
-    dry_run=False,
-    exclude=[],
-    exclude_dirs=[],
-    include=[],
-    include_dirs=[],
-    recurse=True,
-    source_dir='.',
-    base_path="Shared Documents",
-    client_id="",
-    path="",
-    secret="",
-    site="",
-    tenant=None,
-    checkout=False
-)
+MIB = 1024 * 1024
+SCAN_CHUNK = 64
+REMOTE_LISTINGS = 64
 
 
 class SharepointTool:
@@ -41,12 +45,53 @@ class SharepointTool:
             raise Exception('Must specify tenant')
 
     @property
-    @lru_cache()
     def files(self):
         """ List of files to publish """
-        return list_files(self.source_dir, self.opts.recurse,
-                          self.opts.include, self.opts.exclude,
-                          self.opts.include_dirs, self.opts.exclude_dirs)
+        return list(self.iter_files())
+
+    def iter_files(self):
+        """ Generate files to publish (while the source dir is scanned)"""
+        manifest = os.path.abspath(self.manifest_path)
+        for file in iter_files(self.source_dir, self.opts.recurse,
+                               self.opts.include, self.opts.exclude,
+                               self.opts.include_dirs,
+                               self.opts.exclude_dirs):
+            if os.path.abspath(file) != manifest:
+                yield file
+
+    @property
+    def manifest_path(self):
+        """ Location of the sync manifest"""
+        return self.opts.manifest or os.path.join(self.source_dir,
+                                                  DEFAULT_MANIFEST)
+
+    @property
+    @lru_cache()
+    def manifest(self):
+        """ Sync manifest (None unless syncing)"""
+        if not self.opts.sync:
+            return None
+        return Manifest(self.manifest_path, self.sp_target,
+                        hasher=self.hasher, read_only=self.opts.dry_run)
+
+    @property
+    @lru_cache()
+    def hasher(self):
+        """ Content hasher (digests cached in `--hash-cache`)"""
+        return Hasher(self.opts.hash_cache or None)
+
+    @property
+    def sp_base(self):
+        """ Remote base folder"""
+        sp_base = f"{self.opts.base_path}"
+        if self.opts.path:
+            sp_base = f"{sp_base}/{self.opts.path}"
+        return sp_base
+
+    @property
+    def sp_target(self):
+        """ Identifier of the remote location being published to"""
+        return f"{self.opts.tenant}|{self.opts.site}|{self.sp_base}"
 
     def publish(self):
         """ Publish to Sharepoint """
@@ -57,23 +102,29 @@ class SharepointTool:
             return 1
 
         try:
-            if not self.sharepoint_connected:
+            with self.profiler.phase("auth"):
+                authenticated = self.sharepoint.auth.connected
+            with self.profiler.phase("connect"):
+                connected = authenticated and self.sharepoint_connected
+            if not connected:
                 LOG.fatal("ERROR: Failed to connect to sharepoint...")
                 return 2
-            LOG.info("Found files to upload: \n%s",
-                     yaml.safe_dump(self.files, default_flow_style=False))
-            self._publish()
+            report = self._publish()
         except Exception as ex:
             LOG.error("Unknown Error: Failed to publish: %s", ex)
             if self.opts.debug:
                 traceback.print_exc(ex, 7)
             return 4
-        return 0
+        finally:
+            self.export_metrics()
+            self.export_profile()
+        report.log()
+        return 0 if report.ok else 3
 
     @property
     def have_files(self):
         """ Check if we have files"""
-        return bool(self.files)
+        return next(self.iter_files(), None) is not None
 
     @property
     @lru_cache()
@@ -90,10 +141,85 @@ class SharepointTool:
             tenant=self.opts.tenant,
             client_id=self.opts.client_id,
             client_secret=self.opts.secret,
-            site_name=self.opts.site
+            site_name=self.opts.site,
+            auth_cache=self.opts.auth_cache or None,
+            pool_size=max(DEFAULT_POOL_SIZE, self.jobs),
+            chunk_size=int(self.opts.chunk_size * MIB),
+            chunk_threshold=int(self.opts.chunk_threshold * MIB),
+            retry=RetryPolicy(retries=self.opts.retries),
+            metadata=self.opts.metadata,
+            base_url=self.opts.base_url or None,
+            auth_url=self.opts.auth_url or DEFAULT_AUTH_URL,
+            hooks=self.hooks
         )
         return sharepoint
 
+    @property
+    @lru_cache()
+    def hooks(self):
+        """ Request hooks of the connection (with metrics if enabled)"""
+        hooks = RequestHooks()
+        if self.metrics is not None:
+            hooks.add_collector(self.metrics)
+        return hooks
+
+    @property
+    @lru_cache()
+    def metrics(self):
+        """ Request metrics collector (None unless metrics are exported)"""
+        if not (self.opts.metrics or self.opts.metrics_prom):
+            return None
+        return RequestMetrics()
+
+    @property
+    @lru_cache()
+    def profiler(self):
+        """ Phase profiler (disabled unless profiling) """
+        return PhaseProfiler(
+            enabled=self.opts.profile,
+            profile_phase=self.opts.profile_phase
+            if self.opts.profile and self.opts.profile_output else None)
+
+    def export_profile(self):
+        """ Log phase breakdown and write cProfile stats if enabled """
+        if not self.profiler.enabled:
+            return
+        self.profiler.finish()
+        for line in self.profiler.table():
+            LOG.info("%s", line)
+        if self.opts.profile_output:
+            try:
+                self.profiler.dump_profile(self.opts.profile_output)
+                LOG.info("Wrote profile of phase '%s' to %s",
+                         self.opts.profile_phase, self.opts.profile_output)
+            except OSError as ex:
+                LOG.error("Failed to write profile to %s: %s",
+                          self.opts.profile_output, ex)
+
+    def export_metrics(self):
+        """ Write request metrics to the configured files """
+        if self.metrics is None:
+            return
+        totals = self.metrics.summary()["totals"]
+        LOG.info("Sent %d request(s): %d byte(s) up, %d byte(s) down, "
+                 "%d retried, %d throttled", totals["requests"],
+                 totals["bytes_sent"], totals["bytes_received"],
+                 totals["retries"], totals["throttled"])
+        for path, write in ((self.opts.metrics, self.metrics.write_json),
+                            (self.opts.metrics_prom,
+                             self.metrics.write_prometheus)):
+            if not path:
+                continue
+            try:
+                write(path)
+            except OSError as ex:
+                LOG.error("Failed to write metrics to %s: %s", path, ex)
+
+    @property
+    def jobs(self):
+        """ Number of parallel upload workers"""
+        return max(1, int(self.opts.jobs or 1))
+
     @property
     def sharepoint_connected(self):
         """ Check if sharepoint connection is working"""
@@ -101,33 +227,165 @@ class SharepointTool:
 
     def _publish(self):
         """ Publish files """
-        files = self.files
+        LOG.info("Local path is: '%s' Remote path is: '%s'", self.source_dir,
+                 self.sp_base)
+        report = PublishReport()
+        try:
+            self._publish_files(report)
+        finally:
+            if self.manifest is not None:
+                self.manifest.save()
+                self.hasher.close()
+        return report
+
+    def _publish_files(self, report):
+        """
+        Publish files as a pipeline, recording results in report
+
+        The scanner feeds files (in small chunks) to the planner, which
+        skips unchanged files and makes sure remote folders exist, and the
+        planner feeds upload workers. Uploads start as soon as the first
+        files are found.
+        """
         sharepoint = self.sharepoint
-        base = self.source_dir
-        sp_base = f"{self.opts.base_path}"
-        if self.opts.path:
-            sp_base = f"{sp_base}/{self.opts.path}"
-        no_files = len(files)
-        LOG.info("Processing %s file%s", no_files, "s" if no_files != 1 else "")
-        LOG.info("Local path is: '%s' Remote path is: '%s'", base, sp_base)
-        created_dir = []
-        for file in files:
+        profiler = self.profiler
+        planner = FolderPlanner(sharepoint,
+                                max(DEFAULT_PLANNER_WORKERS, self.jobs))
+        remote_files = OrderedDict()
+        pipeline = Pipeline()
+        scanned = pipeline.queue(depth=DEFAULT_QUEUE_DEPTH // SCAN_CHUNK)
+        planned = pipeline.queue(depth=self.jobs * 2)
+
+        def scan(emit):
+            files = self.iter_files()
+            while True:
+                with profiler.phase("scan"):
+                    chunk = list(itertools.islice(files, SCAN_CHUNK))
+                if not chunk:
+                    return
+                emit(chunk)
+
+        def plan(files, emit):
+            with profiler.phase("plan"):
+                targets = self._plan_uploads(files, report, remote_files,
+                                             planner)
+            with profiler.phase("folders"):
+                planner.plan({sp_folder for _, _, _, sp_folder in targets})
+            for target in targets:
+                _, rel_file, _, sp_folder = target
+                if planner.ready(sp_folder):
+                    emit(target)
+                else:
+                    report.failure(rel_file, f"Failed to create folder "
+                                             f"'{sp_folder}'")
+
+        def upload(target, _emit):
+            file, rel_file, sp_file, sp_folder = target
+            try:
+                started = time.monotonic()
+                with profiler.phase("upload"):
+                    self._upload(file, rel_file, sp_file, sp_folder)
+                profiler.upload(os.path.getsize(file),
+                                time.monotonic() - started)
+                report.success(rel_file)
+            except Exception as ex:  # pylint: disable=broad-except
+                report.failure(rel_file, ex)
+                return
+            if self.opts.checkout:
+                with profiler.phase("check_out"):
+                    sharepoint.check_out_file(sp_file, sp_folder)
+
+        @contextlib.contextmanager
+        def check_out_batch():
+            # Check-outs of uploaded files are sent as $batch requests
+            with sharepoint.batch() as batch:
+                try:
+                    yield
+                finally:
+                    with profiler.phase("check_out"):
+                        batch.flush()
+
+        pipeline.source(scan, scanned, name="sp-scan")
+        pipeline.stage(plan, scanned, planned, name="sp-plan")
+        pipeline.stage(upload, planned, workers=self.jobs, name="sp-upload",
+                       context=check_out_batch)
+        pipeline.join()
+
+    def _plan_uploads(self, files, report, remote_files, planner):
+        """
+        Get (file, rel_file, sp_file, sp_folder) of files to upload
+
+        :param files: chunk of local files
+        :param report: publish report (skipped files are recorded)
+        :param remote_files: recently listed remote folders (for sync)
+        :param planner: `FolderPlanner` of the publish (for sync)
+        """
+        targets = [self._upload_target(file) for file in files]
+        syncing = self.manifest is not None and not self.opts.force
+        if syncing:
+            # Hash files of the chunk that may have changed on all CPUs
+            self.manifest.prepare((rel_file, file)
+                                  for file, rel_file, _, _ in targets)
+        queued = []
+        for file, rel_file, sp_file, sp_folder in targets:
             LOG.debug("Working on '%s'", file)
-            rel_file = file[len(base):] if file.startswith(base) else file
-            rel_file = rel_file.strip('/')
-            rel_dir = os.path.dirname(rel_file)
-            sp_folder = f"{sp_base.rstrip('/')}/{rel_dir.lstrip('/')}"
-            sp_folder = sp_folder.strip('/')
-            sp_file = os.path.basename(rel_file)
-            if not self.opts.dry_run:
-                LOG.info("Uploading %s to SP as file '%s' in %s", rel_file,
-                         sp_file, sp_folder)
-                created_dir += sharepoint.add_folder_path(sp_folder,
-                                                          created_dir)
-                sharepoint.upload_file(file, target_file=sp_file,
-                                       folder=sp_folder,
-                                       check_out=self.opts.checkout)
-            else:
-                LOG.info("DRY RUN:: Would have uploaded file '%s' to '%s/%s' "
-                         "(with%s checkout)", file, sp_folder, sp_file,
-                         "" if self.opts.checkout else "out")
+            if syncing:
+                remote = self._remote_files(sp_folder, remote_files,
+                                            planner)
+                reason = self.manifest.changed(rel_file, file,
+                                               remote.get(sp_file))
+                if reason is None:
+                    LOG.debug("Skipping unchanged file '%s'", rel_file)
+                    report.skip(rel_file, "unchanged")
+                    continue
+                LOG.debug("File '%s' needs upload: %s", rel_file, reason)
+            if self.opts.dry_run:
+                LOG.info("DRY RUN:: Would have uploaded file '%s' to "
+                         "'%s/%s' (with%s checkout)", file, sp_folder,
+                         sp_file, "" if self.opts.checkout else "out")
+                report.skip(rel_file, "dry run")
+                continue
+            queued.append((file, rel_file, sp_file, sp_folder))
+        return queued
+
+    def _upload_target(self, file):
+        """ Get (file, rel_file, sp_file, sp_folder) of a local file """
+        base = self.source_dir
+        rel_file = file[len(base):] if file.startswith(base) else file
+        rel_file = rel_file.strip('/')
+        rel_dir = os.path.dirname(rel_file)
+        sp_folder = f"{self.sp_base.rstrip('/')}/{rel_dir.lstrip('/')}"
+        sp_folder = sp_folder.strip('/')
+        return file, rel_file, os.path.basename(rel_file), sp_folder
+
+    def _remote_files(self, sp_folder, remote_files, planner):
+        """
+        Get remote file items of a folder, keeping recent listings
+
+        Folders that do not exist yet (the planner creates them) have no
+        files and are not listed.
+        """
+        if sp_folder in remote_files:
+            remote_files.move_to_end(sp_folder)
+            return remote_files[sp_folder]
+        if not planner.exists(sp_folder):
+            return {}
+        listing = self.sharepoint.file_index(sp_folder)
+        remote_files[sp_folder] = listing
+        while len(remote_files) > REMOTE_LISTINGS:
+            remote_files.popitem(last=False)
+        return listing
+
+    def _upload(self, file, rel_file, sp_file, sp_folder):
+        """ Upload a single file (runs on upload worker) """
+        LOG.info("Uploading %s to SP as file '%s' in %s", rel_file, sp_file,
+                 sp_folder)
+        res = self.sharepoint.upload_file(file, target_file=sp_file,
+                                          folder=sp_folder, check_out=False)
+        if res is False:
+            raise Exception("Local file does not exist")
+        if res.status_code >= 400:
+            raise Exception(f"HTTP {res.status_code}")
+        if self.manifest is not None:
+            self.manifest.record(rel_file, file, res)
+        return res
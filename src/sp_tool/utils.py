@@ -0,0 +1,83 @@
+"""
+sp_tool utils
+
+Helpers shared by the library and the tool. This module is imported by
+`sp_tool/__init__.py`, so it must only import the standard library.
+"""
+import contextlib
+import fnmatch
+import importlib
+import os
+import re
+import tempfile
+
+NOTHING = re.compile(r"(?!)")
+
+
+def lazy_exports(module_name, exports):
+    """
+    Module `__getattr__` and `__dir__` importing exported names on first use
+
+    :param module_name: `__name__` of the exporting module (relative module
+                        names in `exports` are resolved against it)
+    :param exports: dict of exported name -> module defining it
+    :return: (`__getattr__`, `__dir__`) to assign in the exporting module
+    """
+    module_globals = importlib.import_module(module_name).__dict__
+
+    def __getattr__(name):
+        """ Import exported names lazily """
+        module = exports.get(name, None)
+        if module is None:
+            raise AttributeError(
+                f"module {module_name!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module, module_name), name)
+        module_globals[name] = value
+        return value
+
+    def __dir__():
+        """ Module attributes including lazy exports """
+        return sorted(set(module_globals) | set(exports))
+
+    return __getattr__, __dir__
+
+
+def compile_globs(globs):
+    """
+    Compile globs into a single regex matching any of them
+
+    Like `fnmatch.fnmatch`, names have to be passed through
+    `os.path.normcase` before matching.
+    """
+    if not globs:
+        return NOTHING
+    patterns = [fnmatch.translate(os.path.normcase(glob)) for glob in globs]
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode=None, prefix=".sp-tool-"):
+    """
+    Write a text file through a temporary file moved into place
+
+    Readers never see a half written file, and the file is left unchanged
+    if writing fails.
+
+    :param path: file to write (its directory is created if needed)
+    :param mode: permissions of the file (default: readable by owner only)
+    :param prefix: prefix of the temporary file name
+    :return: context manager yielding the UTF-8 text file to write to
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding="utf-8") as out:
+            yield out
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
@@ -0,0 +1,663 @@
+"""
+Local SharePoint stand-in server
+
+Implements the parts of the SharePoint REST API used by the connector on
+top of an in-memory document library: `client.svc` realm discovery, the ACS
+token endpoint, folder and file listings (paged, with `$select`/`$expand`,
+in every OData metadata mode), `Files/Add`, chunked uploads (with upload
+status), folder creation, check-in/out, `$value` downloads,
+`RenderListDataAsStream` and `$batch`. Latency and throttling can be
+configured to exercise retries and concurrency.
+
+    with MockSharepointServer(latency=0.01) as server:
+        sharepoint = server.connector()
+        sharepoint.upload_file("file.txt", folder="Shared Documents")
+"""
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REALM = "00000000-0000-0000-0000-00000000feed"
+APP_ID = "00000003-0000-0ff1-ce00-000000000000"
+CLIENT_ID = "mock-client"
+CLIENT_SECRET = "mock-secret"
+TENANT = "mock"
+SITE = "site"
+LIBRARY = "Shared Documents"
+TOKEN_LIFETIME = 3600
+DEFAULT_PAGE_SIZE = 5000
+
+PATH_ARG = re.compile(r"decodedurl='([^']*)'")
+GUID_ARG = re.compile(r"uploadId=guid'([^']*)'")
+OFFSET_ARG = re.compile(r"fileOffset=(\d+)")
+URL_ARG = re.compile(r"url='([^']*)'")
+STATUS_TEXT = {200: "OK", 201: "Created", 204: "No Content",
+               400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+               429: "Too Many Requests"}
+
+
+def normalize(path):
+    """ Normalized server relative path """
+    path = re.sub(r"/+", "/", f"/{path}")
+    return path.rstrip('/') or "/"
+
+
+def parent_of(path):
+    """ Parent folder of a server relative path """
+    return normalize(path.rsplit('/', 1)[0])
+
+
+def now_iso():
+    """ Current time as SharePoint formats it """
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class MockFile:
+    """ File in the mock library """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, path, content):
+        """ Initialize """
+        self.path = path
+        self.content = content
+        self.unique_id = str(uuid.uuid4())
+        self.version = 1
+        self.modified = now_iso()
+        self.checked_out = False
+
+    def item(self):
+        """ File properties """
+        return {"Name": self.path.rsplit('/', 1)[-1],
+                "ServerRelativeUrl": self.path,
+                "Length": str(len(self.content)),
+                "TimeLastModified": self.modified,
+                "ETag": f"\"{{{self.unique_id}}},{self.version}\"",
+                "UniqueId": self.unique_id,
+                "CheckOutType": 0 if self.checked_out else 2}
+
+
+class MockLibrary:
+    """ In-memory folders and files """
+
+    def __init__(self, site_uri):
+        """ Initialize with site root and default document library """
+        self.lock = threading.RLock()
+        self.folders = {normalize(site_uri), normalize(f"{site_uri}/"
+                                                       f"{LIBRARY}")}
+        self.files = {}
+        self.uploads = {}
+
+    def add_folder(self, path):
+        """ Create folder, return True if parent exists """
+        path = normalize(path)
+        with self.lock:
+            if parent_of(path) not in self.folders:
+                return False
+            self.folders.add(path)
+            return True
+
+    def put_file(self, path, content):
+        """ Create or overwrite file """
+        path = normalize(path)
+        with self.lock:
+            existing = self.files.get(path)
+            if existing is not None:
+                existing.content = content
+                existing.version += 1
+                existing.modified = now_iso()
+                return existing
+            mock_file = MockFile(path, content)
+            self.files[path] = mock_file
+            return mock_file
+
+    def children(self, path):
+        """ Get (sub-folder paths, files) of folder, sorted by name """
+        prefix = normalize(path).rstrip('/') + '/'
+        with self.lock:
+            folders = sorted(folder for folder in self.folders
+                             if folder.startswith(prefix) and
+                             '/' not in folder[len(prefix):])
+            files = [self.files[name] for name in sorted(self.files)
+                     if name.startswith(prefix) and
+                     '/' not in name[len(prefix):]]
+        return folders, files
+
+    def folder_item(self, path):
+        """ Folder properties """
+        folders, files = self.children(path)
+        return {"Name": path.rsplit('/', 1)[-1], "ServerRelativeUrl": path,
+                "ItemCount": len(folders) + len(files)}
+
+
+class MockSharepoint:
+    """ Request handling of the mock server (independent of HTTP) """
+    # Library contents, server behavior settings and request statistics
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, site=SITE, latency=0.0, throttle_rate=0.0,
+                 max_in_flight=None, retry_after=1, page_size=None,
+                 expand_limit=None, ranges=True):
+        """
+        Initialize
+
+        :param site: site name
+        :param latency: seconds added to every response
+        :param throttle_rate: share of API requests answered with 429
+        :param max_in_flight: API requests above this many in flight at
+                              once are answered with 429
+        :param retry_after: `Retry-After` (seconds) sent with 429 responses
+        :param page_size: max items per listing page (default: `$top`)
+        :param expand_limit: max items of `$expand`ed collections (the rest
+                             is silently dropped, like SharePoint does)
+        :param ranges: honor `Range` headers of downloads
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.site_uri = f"/sites/{site}" if site else "/"
+        self.library = MockLibrary(self.site_uri)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.page_size = page_size
+        self.expand_limit = expand_limit
+        self.ranges = ranges
+        self.base_url = ""
+        self.tokens = set()
+        self.stats = {"requests": 0, "throttled": 0, "tokens": 0,
+                      "discovery": 0, "batches": 0, "bytes_in": 0,
+                      "bytes_out": 0}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+
+    def count(self, stat, value=1):
+        """ Update a statistics counter """
+        with self._lock:
+            self.stats[stat] += value
+
+    def handle(self, method, target, headers, body):
+        """
+        Handle a request
+
+        :return: (status, headers dict, body bytes)
+        """
+        self.count("requests")
+        self.count("bytes_in", len(body))
+        if self.latency:
+            time.sleep(self.latency)
+        path, _, query = target.partition('?')
+        params = dict(urllib.parse.parse_qsl(query, keep_blank_values=True))
+        path = re.sub(r"/+", "/", path)
+        if path.endswith("/_vti_bin/client.svc/") or \
+                path.endswith("/_vti_bin/client.svc"):
+            return self._discovery()
+        if path.endswith("/tokens/OAuth/2"):
+            return self._token(body)
+        if "/_api/" not in path:
+            return 404, {}, b""
+        auth = headers.get("Authorization", "")
+        if auth[len("Bearer "):] not in self.tokens:
+            return self._error(401, "Invalid token")
+        if not self._admit():
+            self.count("throttled")
+            return 429, {"Retry-After": str(self.retry_after)}, b""
+        try:
+            return self._api(method, path, params, headers, body)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _admit(self):
+        """ Decide if an API request is throttled """
+        with self._lock:
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                return False
+            if self.throttle_rate and \
+                    self._random.random() < self.throttle_rate:
+                return False
+            self._in_flight += 1
+            return True
+
+    def _discovery(self):
+        """ Realm discovery challenge """
+        self.count("discovery")
+        return 401, {"WWW-Authenticate":
+                     f'Bearer realm="{REALM}",client_id="{APP_ID}",'
+                     f'trusted_issuers="{APP_ID}@*"'}, b""
+
+    def _token(self, body):
+        """ ACS client credentials token endpoint """
+        form = dict(urllib.parse.parse_qsl(body.decode("utf-8")))
+        if form.get("client_id") != f"{CLIENT_ID}@{REALM}" or \
+                form.get("client_secret") != CLIENT_SECRET:
+            return 400, {}, json.dumps({"error": "invalid_client"}).encode()
+        self.count("tokens")
+        token = f"mock-{uuid.uuid4()}"
+        self.tokens.add(token)
+        return 200, {}, json.dumps({
+            "token_type": "Bearer", "expires_in": str(TOKEN_LIFETIME),
+            "not_before": str(int(time.time())),
+            "expires_on": str(int(time.time()) + TOKEN_LIFETIME),
+            "resource": form.get("resource"), "access_token": token
+        }).encode()
+
+    def _api(self, method, path, params, headers, body):
+        """ Dispatch REST API request """
+        # pylint: disable=too-many-arguments,too-many-return-statements
+        api_path = path.split("/_api/", 1)[1]
+        verbose = "odata=verbose" in headers.get("Accept", "odata=verbose")
+        if api_path == "$batch":
+            return self._batch(headers, body)
+        if api_path == "Web/folders" and method == "POST":
+            path = json.loads(body)["ServerRelativeUrl"]
+            if not self.library.add_folder(path):
+                return self._error(404, "Parent folder does not exist")
+            return self._json(self.library.folder_item(normalize(path)),
+                              verbose, 201)
+        if api_path.startswith("Web/GetList(@list)/RenderListDataAsStream"):
+            return self._render_list(params, body)
+        match = PATH_ARG.search(api_path)
+        if match is None:
+            return self._error(404, "Unknown endpoint")
+        url = f"{self.base_url}{path}"
+        path = normalize(urllib.parse.unquote(match.group(1)))
+        action = api_path[match.end() + 1:]
+        if api_path.startswith("Web/GetFolderByServerRelativePath"):
+            return self._folder(method, (url, path), action, params, body,
+                                verbose)
+        if api_path.startswith("Web/GetFileByServerRelativePath"):
+            return self._file(method, path, action, params, headers, body,
+                              verbose)
+        return self._error(404, "Unknown endpoint")
+
+    def _folder(self, method, target, action, params, body, verbose):
+        """ Folder endpoints (`target` is (request url, folder path))"""
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        # pylint: disable=too-many-locals
+        url, path = target
+        if path not in self.library.folders:
+            return self._error(404, "File Not Found.")
+        if action.startswith("/Files/Add") and method == "POST":
+            name = urllib.parse.unquote(URL_ARG.search(action).group(1))
+            mock_file = self.library.put_file(name, body)
+            return self._json(mock_file.item(), verbose)
+        folders, files = self.library.children(path)
+        if action in ("/Files", "/Folders"):
+            items = [mock_file.item() for mock_file in files] \
+                if action == "/Files" else \
+                [self.library.folder_item(folder) for folder in folders]
+            return self._page(url, items, params, verbose)
+        item = self.library.folder_item(path)
+        expand = params.get("$expand", "")
+        select = [field for field in params.get("$select", "").split(",")
+                  if field]
+        if "Folders" in expand:
+            item["Folders"] = self._collection(
+                [self.library.folder_item(folder) for folder in folders],
+                self._fields(select, "Folders/"), verbose)
+        if "Files" in expand:
+            item["Files"] = self._collection(
+                [mock_file.item() for mock_file in files],
+                self._fields(select, "Files/"), verbose)
+        return self._json(item, verbose)
+
+    def _file(self, method, path, action, params, headers, body, verbose):
+        """ File endpoints """
+        # pylint: disable=too-many-arguments,too-many-return-statements
+        # pylint: disable=too-many-positional-arguments
+        library = self.library
+        if action.startswith(("StartUpload", "/StartUpload")) or \
+                action.startswith(("/ContinueUpload", "/FinishUpload",
+                                   "/GetUploadStatus")):
+            return self._chunk(path, action, body, verbose)
+        mock_file = library.files.get(path)
+        if mock_file is None:
+            return self._error(404, "File Not Found.")
+        if action == "/$value":
+            return self._content(mock_file, headers)
+        if action.startswith("/CheckIn") and method == "POST":
+            mock_file.checked_out = False
+            return 200, {}, b""
+        if action.startswith("/CheckOut") and method == "POST":
+            mock_file.checked_out = True
+            return 200, {}, b""
+        select = [field for field in params.get("$select", "").split(",")
+                  if field]
+        return self._json(self._select(mock_file.item(), select), verbose)
+
+    def _chunk(self, path, action, body, verbose):
+        """ Chunked upload session endpoints """
+        upload_id = GUID_ARG.search(action).group(1)
+        offset = OFFSET_ARG.search(action)
+        offset = int(offset.group(1)) if offset else 0
+        uploads = self.library.uploads
+        if action.startswith("/StartUpload"):
+            uploads[upload_id] = bytearray(body)
+            return self._json({"StartUpload": str(len(body))}, verbose)
+        data = uploads.get(upload_id)
+        if action.startswith("/GetUploadStatus"):
+            if data is None:
+                return self._error(404, "Upload session not found")
+            return self._json({"UploadId": upload_id,
+                               "ExpectedContentRange": f"{len(data)}-"},
+                              verbose)
+        if data is None or len(data) != offset:
+            return self._error(400, "Invalid upload session or offset")
+        data += body
+        if action.startswith("/ContinueUpload"):
+            return self._json({"ContinueUpload": str(len(data))}, verbose)
+        del uploads[upload_id]
+        mock_file = self.library.put_file(path, bytes(data))
+        return self._json(mock_file.item(), verbose)
+
+    def _content(self, mock_file, headers):
+        """ File contents, honoring a single Range """
+        match = re.match(r"bytes=(\d+)-(\d*)", headers.get("Range", ""))
+        if not match or not self.ranges:
+            return 200, {"Content-Type": "application/octet-stream"}, \
+                mock_file.content
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else \
+            len(mock_file.content) - 1
+        return 206, {"Content-Type": "application/octet-stream",
+                     "Content-Range": f"bytes {start}-{end}/"
+                                      f"{len(mock_file.content)}"}, \
+            mock_file.content[start:end + 1]
+
+    def _render_list(self, params, body):
+        """ Flat recursive listing (RenderListDataAsStream) """
+        parameters = json.loads(body)["parameters"]
+        root = normalize(parameters.get("FolderServerRelativeUrl") or
+                         params.get("@list", "").strip("'"))
+        row_limit = re.search(r"<RowLimit[^>]*>(\d+)</RowLimit>",
+                              parameters.get("ViewXml", ""))
+        row_limit = int(row_limit.group(1)) if row_limit else 30
+        prefix = root.rstrip('/') + '/'
+        with self.library.lock:
+            rows = [{"FileRef": folder, "FileLeafRef":
+                     folder.rsplit('/', 1)[-1], "FSObjType": "1"}
+                    for folder in sorted(self.library.folders)
+                    if folder.startswith(prefix)]
+            for name in sorted(self.library.files):
+                if name.startswith(prefix):
+                    item = self.library.files[name].item()
+                    rows.append({"FileRef": name, "FileLeafRef": item["Name"],
+                                 "FSObjType": "0",
+                                 "File_x0020_Size": item["Length"],
+                                 "Modified.": item["TimeLastModified"],
+                                 "UniqueId": f"{{{item['UniqueId']}}}",
+                                 "owshiddenversion": str(
+                                     self.library.files[name].version)})
+        start = int(params.get("p_ID", 0))
+        page = {"Row": rows[start:start + row_limit], "FirstRow": start + 1,
+                "LastRow": min(len(rows), start + row_limit)}
+        if start + row_limit < len(rows):
+            page["NextHref"] = f"?Paged=TRUE&p_ID={start + row_limit}"
+        return 200, {"Content-Type": "application/json"}, \
+            json.dumps(page).encode()
+
+    def _batch(self, headers, body):
+        """ Multipart $batch of write operations """
+        # pylint: disable=too-many-locals
+        self.count("batches")
+        text = body.decode("utf-8")
+        boundary = f"batchresponse_{uuid.uuid4()}"
+        parts = []
+        for match in re.finditer(r"^(GET|POST|PUT) (\S+) HTTP/1\.1\r?\n"
+                                 r"(.*?)\r?\n\r?\n(.*?)\r?\n--",
+                                 text, re.MULTILINE | re.DOTALL):
+            method, url, head, op_body = match.groups()
+            op_headers = dict(line.split(": ", 1)
+                              for line in head.splitlines() if ": " in line)
+            op_headers["Authorization"] = headers.get("Authorization", "")
+            target = urllib.parse.urlsplit(url)
+            status, _, res_body = self._api(
+                method, target.path,
+                dict(urllib.parse.parse_qsl(target.query)), op_headers,
+                op_body.encode("utf-8"))
+            parts += [f"--{boundary}", "Content-Type: application/http",
+                      "Content-Transfer-Encoding: binary", "",
+                      f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                      "Content-Type: application/json;charset=utf-8", "",
+                      res_body.decode("utf-8")]
+        parts += [f"--{boundary}--", ""]
+        content_type = f"multipart/mixed; boundary={boundary}"
+        return 200, {"Content-Type": content_type}, \
+            "\r\n".join(parts).encode("utf-8")
+
+    def _page(self, url, items, params, verbose):
+        """ Paged collection response ($top/$skiptoken) """
+        top = int(params.get("$top", 0) or 0) or len(items) or 1
+        if self.page_size:
+            top = min(top, self.page_size)
+        skip = int(params.get("$skiptoken", 0) or 0)
+        select = [field for field in params.get("$select", "").split(",")
+                  if field]
+        page = [self._select(item, select) for item in items[skip:skip + top]]
+        next_url = None
+        if skip + top < len(items):
+            query = {**params, "$top": top, "$skiptoken": skip + top}
+            next_url = f"{url}?{urllib.parse.urlencode(query)}"
+        if verbose:
+            data = {"d": {"results": [self._verbose(item) for item in page]}}
+            if next_url:
+                data["d"]["__next"] = next_url
+        else:
+            data = {"value": page}
+            if next_url:
+                data["odata.nextLink"] = next_url
+        return 200, {"Content-Type": "application/json"}, \
+            json.dumps(data).encode()
+
+    def _collection(self, items, select, verbose):
+        """ Expanded navigation collection """
+        items = [self._select(item, select)
+                 for item in items[:self.expand_limit]]
+        if verbose:
+            return {"results": [self._verbose(item) for item in items]}
+        return items
+
+    @staticmethod
+    def _fields(select, prefix):
+        """ Selected fields of an expanded collection """
+        return [field[len(prefix):] for field in select
+                if field.startswith(prefix)]
+
+    @staticmethod
+    def _select(item, select):
+        """ Apply $select """
+        if not select:
+            return item
+        return {field: item[field] for field in select if field in item}
+
+    @staticmethod
+    def _verbose(item):
+        """ Add verbose metadata to an item """
+        return {"__metadata": {"type": "SP.Item"}, **item}
+
+    def _json(self, item, verbose, status=200):
+        """ Single entity response """
+        data = {"d": self._verbose(item)} if verbose else item
+        return status, {"Content-Type": "application/json"}, \
+            json.dumps(data).encode()
+
+    @staticmethod
+    def _error(status, message):
+        """ Error response """
+        return status, {"Content-Type": "application/json"}, json.dumps({
+            "error": {"code": f"-1, {status}",
+                      "message": {"lang": "en-US", "value": message}}
+        }).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """ HTTP front end of `MockSharepoint` """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """ Handle GET """
+        self._respond()
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """ Handle POST """
+        self._respond()
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """ Handle PUT """
+        self._respond()
+
+    def _read_body(self):
+        """ Read request body (sized or chunked) """
+        # requests sends both headers (and a sized body) for empty files
+        if "Content-Length" not in self.headers and \
+                self.headers.get("Transfer-Encoding", "") == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if not size:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _respond(self):
+        """ Pass request to the mock and send its response """
+        body = self._read_body()
+        status, headers, content = self.server.mock.handle(
+            self.command, self.path, dict(self.headers.items()), body)
+        self.server.mock.count("bytes_out", len(content))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *_args):  # pylint: disable=arguments-differ
+        """ Keep quiet """
+
+
+class MockSharepointServer:
+    """ Mock server running on a local port in a background thread """
+
+    def __init__(self, host="127.0.0.1", port=0, **kwargs):
+        """
+        Initialize
+
+        :param host: address to listen on
+        :param port: port (0 picks a free port)
+        :param kwargs: `MockSharepoint` options (latency, throttling...)
+        """
+        self.mock = MockSharepoint(**kwargs)
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self.mock
+        self.mock.base_url = self.url
+        self._thread = None
+
+    @property
+    def url(self):
+        """ Base URL of the server """
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def auth_url(self):
+        """ Token endpoint (for `auth_url=`)"""
+        return f"{self.url}/{{realm}}/tokens/OAuth/2"
+
+    @property
+    def library(self):
+        """ In-memory library """
+        return self.mock.library
+
+    def connector_options(self):
+        """ Keyword arguments pointing a connector at this server """
+        return {"tenant": TENANT, "client_id": CLIENT_ID,
+                "client_secret": CLIENT_SECRET,
+                "site_name": self.mock.site_uri[len("/sites/"):],
+                "base_url": self.url, "auth_url": self.auth_url}
+
+    def connector(self, **kwargs):
+        """ `SharepointConnector` talking to this server """
+        # pylint: disable=import-outside-toplevel
+        from sp_tool.sharepoint.connector import SharepointConnector
+        return SharepointConnector(**{**self.connector_options(), **kwargs})
+
+    def start(self):
+        """ Start serving """
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        name="mock-sharepoint", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stop serving """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        """ Start server """
+        return self.start()
+
+    def __exit__(self, *_args):
+        """ Stop server """
+        self.stop()
+
+
+
+class MockServerMixin:
+    """
+    `unittest.TestCase` mixin running a `MockSharepointServer` per test
+
+    Provides `self.server`, a connector to it in `self.sharepoint` and a
+    local temp dir in `self.source`.
+    """
+    server_options = {}
+
+    def setUp(self):  # pylint: disable=invalid-name
+        """ Start server and create a local source dir """
+        self.server = MockSharepointServer(**self.server_options).start()
+        self.source = tempfile.mkdtemp()
+        self.sharepoint = self.server.connector(metadata="nometadata")
+
+    def tearDown(self):  # pylint: disable=invalid-name
+        """ Stop server """
+        self.sharepoint.close()
+        self.server.stop()
+        shutil.rmtree(self.source, ignore_errors=True)
+
+    def remote(self, path):
+        """ Server relative path of a library path """
+        return f"{self.server.mock.site_uri}/{path}"
+
+    def write(self, name, content):
+        """ Create local file """
+        path = os.path.join(self.source, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as out:
+            out.write(content)
+        return path
+
+
+if __name__ == '__main__':
+    SERVER = MockSharepointServer(port=8080).start()
+    print(f"Mock SharePoint listening on {SERVER.url} "
+          f"(client id '{CLIENT_ID}', secret '{CLIENT_SECRET}')")
+    try:
+        SERVER._thread.join()  # pylint: disable=protected-access
+    except KeyboardInterrupt:
+        SERVER.stop()
@@ -0,0 +1,104 @@
+"""
+Integration Tests of the asyncio connector against the mock SharePoint server
+"""
+import asyncio
+import unittest
+
+from tests.mock_sharepoint import MockServerMixin, LIBRARY
+
+from sp_tool.sharepoint.async_connector import AsyncSharepointConnector
+from sp_tool.sharepoint.retry import RetryPolicy
+
+
+class AsyncConnectorTests(MockServerMixin, unittest.TestCase):
+    """ sp_tool.sharepoint.async_connector against tests.mock_sharepoint"""
+
+    server_options = {"retry_after": 0}
+
+    def run_connector(self, func, **kwargs):
+        """ Run `func(connector)` on a new event loop """
+        async def run():
+            async with AsyncSharepointConnector(
+                    **self.server.connector_options(),
+                    metadata="nometadata", **kwargs) as sharepoint:
+                return await func(sharepoint)
+        return asyncio.run(run())
+
+    def test_add_folder_path(self):
+        """ Missing folders of a path are created, known ones skipped """
+        async def add(sharepoint):
+            return await sharepoint.add_folder_path(
+                f"{LIBRARY}/a/b/", known_folders=[LIBRARY])
+
+        self.assertEqual(self.run_connector(add),
+                         [f"{LIBRARY}/a", f"{LIBRARY}/a/b"])
+        self.assertIn(self.remote(f"{LIBRARY}/a/b"),
+                      self.server.library.folders)
+
+    def test_upload_and_list(self):
+        """ Uploads, listings and downloads round trip """
+        folder = f"{LIBRARY}/a"
+        self.server.library.add_folder(self.remote(folder))
+        self.server.library.add_folder(self.remote(f"{folder}/sub"))
+        paths = [self.write(f"f{index}.txt", b"x" * index)
+                 for index in range(3)]
+
+        async def upload(sharepoint):
+            results = await asyncio.gather(*(
+                sharepoint.upload_file(path, folder=folder) for path in paths))
+            return ([res.status_code for res in results],
+                    await sharepoint.list_files(folder),
+                    await sharepoint.list_folder_contents(folder),
+                    await sharepoint.file_exists("f1.txt", folder),
+                    await sharepoint.get_file("f2.txt", folder))
+
+        statuses, files, contents, exists, content = self.run_connector(
+            upload)
+        self.assertEqual(statuses, [200, 200, 200])
+        self.assertEqual(files, ["f0.txt", "f1.txt", "f2.txt"])
+        self.assertEqual(contents, ["f0.txt", "f1.txt", "f2.txt", "sub/"])
+        self.assertTrue(exists)
+        self.assertEqual(content, b"xx")
+        self.assertTrue(self.server.library.files[
+            self.remote(f"{folder}/f0.txt")].checked_out)
+
+    def test_paging(self):
+        """ Listings follow next links """
+        self.server.mock.page_size = 2
+        for index in range(5):
+            self.server.library.put_file(self.remote(f"{LIBRARY}/f{index}"),
+                                         b"")
+
+        async def files(sharepoint):
+            return await sharepoint.list_files(LIBRARY)
+
+        self.assertEqual(len(self.run_connector(files)), 5)
+
+    def test_throttling(self):
+        """ Throttled requests are retried after Retry-After """
+        self.server.mock.throttle_rate = 0.5
+        paths = [self.write(name, b"a") for name in ("a", "b", "c")]
+
+        async def upload(sharepoint):
+            results = await asyncio.gather(*(
+                sharepoint.upload_file(path, folder=LIBRARY, check_out=False)
+                for path in paths))
+            return [res.status_code for res in results]
+
+        self.assertEqual(self.run_connector(upload, retry=RetryPolicy(
+            retries=10, backoff=0)), [200, 200, 200])
+        self.assertGreater(self.server.mock.stats["throttled"], 0)
+
+    def test_token_refresh(self):
+        """ Rejected tokens are refreshed once """
+        async def files(sharepoint):
+            await sharepoint.list_files(LIBRARY)
+            self.server.mock.tokens.clear()
+            return await sharepoint.list_folders(LIBRARY)
+
+        self.assertEqual(self.run_connector(files), [])
+        self.assertEqual(self.server.mock.stats["tokens"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
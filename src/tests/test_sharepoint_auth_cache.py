@@ -0,0 +1,59 @@
+"""
+Unit Tests for auth cache
+"""
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+
+from sp_tool.sharepoint import auth_cache
+
+HOST = "tenant.sharepoint.com"
+CLIENT_ID = "client"
+
+
+class AuthCacheTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.sharepoint.auth_cache"""
+
+    def setUp(self):
+        """ Setup """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "sub", "auth.json")
+        self.cache = auth_cache.AuthCache(self.path)
+
+    def tearDown(self):
+        """ Cleanup """
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_realm(self):
+        """ realm data round trips and is private to owner """
+        self.assertIsNone(self.cache.realm(HOST, CLIENT_ID))
+        self.cache.update(HOST, CLIENT_ID, bearer_realm="realm",
+                          app_id="app")
+        self.assertEqual(self.cache.realm(HOST, CLIENT_ID), ("realm", "app"))
+        self.assertIsNone(self.cache.realm(HOST, "other"))
+        mode = stat.S_IMODE(os.stat(self.path).st_mode)
+        self.assertEqual(mode, 0o600)
+
+    def test_token_expiry(self):
+        """ expired tokens are not returned """
+        token = {"access_token": "abc",
+                 "expires_on": str(int(time.time()) + 100)}
+        self.cache.update(HOST, CLIENT_ID, token=token)
+        self.assertEqual(self.cache.token(HOST, CLIENT_ID), token)
+        self.assertIsNone(self.cache.token(HOST, CLIENT_ID, margin=300))
+
+    def test_remove(self):
+        """ entries can be removed """
+        self.cache.update(HOST, CLIENT_ID, bearer_realm="realm",
+                          app_id="app")
+        self.cache.remove(HOST, CLIENT_ID, "app_id")
+        self.assertIsNone(self.cache.realm(HOST, CLIENT_ID))
+        self.cache.remove(HOST, CLIENT_ID)
+        self.assertEqual(self.cache.get(HOST, CLIENT_ID), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
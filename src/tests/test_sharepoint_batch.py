@@ -0,0 +1,64 @@
+"""
+Unit Tests for $batch support
+"""
+import unittest
+
+from sp_tool.sharepoint import batch
+
+RESPONSE = (
+    "--batchresponse_1\r\n"
+    "Content-Type: application/http\r\n"
+    "Content-Transfer-Encoding: binary\r\n"
+    "\r\n"
+    "HTTP/1.1 201 Created\r\n"
+    "CONTENT-TYPE: application/json;odata=verbose;charset=utf-8\r\n"
+    "\r\n"
+    "{\"d\":{\"Name\":\"a\"}}\r\n"
+    "--batchresponse_1\r\n"
+    "Content-Type: application/http\r\n"
+    "Content-Transfer-Encoding: binary\r\n"
+    "\r\n"
+    "HTTP/1.1 403 Forbidden\r\n"
+    "CONTENT-TYPE: application/json;odata=verbose;charset=utf-8\r\n"
+    "\r\n"
+    "{\"error\":{}}\r\n"
+    "--batchresponse_1--\r\n"
+)
+
+
+class BatchTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.sharepoint.batch"""
+
+    def test_encode(self):
+        """ batch.encode_batch() puts each operation in a changeset """
+        operations = [
+            batch.BatchOperation("POST", "https://host/_api/a", "{}",
+                                 "application/json;odata=verbose"),
+            batch.BatchOperation("POST", "https://host/_api/b")
+        ]
+        body = batch.encode_batch(operations, "batch_x", "application/json")
+        self.assertEqual(body.count("Content-Type: multipart/mixed"), 2)
+        self.assertIn("POST https://host/_api/a HTTP/1.1\r\n", body)
+        self.assertIn("POST https://host/_api/b HTTP/1.1\r\n", body)
+        self.assertTrue(body.endswith("--batch_x--\r\n"))
+
+    def test_decode(self):
+        """ batch.decode_batch() returns responses in order """
+        responses = batch.decode_batch(RESPONSE)
+        self.assertEqual([res[0] for res in responses], [201, 403])
+        self.assertEqual(responses[0][2], "{\"d\":{\"Name\":\"a\"}}")
+        self.assertIn("CONTENT-TYPE", responses[1][1])
+
+    def test_operation_callbacks(self):
+        """ operations run callbacks when resolved """
+        operation = batch.BatchOperation("POST", "url")
+        seen = []
+        operation.on_done(seen.append)
+        self.assertFalse(operation.done)
+        operation.resolve(204, {}, "")
+        self.assertTrue(operation.ok)
+        self.assertEqual(seen, [operation])
+
+
+if __name__ == '__main__':
+    unittest.main()
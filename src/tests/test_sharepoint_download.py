@@ -0,0 +1,98 @@
+"""
+Integration Tests of file downloads against the mock SharePoint server
+"""
+import os
+import unittest
+
+from tests.mock_sharepoint import MockServerMixin, LIBRARY
+
+from sp_tool.sharepoint.exceptions import APICallFailedSharepointException
+
+CONTENT = bytes(range(256)) * 4 + b"tail"
+
+
+class DownloadTests(MockServerMixin, unittest.TestCase):
+    """ get_file, iter_file_chunks and download_file"""
+
+    def setUp(self):
+        """ Start server with one file, record Range headers """
+        super().setUp()
+        self.server.library.put_file(self.remote(f"{LIBRARY}/file.bin"),
+                                     CONTENT)
+        self.ranges = []
+        self.sharepoint.hooks.add(before=lambda event: self.ranges.append(
+            event.request.headers.get("Range")))
+
+    def read(self, path):
+        """ Read local file """
+        with open(path, "rb") as data:
+            return data.read()
+
+    def test_get_file(self):
+        """ get_file() returns bytes, or False on error """
+        self.assertEqual(self.sharepoint.get_file("file.bin", LIBRARY),
+                         CONTENT)
+        self.assertIs(self.sharepoint.get_file("missing", LIBRARY), False)
+
+    def test_iter_file_chunks(self):
+        """ iter_file_chunks() yields chunk_size chunks of a range """
+        chunks = list(self.sharepoint.iter_file_chunks(
+            "file.bin", LIBRARY, chunk_size=100))
+        self.assertEqual(b"".join(chunks), CONTENT)
+        self.assertEqual([len(chunk) for chunk in chunks],
+                         [100] * 10 + [len(CONTENT) - 1000])
+        chunks = list(self.sharepoint.iter_file_chunks(
+            "file.bin", LIBRARY, chunk_size=4, start=10, end=19))
+        self.assertEqual(chunks, [CONTENT[10:14], CONTENT[14:18],
+                                  CONTENT[18:20]])
+        self.assertEqual(b"".join(self.sharepoint.iter_file_chunks(
+            "file.bin", LIBRARY, start=1024)), b"tail")
+        self.assertEqual(self.ranges[-2:], ["bytes=10-19", "bytes=1024-"])
+
+    def test_iter_file_chunks_no_ranges(self):
+        """ iter_file_chunks() fails if the server ignores Range """
+        self.server.mock.ranges = False
+        with self.assertRaises(APICallFailedSharepointException) as ctx:
+            list(self.sharepoint.iter_file_chunks("file.bin", LIBRARY,
+                                                  start=10))
+        self.assertEqual(ctx.exception.code, 200)
+
+    def test_download_file(self):
+        """ download_file() streams to dest without a Range request """
+        path = self.sharepoint.download_file("file.bin", LIBRARY, self.source)
+        self.assertEqual(path, os.path.join(self.source, "file.bin"))
+        self.assertEqual(self.read(path), CONTENT)
+        self.assertEqual(os.listdir(self.source), ["file.bin"])
+        self.assertEqual([value for value in self.ranges if value], [])
+
+    def test_download_file_parallel(self):
+        """ download_file() fetches large files as parallel ranges """
+        dest = os.path.join(self.source, "copy.bin")
+        self.sharepoint.download_file("file.bin", LIBRARY, dest, parallel=3,
+                                      part_size=300)
+        self.assertEqual(self.read(dest), CONTENT)
+        self.assertEqual(sorted(value for value in self.ranges if value),
+                         ["bytes=0-299", "bytes=300-599", "bytes=600-899",
+                          "bytes=900-1027"])
+        self.assertEqual(os.listdir(self.source), ["copy.bin"])
+
+    def test_download_file_no_ranges(self):
+        """ download_file() falls back to one stream without Range support """
+        self.server.mock.ranges = False
+        dest = os.path.join(self.source, "copy.bin")
+        self.sharepoint.download_file("file.bin", LIBRARY, dest, parallel=3,
+                                      part_size=300)
+        self.assertEqual(self.read(dest), CONTENT)
+        self.assertEqual(os.listdir(self.source), ["copy.bin"])
+
+    def test_download_file_error(self):
+        """ download_file() removes the partial file on error """
+        for parallel in (1, 3):
+            with self.assertRaises(APICallFailedSharepointException):
+                self.sharepoint.download_file("missing", LIBRARY, self.source,
+                                              parallel=parallel)
+        self.assertEqual(os.listdir(self.source), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
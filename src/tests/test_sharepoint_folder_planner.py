@@ -0,0 +1,91 @@
+"""
+Unit Tests for folder planner
+"""
+import contextlib
+import unittest
+
+from sp_tool.sharepoint.batch import BatchOperation
+from sp_tool.sharepoint.folder_planner import FolderPlanner, folder_prefixes
+
+
+class FakeConnector:
+    """ Connector keeping folders in a set """
+
+    def __init__(self, folders, denied=()):
+        """ Initialize """
+        self.folders = set(folders)
+        self.denied = set(denied)
+        self.listed = []
+        self.posted = []
+
+    def _cached_names(self, folder, _item_type):
+        """ List sub-folder names """
+        self.listed.append(folder)
+        prefix = f"{folder}/" if folder else ""
+        return {path[len(prefix):] for path in self.folders
+                if path.startswith(prefix) and '/' not in path[len(prefix):]}
+
+    @contextlib.contextmanager
+    def batch(self):
+        """ No batching """
+        yield
+
+    def add_folder(self, folder):
+        """ Create folder """
+        self.posted.append(folder)
+        operation = BatchOperation("POST", folder)
+        if folder in self.denied:
+            operation.resolve(403, {}, "")
+        elif folder.rpartition('/')[0] not in self.folders | {""}:
+            operation.resolve(404, {}, "")
+        else:
+            self.folders.add(folder)
+            operation.resolve(201, {}, "")
+        return operation
+
+
+class FolderPlannerTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.sharepoint.folder_planner"""
+
+    def test_folder_prefixes(self):
+        """ folder_prefixes() """
+        self.assertEqual(folder_prefixes("/a/b/c/"), ["a", "a/b", "a/b/c"])
+        self.assertEqual(folder_prefixes(""), [])
+
+    def test_plan_creates_missing_once(self):
+        """ FolderPlanner.plan() only posts missing folders """
+        connector = FakeConnector({"Docs", "Docs/a"})
+        planner = FolderPlanner(connector, workers=2)
+        created = planner.plan(["Docs/a/b/c", "Docs/a/b", "Docs/a/x",
+                                "Docs/y/z"])
+        self.assertEqual(created, {"Docs/a/b", "Docs/a/b/c", "Docs/a/x",
+                                   "Docs/y", "Docs/y/z"})
+        self.assertEqual(sorted(connector.posted), sorted(created))
+        # Parents created by the planner are not listed
+        self.assertEqual(sorted(connector.listed), ["", "Docs", "Docs/a"])
+        self.assertTrue(planner.ensure("Docs/a/b/c"))
+        self.assertEqual(len(connector.posted), len(created))
+
+    def test_plan_skips_existing_and_failed(self):
+        """ FolderPlanner.plan() handles existing and failing folders """
+        connector = FakeConnector({"Docs", "Docs/ro"}, denied={"Docs/ro",
+                                                              "Docs/no"})
+        planner = FolderPlanner(connector)
+        planner.plan(["Docs/ro/a", "Docs/no/a"])
+        self.assertNotIn("Docs/ro", connector.posted)
+        self.assertTrue(planner.ready("Docs/ro/a"))
+        self.assertTrue(planner.ready("Docs/no"))
+        self.assertIn("Docs/no/a", planner.failed)
+
+    def test_exists(self):
+        """ FolderPlanner.exists() never lists a missing folder """
+        connector = FakeConnector({"Docs", "Docs/a"})
+        planner = FolderPlanner(connector)
+        self.assertTrue(planner.exists("Docs/a"))
+        self.assertFalse(planner.exists("Docs/b/c"))
+        self.assertEqual(connector.listed, ["", "Docs", "Docs"])
+        self.assertTrue(planner.ready("Docs/a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Unit Tests for compact listing items
+"""
+import unittest
+
+from sp_tool.sharepoint.items import ItemIndex, SPFile, SPFolder
+
+VERBOSE = {"__metadata": {"type": "SP.File"}, "Name": "b.txt",
+           "ServerRelativeUrl": "/sites/s/Docs/b.txt", "Length": "12",
+           "TimeLastModified": "2021-10-25T00:00:00Z", "ETag": "\"{1},2\"",
+           "CheckOutType": 2, "Author": {"__deferred": {}}}
+
+
+class SharepointItemsTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.sharepoint.items"""
+
+    def test_file_from_dict(self):
+        """ SPFile.from_dict() keeps only used fields """
+        item = SPFile.from_dict({"d": VERBOSE})
+        self.assertEqual(item, SPFile.from_dict(VERBOSE))
+        self.assertEqual((item.name, item.length), ("b.txt", 12))
+        self.assertFalse(item.checked_out)
+        self.assertEqual(item.get("ETag"), "\"{1},2\"")
+        self.assertIsNone(item.get("Author"))
+        self.assertFalse(hasattr(item, "__dict__"))
+
+    def test_folder_from_dict(self):
+        """ SPFolder.from_dict() with missing fields """
+        item = SPFolder.from_dict({"Name": "a"})
+        self.assertEqual(item.name, "a")
+        self.assertIsNone(item.item_count)
+        self.assertEqual(SPFolder.fields(),
+                         ("Name", "ServerRelativeUrl", "ItemCount"))
+
+    def test_init(self):
+        """ Items built directly have every field set """
+        item = SPFile("c.txt", length="3")
+        self.assertEqual(item.length, 3)
+        self.assertIsNone(item.checked_out)
+        self.assertIsNone(item.get("ETag"))
+        self.assertEqual(item, SPFile.from_dict({"Name": "c.txt",
+                                                 "Length": 3}))
+        self.assertIsNone(SPFolder("a").item_count)
+
+    def test_index(self):
+        """ ItemIndex looks items up by name """
+        index = ItemIndex(SPFolder.from_dict({"Name": name})
+                          for name in ("b", "a"))
+        self.assertIn("a", index)
+        self.assertNotIn("c", index)
+        self.assertEqual(index["b"].name, "b")
+        self.assertEqual(index.names(), ["a", "b"])
+        self.assertEqual(index.names(sort=False), ["b", "a"])
+        index.discard("a")
+        self.assertEqual(len(index), 1)
+        self.assertIsNone(index.get("a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
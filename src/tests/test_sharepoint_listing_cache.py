@@ -0,0 +1,73 @@
+"""
+Unit Tests for listing cache
+"""
+import unittest
+
+from sp_tool.sharepoint import listing_cache
+
+
+class FakeClock:
+    """ Settable clock """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, now=0.0):
+        """ Initialize"""
+        self.now = now
+
+    def __call__(self):
+        """ Current time"""
+        return self.now
+
+
+class ListingCacheTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.sharepoint.listing_cache"""
+
+    def setUp(self):
+        """ Setup """
+        self.clock = FakeClock()
+        self.cache = listing_cache.ListingCache(ttl=10, max_folders=2,
+                                                clock=self.clock)
+
+    def test_ttl(self):
+        """ listings expire after ttl """
+        self.cache.put("a/", "File", ["x"])
+        self.assertEqual(self.cache.get("a", "File"), {"x"})
+        self.clock.now = 11
+        self.assertIsNone(self.cache.get("a", "File"))
+
+    def test_lru(self):
+        """ least recently used listing is evicted """
+        self.cache.put("a", "File", [])
+        self.cache.put("b", "File", [])
+        self.cache.get("a", "File")
+        self.cache.put("c", "File", [])
+        self.assertIsNone(self.cache.get("b", "File"))
+        self.assertIsNotNone(self.cache.get("a", "File"))
+
+    def test_write_through(self):
+        """ add() only updates listings that are cached """
+        self.cache.add("a", "File", "x")
+        self.assertIsNone(self.cache.get("a", "File"))
+        self.cache.put("a", "File", [])
+        self.cache.add("a", "File", "x")
+        self.assertEqual(self.cache.get("a", "File"), {"x"})
+
+    def test_invalidate(self):
+        """ invalidate() drops folder or everything """
+        self.cache.put("a", "File", [])
+        self.cache.put("a", "Folder", [])
+        self.cache.invalidate("a")
+        self.assertIsNone(self.cache.get("a", "Folder"))
+        self.cache.put("b", "File", [])
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.get("b", "File"))
+
+    def test_disabled(self):
+        """ ttl of 0 disables caching """
+        cache = listing_cache.ListingCache(ttl=0)
+        cache.put("a", "File", ["x"])
+        self.assertIsNone(cache.get("a", "File"))
+
+
+if __name__ == '__main__':
+    unittest.main()
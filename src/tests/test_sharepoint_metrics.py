@@ -0,0 +1,168 @@
+"""
+Unit Tests for request hooks and metrics
+"""
+import json
+import os
+import tempfile
+import unittest
+
+from sp_tool.sharepoint.hooks import RequestHooks
+from sp_tool.sharepoint import metrics
+
+API = "https://t.sharepoint.com/sites/s/_api/Web"
+
+
+class FakeRequest:
+    """ Prepared request stand-in """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, method, url, body=None, headers=None):
+        """ Initialize """
+        self.method = method
+        self.url = url
+        self.body = body
+        self.headers = headers or {}
+
+
+class FakeResponse:
+    """ Response stand-in """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, status_code, content=b"", headers=None):
+        """ Initialize """
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class FakeSession:
+    """ Session stand-in answering every request with `response` """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, response=None, error=None):
+        """ Initialize """
+        self.response = response
+        self.error = error
+
+    def send(self, _request, **_kwargs):
+        """ Send request """
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class HooksTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.sharepoint.hooks"""
+
+    def test_hooks(self):
+        """ Hooks see requests before and after they are sent """
+        calls = []
+        hooks = RequestHooks()
+        hooks.add(before=lambda event: calls.append(("before", event.url)),
+                  after=lambda event: calls.append(
+                      ("after", event.status_code, event.elapsed >= 0)))
+        session = hooks.install(FakeSession(FakeResponse(200)))
+        self.assertIs(hooks.install(session), session)
+        with self.assertRaises(Exception):
+            RequestHooks().install(session)
+        session.send(FakeRequest("GET", f"{API}/a"))
+        self.assertEqual(calls, [("before", f"{API}/a"),
+                                 ("after", 200, True)])
+
+    def test_error(self):
+        """ Post-request hooks also run when sending fails """
+        events = []
+        hooks = RequestHooks()
+        hooks.add(after=events.append)
+        session = hooks.install(FakeSession(error=ConnectionError("down")))
+        with self.assertRaises(ConnectionError):
+            session.send(FakeRequest("GET", f"{API}/a"))
+        self.assertIsInstance(events[0].error, ConnectionError)
+        self.assertIsNone(events[0].status_code)
+
+
+class MetricsTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.sharepoint.metrics"""
+
+    def setUp(self):
+        """ Session with metrics """
+        self.metrics = metrics.RequestMetrics()
+        self.hooks = RequestHooks()
+        self.hooks.add_collector(self.metrics)
+
+    def send(self, method, url, status, body=None, content=b""):
+        """ Send a fake request through hooks """
+        session = FakeSession(FakeResponse(status, content))
+        self.hooks.install(session)
+        session.send(FakeRequest(method, url, body))
+
+    def test_endpoint_kind(self):
+        """ metrics.endpoint_kind() classifies request urls """
+        folder = f"{API}/GetFolderByServerRelativePath(decodedurl='/a')"
+        file = f"{API}/GetFileByServerRelativePath(decodedurl='/a/b')"
+        for url, kind in (
+                ("https://h/_vti_bin/client.svc/", "discovery"),
+                ("https://a/realm/tokens/OAuth/2", "token"),
+                ("https://t/sites/s/_api/$batch", "batch"),
+                (f"{folder}/Files/Add(url='%2Fa%2Fb',overwrite=true)",
+                 "upload"),
+                (f"{file}/StartUpload(uploadId=guid'1')", "upload_chunk"),
+                (f"{file}/$value", "download"),
+                (f"{file}/CheckIn(comment='',checkintype=0)", "check_in"),
+                (f"{file}/CheckOut()", "check_out"),
+                (f"{API}/folders", "add_folder"),
+                (f"{folder}/Files", "listing"),
+                (f"{API}/GetList(@list)/RenderListDataAsStream", "listing"),
+                (file, "file_info"),
+                ("https://t/other", "other")):
+            self.assertEqual(metrics.endpoint_kind(url), kind, url)
+
+    def test_histogram(self):
+        """ LatencyHistogram counts observations cumulatively """
+        histogram = metrics.LatencyHistogram((0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.cumulative(),
+                         [(0.1, 1), (1.0, 3), (float("inf"), 4)])
+        self.assertEqual(histogram.quantile(0.5), 1.0)
+        self.assertEqual(histogram.quantile(1.0), 3.0)
+
+    def test_summary(self):
+        """ Requests, bytes, throttling and retries are counted by kind """
+        upload = f"{API}/GetFolderByServerRelativePath(decodedurl='/a')" \
+                 f"/Files/Add(url='b',overwrite=true)"
+        self.send("POST", upload, 429, b"1234")
+        self.hooks.retried(upload, 429, 1.0)
+        self.send("POST", upload, 200, b"1234", b"{}")
+        summary = self.metrics.summary()
+        self.assertEqual(summary["kinds"]["upload"]["by_status"],
+                         {"429": 1, "200": 1})
+        self.assertEqual(summary["totals"]["bytes_sent"], 8)
+        self.assertEqual(summary["totals"]["bytes_received"], 2)
+        self.assertEqual(summary["totals"]["throttled"], 1)
+        self.assertEqual(summary["totals"]["retries"], 1)
+        self.assertEqual(summary["kinds"]["upload"]["latency"]["count"], 2)
+
+    def test_export(self):
+        """ Metrics are written as JSON and Prometheus text """
+        self.send("GET", f"{API}/GetFileByServerRelativePath"
+                         f"(decodedurl='/a')/$value", 200, None, b"abc")
+        text = self.metrics.to_prometheus()
+        self.assertIn('sp_tool_requests_total{kind="download",method="GET",'
+                      'status="200"} 1', text)
+        self.assertIn('sp_tool_response_bytes_total{kind="download"} 3',
+                      text)
+        self.assertIn('sp_tool_request_duration_seconds_bucket'
+                      '{kind="download",le="+Inf"} 1', text)
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "metrics.json")
+        self.metrics.write_json(path)
+        with open(path, encoding="utf-8") as data:
+            self.assertEqual(json.load(data)["totals"]["requests"], 1)
+        self.metrics.write_prometheus(os.path.join(directory, "sp.prom"))
+        self.assertEqual(sorted(os.listdir(directory)),
+                         ["metrics.json", "sp.prom"])
+
+
+if __name__ == '__main__':
+    unittest.main()
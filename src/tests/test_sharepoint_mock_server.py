@@ -0,0 +1,314 @@
+"""
+Integration Tests of the connector against the mock SharePoint server
+"""
+import json
+import threading
+import time
+import unittest
+
+import requests
+
+from tests.mock_sharepoint import MockServerMixin, LIBRARY
+
+from sp_tool.sharepoint.exceptions import \
+    ChunkedUploadFailedSharepointException
+from sp_tool.tool.logging import LOG
+from sp_tool.tool.sp_tool import SharepointTool
+
+
+class MockServerTests(MockServerMixin, unittest.TestCase):
+    """ Connector and tool against tests.mock_sharepoint"""
+    # pylint: disable=too-many-public-methods
+
+    def test_connect(self):
+        """ Realm discovery and token request go to the mock server """
+        self.assertTrue(self.sharepoint.connected)
+        self.assertEqual(self.server.mock.stats["discovery"], 1)
+        self.assertEqual(self.server.mock.stats["tokens"], 1)
+
+    def test_upload_and_list(self):
+        """ Folders, uploads, listings and downloads round trip """
+        folder = f"{LIBRARY}/a/b"
+        self.sharepoint.add_folder_path(folder)
+        for index in range(3):
+            self.sharepoint.upload_file(
+                self.write(f"f{index}.txt", b"x" * index), folder=folder)
+        self.assertEqual(self.sharepoint.list_folders(f"{LIBRARY}/a"),
+                         ["b/"])
+        self.sharepoint.invalidate()
+        self.assertEqual(self.sharepoint.list_files(folder),
+                         ["f0.txt", "f1.txt", "f2.txt"])
+        self.assertEqual(self.sharepoint.file_index(folder)["f2.txt"].length,
+                         2)
+        self.assertTrue(self.sharepoint.file_index(folder)[
+            "f1.txt"].checked_out)
+        self.assertEqual(self.sharepoint.get_file("f2.txt", folder), b"xx")
+        self.assertEqual(
+            [item["Path"] for item in self.sharepoint.iter_library(LIBRARY)],
+            [f"{folder}/f0.txt", f"{folder}/f1.txt", f"{folder}/f2.txt"])
+
+    def test_paging(self):
+        """ Listings follow next links """
+        self.server.mock.page_size = 2
+        folder = self.remote(LIBRARY)
+        for index in range(5):
+            self.server.library.put_file(f"{folder}/f{index}", b"")
+        for metadata in ("verbose", "nometadata"):
+            sharepoint = self.server.connector(metadata=metadata)
+            self.assertEqual(len(list(sharepoint.iter_items(LIBRARY))), 5)
+            sharepoint.close()
+
+    def test_truncated_expand(self):
+        """ Truncated expanded listings are paged separately """
+        self.server.mock.page_size = 2
+        self.server.mock.expand_limit = 3
+        self.sharepoint.expand_limit = 3
+        folder = self.remote(f"{LIBRARY}/big")
+        self.server.library.add_folder(folder)
+        self.server.library.add_folder(f"{folder}/sub")
+        for index in range(7):
+            self.server.library.put_file(f"{folder}/f{index}", b"")
+        folders, files = self.sharepoint.folder_listing(f"{LIBRARY}/big")
+        self.assertEqual([item["Name"] for item in folders], ["sub"])
+        self.assertEqual(sorted(item["Name"] for item in files),
+                         [f"f{index}" for index in range(7)])
+        self.sharepoint.invalidate()
+        self.assertTrue(self.sharepoint.file_exists("f6", f"{LIBRARY}/big"))
+
+    def make_tree(self, *paths):
+        """ Create remote folders and files (paths ending in / are folders)"""
+        for path in paths:
+            remote = self.remote(f"{LIBRARY}/{path}".rstrip('/'))
+            if path.endswith('/'):
+                self.server.library.add_folder(remote)
+            else:
+                self.server.library.put_file(remote, b"")
+
+    def test_walk(self):
+        """ walk() honors max depth and name globs """
+        self.make_tree("a/", "a/b/", "a/b/c/", "a/tmp/", "a/x.txt", "a/y.md",
+                       "a/skip.txt", "a/b/z.txt", "a/b/c/deep.txt")
+        walked = {path: (sorted(folders), sorted(files))
+                  for path, folders, files in self.sharepoint.walk(
+                      f"{LIBRARY}/a", include=["*.txt"], exclude=["skip*"],
+                      exclude_dirs=["tmp"])}
+        self.assertEqual(walked, {
+            f"{LIBRARY}/a": (["b"], ["x.txt"]),
+            f"{LIBRARY}/a/b": (["c"], ["z.txt"]),
+            f"{LIBRARY}/a/b/c": ([], ["deep.txt"])})
+        walked = [path for path, _, _ in self.sharepoint.walk(
+            f"{LIBRARY}/a", max_depth=1, include_dirs=["b", "tmp"])]
+        self.assertEqual(sorted(walked), [f"{LIBRARY}/a", f"{LIBRARY}/a/b",
+                                          f"{LIBRARY}/a/tmp"])
+
+    def test_walk_prune(self):
+        """ Removing names from the yielded folders prunes the walk """
+        self.make_tree("a/", "a/b/", "a/b/c/", "a/d/", "a/d/e/")
+        walked = []
+        for path, folders, _ in self.sharepoint.walk(f"{LIBRARY}/a"):
+            walked.append(path)
+            if "b" in folders:
+                folders.remove("b")
+        self.assertEqual(sorted(walked), [f"{LIBRARY}/a", f"{LIBRARY}/a/d",
+                                          f"{LIBRARY}/a/d/e"])
+
+    def test_walk_close(self):
+        """ Closing walk() early cancels listings not started yet """
+        self.make_tree("a/", *(f"a/{index}/" for index in range(20)))
+        folder_listing = self.sharepoint.folder_listing
+        started = []
+        release = threading.Event()
+
+        def blocking_listing(path, *args):
+            started.append(path)
+            if len(started) > 2:
+                release.wait(5)
+            return folder_listing(path, *args)
+
+        self.sharepoint.folder_listing = blocking_listing
+        walk = self.sharepoint.walk(f"{LIBRARY}/a", workers=2)
+        next(walk)
+        next(walk)
+        walk.close()
+        release.set()
+        time.sleep(0.2)
+        # Root, the yielded folder and at most two running listings
+        self.assertLessEqual(len(started), 4)
+
+    def test_chunked_upload(self):
+        """ Upload sessions assemble the file """
+        self.sharepoint.chunk_size = 3
+        self.sharepoint.chunk_threshold = 3
+        self.sharepoint.upload_file(self.write("big", b"0123456789"),
+                                    folder=LIBRARY, check_out=False)
+        self.assertEqual(
+            self.server.library.files[self.remote(f"{LIBRARY}/big")].content,
+            b"0123456789")
+
+    def test_chunked_upload_lost_response(self):
+        """ Chunks committed before a failure are not sent again """
+        lost = []
+
+        def lose_response(event):
+            if "ContinueUpload" in event.url and not lost:
+                lost.append(event.url)
+                raise requests.ConnectionError("connection reset")
+
+        self.sharepoint.retry.backoff = 0
+        self.sharepoint.hooks.add(after=lose_response)
+        self.sharepoint.upload_file_chunked(self.write("big", b"0123456789"),
+                                            folder=LIBRARY, chunk_size=3)
+        self.assertEqual(len(lost), 1)
+        self.assertEqual(
+            self.server.library.files[self.remote(f"{LIBRARY}/big")].content,
+            b"0123456789")
+
+    def test_chunked_upload_resume(self):
+        """ Failed chunked uploads resume at the committed offset """
+        def fail(event):
+            if "ContinueUpload" in event.url:
+                raise requests.ConnectionError("connection refused")
+
+        self.sharepoint.retry.retries = 1
+        self.sharepoint.retry.backoff = 0
+        self.sharepoint.hooks.add(before=fail)
+        path = self.write("big", b"0123456789")
+        with self.assertRaises(ChunkedUploadFailedSharepointException) as ctx:
+            self.sharepoint.upload_file_chunked(path, folder=LIBRARY,
+                                                chunk_size=3)
+        self.assertEqual(ctx.exception.offset, 3)
+        self.assertEqual(list(self.server.library.uploads),
+                         [ctx.exception.upload_id])
+        self.sharepoint.hooks.before.remove(fail)
+        self.sharepoint.upload_file_chunked(path, folder=LIBRARY,
+                                            chunk_size=3)
+        self.assertEqual(
+            self.server.library.files[self.remote(f"{LIBRARY}/big")].content,
+            b"0123456789")
+        self.assertEqual(self.server.library.uploads, {})
+
+    def test_chunked_upload_restart(self):
+        """ Uploads whose session is gone start over """
+        def fail(event):
+            if "FinishUpload" in event.url:
+                raise requests.ConnectionError("connection refused")
+
+        self.sharepoint.retry.retries = 0
+        self.sharepoint.hooks.add(before=fail)
+        path = self.write("big", b"0123456789")
+        with self.assertRaises(ChunkedUploadFailedSharepointException) as ctx:
+            self.sharepoint.upload_file_chunked(path, folder=LIBRARY,
+                                                chunk_size=4)
+        self.assertEqual(ctx.exception.offset, 8)
+        self.server.library.uploads.clear()
+        self.sharepoint.hooks.before.remove(fail)
+        self.sharepoint.upload_file_chunked(path, folder=LIBRARY,
+                                            chunk_size=4)
+        self.assertEqual(
+            self.server.library.files[self.remote(f"{LIBRARY}/big")].content,
+            b"0123456789")
+
+    def test_throttling(self):
+        """ Throttled requests are retried after Retry-After """
+        self.server.mock.retry_after = 0
+        self.server.mock.throttle_rate = 0.5
+        for name in ("a", "b", "c"):
+            self.sharepoint.upload_file(self.write(name, b"a"),
+                                        folder=LIBRARY, check_out=False)
+        self.assertGreater(self.server.mock.stats["throttled"], 0)
+        self.assertEqual(self.sharepoint.list_files(LIBRARY),
+                         ["a", "b", "c"])
+
+    def test_timeout_retry(self):
+        """ Timed out requests are retried """
+        timeouts = []
+
+        def time_out(event):
+            if "/_api/" in event.url and not timeouts:
+                timeouts.append(event.url)
+                raise requests.ReadTimeout("timed out")
+
+        self.sharepoint.retry.backoff = 0
+        self.sharepoint.hooks.add(before=time_out)
+        self.assertEqual(self.sharepoint.list_folders(LIBRARY), [])
+        self.assertEqual(len(timeouts), 1)
+
+    def test_token_refresh(self):
+        """ Rejected tokens are refreshed, streamed bodies are not resent """
+        folder = json.dumps({"ServerRelativeUrl": self.remote(
+            f"{LIBRARY}/a")}).encode("utf-8")
+        url = f"{self.sharepoint.url.web}/folders"
+        self.assertTrue(self.sharepoint.connected)
+        self.server.mock.tokens.clear()
+        res = self.sharepoint.api_call("post", url, data=iter([folder]))
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(self.server.mock.stats["tokens"], 1)
+        res = self.sharepoint.api_call("post", url, data=folder)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(self.server.mock.stats["tokens"], 2)
+
+    def test_publish(self):
+        """ sp-tool publish uploads the source tree """
+        for name in ("a.txt", "sub/b.txt", "sub/deeper/c.txt"):
+            self.write(name, name.encode())
+        options = self.server.connector_options()
+        tool = SharepointTool(
+            tenant=options["tenant"], client_id=options["client_id"],
+            secret=options["client_secret"], site=options["site_name"],
+            base_url=options["base_url"], auth_url=options["auth_url"],
+            source_dir=self.source, path="docs", jobs=2, hash_cache="",
+            debug=False)
+        self.assertEqual(tool.publish(), 0)
+        self.assertEqual(
+            self.server.library.files[
+                self.remote(f"{LIBRARY}/docs/sub/deeper/c.txt")].content,
+            b"sub/deeper/c.txt")
+
+    def test_publish_sync_new_folders(self):
+        """ A first sync does not list folders before they are created """
+        for name in ("a.txt", "sub/b.txt", "sub/deeper/c.txt"):
+            self.write(name, name.encode())
+        options = self.server.connector_options()
+        tool = SharepointTool(
+            tenant=options["tenant"], client_id=options["client_id"],
+            secret=options["client_secret"], site=options["site_name"],
+            base_url=options["base_url"], auth_url=options["auth_url"],
+            source_dir=self.source, path="docs", sync=True, hash_cache="",
+            debug=False)
+        statuses = []
+        tool.sharepoint.hooks.add(
+            after=lambda event: statuses.append(event.status_code))
+        self.assertEqual(tool.publish(), 0)
+        self.assertNotIn(404, statuses)
+        self.assertIn(self.remote(f"{LIBRARY}/docs/sub/deeper/c.txt"),
+                      self.server.library.files)
+
+    def test_publish_failure(self):
+        """ sp-tool publish exits with 3 if uploads failed """
+        for name in ("a.txt", "b.txt"):
+            self.write(name, name.encode())
+        options = self.server.connector_options()
+        tool = SharepointTool(
+            tenant=options["tenant"], client_id=options["client_id"],
+            secret=options["client_secret"], site=options["site_name"],
+            base_url=options["base_url"], auth_url=options["auth_url"],
+            source_dir=self.source, path="docs", jobs=2, retries=0,
+            hash_cache="", debug=False)
+
+        def fail(event):
+            if "b.txt" in event.url and "/Files/Add" in event.url:
+                raise requests.ConnectionError("connection refused")
+
+        tool.sharepoint.hooks.add(before=fail)
+        with self.assertLogs(LOG, "ERROR") as logs:
+            self.assertEqual(tool.publish(), 3)
+        self.assertIn(self.remote(f"{LIBRARY}/docs/a.txt"),
+                      self.server.library.files)
+        self.assertNotIn(self.remote(f"{LIBRARY}/docs/b.txt"),
+                         self.server.library.files)
+        self.assertTrue(any("FAILED: b.txt" in line
+                            for line in logs.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Unit Tests for retry policy and adaptive limiter
+"""
+import io
+import threading
+import unittest
+from types import SimpleNamespace
+
+from sp_tool.sharepoint.retry import AdaptiveLimiter, Attempts, RetryPolicy, \
+    retry_after
+
+
+def response(status_code, **headers):
+    """ Fake response """
+    return SimpleNamespace(status_code=status_code, headers=headers)
+
+
+class SharepointRetryTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.sharepoint.retry"""
+
+    def test_retry_after(self):
+        """ retry_after() """
+        self.assertEqual(retry_after({"Retry-After": "7"}), 7.0)
+        self.assertIsNone(retry_after({}))
+        self.assertIsNone(retry_after({"Retry-After": "soon"}))
+        self.assertEqual(retry_after(
+            {"Retry-After": "Thu, 01 Jan 1970 00:01:00 GMT"}, now=30), 30.0)
+
+    def test_policy(self):
+        """ RetryPolicy.should_retry() and delay() """
+        policy = RetryPolicy(retries=2, backoff=1, max_backoff=3,
+                             jitter=lambda low, high: high)
+        self.assertTrue(policy.should_retry(0, 429))
+        self.assertTrue(policy.should_retry(1, None))
+        self.assertFalse(policy.should_retry(2, 503))
+        self.assertFalse(policy.should_retry(0, 404))
+        self.assertEqual([policy.delay(n) for n in range(4)], [1, 2, 3, 3])
+        self.assertEqual(policy.delay(0, {"Retry-After": "10"}), 10.0)
+
+    def test_attempts(self):
+        """ Attempts.next_delay() refreshes once, retries, then gives up """
+        policy = RetryPolicy(retries=2, jitter=lambda low, high: high)
+        limiter = AdaptiveLimiter(4, interval=0)
+        body = io.BytesIO(b"data")
+        body.seek(1)
+        attempts = Attempts(policy, limiter, body)
+        body.read()
+        self.assertEqual(attempts.next_delay(response(401)), Attempts.REFRESH)
+        self.assertEqual(body.tell(), 1)
+        self.assertIsNone(attempts.next_delay(response(401)))
+        self.assertEqual(attempts.next_delay(response(429, **{
+            "Retry-After": "3"})), 3.0)
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(attempts.next_delay(
+            error=ConnectionError("refused")), 2.0)
+        with self.assertRaises(ConnectionError):
+            attempts.next_delay(error=ConnectionError("refused"))
+        self.assertIsNone(attempts.next_delay(response(503)))
+
+    def test_attempts_stream(self):
+        """ Attempts never resend streamed bodies """
+        attempts = Attempts(RetryPolicy(), AdaptiveLimiter(),
+                            iter([b"data"]))
+        self.assertIsNone(attempts.next_delay(response(401)))
+        self.assertIsNone(attempts.next_delay(response(503)))
+        with self.assertRaises(ConnectionError):
+            attempts.next_delay(error=ConnectionError("refused"))
+
+    def test_limiter_aimd(self):
+        """ AdaptiveLimiter lowers and raises limit """
+        now = [0.0]
+        limiter = AdaptiveLimiter(8, clock=lambda: now[0])
+        limiter.throttled()
+        limiter.throttled()
+        self.assertEqual(limiter.limit, 4)
+        now[0] = 5.0
+        limiter.throttled()
+        self.assertEqual(limiter.limit, 2)
+        for _ in range(5):
+            limiter.succeeded()
+        self.assertEqual(int(limiter.limit), 3)
+
+    def test_limiter_blocks(self):
+        """ AdaptiveLimiter bounds requests in flight """
+        limiter = AdaptiveLimiter(1)
+        limiter.acquire()
+        acquired = threading.Event()
+
+        def worker():
+            with limiter:
+                acquired.set()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        limiter.release()
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""
+Unit Tests for session
+"""
+import unittest
+
+from sp_tool.sharepoint import session
+from sp_tool.sharepoint.connector import SharepointConnector
+
+
+class SharepointSessionTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.sharepoint.session"""
+
+    def test_pool_size(self):
+        """ session.create_session() sizes the connection pool """
+        sess = session.create_session(pool_size=32)
+        adapter = sess.get_adapter("https://tenant.sharepoint.com/")
+        self.assertEqual(adapter.poolmanager.connection_pool_kw["maxsize"],
+                         32)
+
+    def test_no_keep_alive(self):
+        """ session.create_session(keep_alive=False) closes connections """
+        sess = session.create_session(keep_alive=False)
+        self.assertEqual(sess.headers.get("Connection"), "close")
+
+    def test_default_timeout(self):
+        """ session.create_session() sets a default request timeout """
+        sess = session.create_session(timeout=(1, 2))
+        adapter = sess.get_adapter("https://tenant.sharepoint.com/")
+        self.assertEqual(adapter.timeout, (1, 2))
+        connector = SharepointConnector("tenant", "id", "secret",
+                                        timeout=(3, 4))
+        self.assertEqual(connector.auth.timeout, (3, 4))
+        self.assertEqual(connector.session.get_adapter(
+            "https://tenant.sharepoint.com/").timeout, (3, 4))
+
+    def test_shared_session(self):
+        """ connector and auth share a passed in session """
+        sess = session.create_session()
+        connector = SharepointConnector("tenant", "id", "secret",
+                                        session=sess)
+        self.assertIs(connector.session, sess)
+        self.assertIs(connector.auth.session, sess)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Unit Tests for token manager
+"""
+import threading
+import time
+import unittest
+
+from sp_tool.sharepoint import token
+
+
+class FakeClock:
+    """ Settable clock """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, now=1000.0):
+        """ Initialize"""
+        self.now = now
+
+    def __call__(self):
+        """ Current time"""
+        return self.now
+
+
+class TokenManagerTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.sharepoint.token"""
+
+    def setUp(self):
+        """ Setup """
+        self.clock = FakeClock()
+        self.calls = 0
+
+    def fetch(self):
+        """ Fake token request """
+        self.calls += 1
+        return {"access_token": f"token{self.calls}", "expires_in": "3600"}
+
+    def test_token_expiry(self):
+        """ token.token_expiry() """
+        self.assertEqual(token.token_expiry({"expires_on": "2000"}, 10),
+                         2000)
+        self.assertEqual(token.token_expiry({"expires_in": "60"}, 10), 70)
+        self.assertEqual(token.token_expiry({}, 10),
+                         10 + token.DEFAULT_TOKEN_LIFETIME)
+
+    def test_cached_until_near_expiry(self):
+        """ token is reused until refresh margin is reached """
+        manager = token.TokenManager(self.fetch, refresh_margin=300,
+                                     clock=self.clock)
+        self.assertEqual(manager.get()["access_token"], "token1")
+        self.clock.now += 3000
+        self.assertEqual(manager.get()["access_token"], "token1")
+        self.clock.now += 301
+        self.assertEqual(manager.get()["access_token"], "token2")
+
+    def test_forced_refresh_of_stale_token(self):
+        """ forced refresh is skipped if the stale token was replaced """
+        manager = token.TokenManager(self.fetch, clock=self.clock)
+        manager.get()
+        manager.get(force=True, stale="token1")
+        manager.get(force=True, stale="token1")
+        self.assertEqual(self.calls, 2)
+
+    def test_failed_response_not_cached(self):
+        """ responses without access token are not reused """
+        manager = token.TokenManager(lambda: {"error": "nope"},
+                                     clock=self.clock)
+        manager.get()
+        self.assertFalse(manager.valid)
+
+    def test_single_flight(self):
+        """ concurrent callers trigger a single refresh """
+        def slow_fetch():
+            time.sleep(0.05)
+            return self.fetch()
+        manager = token.TokenManager(slow_fetch)
+        threads = [threading.Thread(target=manager.get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
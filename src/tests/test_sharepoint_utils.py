@@ -28,6 +28,51 @@ class SharepointUtilsTests(unittest.TestCase):
             actual = utils.urlencode(source)
             self.assertEqual(actual, expected)
 
+    def test_next_link(self):
+        """ utils.next_link() """
+        self.assertEqual(utils.next_link({"d": {"results": [],
+                                                "__next": "url"}}), "url")
+        self.assertIsNone(utils.next_link({"d": {"results": []}}))
+        self.assertEqual(utils.next_link({"value": [],
+                                          "odata.nextLink": "url"}), "url")
+        self.assertEqual(utils.next_link({"@odata.nextLink": "url"}), "url")
+
+    def test_unwrap_results(self):
+        """ utils.unwrap_results() for every metadata mode """
+        items = [{"Name": "a"}]
+        self.assertEqual(utils.unwrap_results({"d": {"results": items}}),
+                         items)
+        self.assertEqual(utils.unwrap_results({"value": items}), items)
+        self.assertEqual(utils.unwrap_results(items), items)
+        self.assertEqual(utils.unwrap_results({}), {})
+
+    def test_from_json(self):
+        """ utils.from_json() accepts text and bytes """
+        self.assertEqual(utils.from_json('{"a": [1]}'), {"a": [1]})
+        self.assertEqual(utils.from_json(b'{"a": [1]}'), {"a": [1]})
+
+    def test_strings_from_list(self):
+        """ utils.strings_from_list() """
+        items = iter([{"Name": "b"}, {"Name": "a"}, {"Other": "c"}])
+        self.assertEqual(utils.strings_from_list(items, suffix="/"),
+                         ["a/", "b/"])
+
+    def test_list_row_item(self):
+        """ utils.list_row_item() """
+        item = utils.list_row_item({
+            "FileRef": "/sites/s/Shared Documents/a/b.txt",
+            "FileLeafRef": "b.txt", "FSObjType": "0",
+            "File_x0020_Size": "12", "Modified.": "2020-01-01T00:00:00Z",
+            "UniqueId": "{AB}", "owshiddenversion": "3"}, "/sites/s")
+        self.assertEqual(item["Path"], "Shared Documents/a/b.txt")
+        self.assertEqual(item["Length"], "12")
+        self.assertEqual(item["ETag"], '"{AB},3"')
+        self.assertFalse(item["Folder"])
+        folder = utils.list_row_item({"FileRef": "/sites/s/Docs/a",
+                                      "FSObjType": 1}, "/sites/s")
+        self.assertEqual((folder["Name"], folder["Folder"]), ("a", True))
+        self.assertIsNone(folder["Length"])
+
 
 if __name__ == '__main__':
     unittest.main()
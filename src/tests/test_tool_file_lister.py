@@ -0,0 +1,70 @@
+"""
+Unit Tests for file lister
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from sp_tool.tool.file_lister import compile_globs, iter_files, list_files
+from sp_tool.tool.logging import LOG
+
+TREE = ["index.html", "a.tmp", "css/site.css", "css/old/x.css",
+        ".git/config", "node_modules/pkg/index.js", "docs/readme.txt"]
+
+
+class FileListerTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.tool.file_lister"""
+
+    def setUp(self):
+        """ Setup """
+        self.dir = tempfile.mkdtemp()
+        for file in TREE:
+            path = os.path.join(self.dir, file)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding="utf-8"):
+                pass
+
+    def tearDown(self):
+        """ Cleanup """
+        shutil.rmtree(self.dir)
+
+    def relative(self, files):
+        """ Strip source dir from file list """
+        return sorted(file[len(self.dir) + 1:] for file in files)
+
+    def test_compile_globs(self):
+        """ compile_globs() """
+        regex = compile_globs(["*.css", "a?"])
+        self.assertTrue(regex.match("site.css"))
+        self.assertTrue(regex.match("ab"))
+        self.assertFalse(regex.match("abc"))
+        self.assertFalse(compile_globs([]).match("anything"))
+
+    def test_list_files(self):
+        """ list_files() with excludes and recursion """
+        self.assertEqual(self.relative(list_files(self.dir)),
+                         ["a.tmp", "index.html"])
+        files = list_files(self.dir, True, exclude=["*.tmp"],
+                           exclude_dirs=[".git", "node_modules", "old"])
+        self.assertEqual(self.relative(files),
+                         ["css/site.css", "docs/readme.txt", "index.html"])
+
+    def test_include_dirs(self):
+        """ iter_files() only descends into included dirs """
+        files = iter_files(self.dir + '/', True, include=["*.css", "*.txt"],
+                           include_dirs=["css", "old"])
+        self.assertEqual(self.relative(files),
+                         ["css/old/x.css", "css/site.css"])
+
+    def test_iter_files_logs_scan(self):
+        """ iter_files() logs the scanned directory and filters """
+        with self.assertLogs(LOG, "INFO") as logs:
+            next(iter_files(self.dir + '/', exclude=["*.tmp"]))
+        self.assertEqual(logs.output, [
+            f"INFO:{LOG.name}:Scanning '{self.dir}'.Includes: '*'. "
+            f"Excludes: '*.tmp' Include Dirs: '*'. Exclude Dirs: "])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Unit Tests for content hashing
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from sp_tool.tool import hashing
+
+
+class HashingTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.tool.hashing"""
+
+    def setUp(self):
+        """ Setup """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.files = []
+        for index in range(3):
+            path = os.path.join(self.tmp_dir, f"file{index}.txt")
+            with open(path, "wb") as data:
+                data.write(b"x" * (index * 1000))
+            self.files.append(path)
+        self.cache = os.path.join(self.tmp_dir, "cache", "hashes.json")
+
+    def tearDown(self):
+        """ Cleanup """
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_hash_file_mmap(self):
+        """ hash_file() gives the same digest with and without mmap """
+        expected = hashlib.sha256(b"x" * 2000).hexdigest()
+        self.assertEqual(hashing.hash_file(self.files[2]), expected)
+        with mock.patch.object(hashing, "MMAP_THRESHOLD", 1):
+            self.assertEqual(hashing.hash_file(self.files[2]), expected)
+
+    def test_hash_many_parallel(self):
+        """ Hasher.hash_many() hashes on worker processes """
+        with hashing.Hasher(self.cache, workers=2) as hasher:
+            digests = hasher.hash_many(self.files + ["missing"])
+        self.assertEqual(sorted(digests), sorted(self.files))
+        self.assertEqual(digests[self.files[1]],
+                         hashlib.sha256(b"x" * 1000).hexdigest())
+
+    def test_pool_context(self):
+        """ Hashing workers are not forked from the threaded parent """
+        self.assertIn(hashing.pool_context().get_start_method(),
+                      ("forkserver", "spawn"))
+
+    def test_cache_skips_unchanged(self):
+        """ cached digests are used until the file changes """
+        with hashing.Hasher(self.cache, workers=1) as hasher:
+            digest = hasher.hash(self.files[1])
+        with mock.patch.object(hashing, "hash_file") as hash_file:
+            hasher = hashing.Hasher(self.cache, workers=1)
+            self.assertEqual(hasher.hash(self.files[1]), digest)
+            hash_file.assert_not_called()
+            stat = os.stat(self.files[1])
+            os.utime(self.files[1], ns=(stat.st_atime_ns,
+                                        stat.st_mtime_ns + 10**9))
+            hasher.hash(self.files[1])
+            hash_file.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Unit Tests for publish manifest
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from sp_tool.tool import manifest
+
+REMOTE = {"Name": "file.txt", "Length": "5", "ETag": "\"{1},1\"",
+          "TimeLastModified": "2021-10-25T00:00:00Z"}
+
+
+class ManifestTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.tool.manifest"""
+
+    def setUp(self):
+        """ Setup """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.tmp_dir, "file.txt")
+        with open(self.file, "w", encoding="utf-8") as data:
+            data.write("hello")
+        self.path = os.path.join(self.tmp_dir, "manifest.json")
+        self.response = SimpleNamespace(text=json.dumps({"d": REMOTE}))
+
+    def tearDown(self):
+        """ Cleanup """
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_unchanged_after_record(self):
+        """ recorded files are unchanged until local or remote changes """
+        mfst = manifest.Manifest(self.path, "target")
+        self.assertEqual(mfst.changed("file.txt", self.file, REMOTE), "new")
+        mfst.record("file.txt", self.file, self.response)
+        mfst.save()
+
+        mfst = manifest.Manifest(self.path, "target")
+        self.assertIsNone(mfst.changed("file.txt", self.file, REMOTE))
+        self.assertEqual(mfst.changed("file.txt", self.file, None),
+                         "missing on server")
+        self.assertEqual(mfst.changed("file.txt", self.file,
+                                      {**REMOTE, "ETag": "\"{1},2\""}),
+                         "changed on server")
+
+    def test_mtime_only_change(self):
+        """ touching a file does not make it changed """
+        mfst = manifest.Manifest(self.path, "target")
+        mfst.record("file.txt", self.file, self.response)
+        stat = os.stat(self.file)
+        os.utime(self.file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(mfst.changed("file.txt", self.file, REMOTE))
+        with open(self.file, "w", encoding="utf-8") as data:
+            data.write("HELLO")
+        self.assertEqual(mfst.changed("file.txt", self.file, REMOTE),
+                         "content changed")
+
+    def test_read_only(self):
+        """ a read only (dry run) manifest is never written """
+        mfst = manifest.Manifest(self.path, "target")
+        files = []
+        for index in range(3):
+            path = os.path.join(self.tmp_dir, f"file{index}.txt")
+            with open(path, "w", encoding="utf-8") as data:
+                data.write("hello")
+            mfst.record(f"file{index}.txt", path, self.response)
+            files.append(path)
+        mfst.save()
+        with open(self.path, "rb") as data:
+            saved = data.read()
+
+        mfst = manifest.Manifest(self.path, "target", flush_every=2,
+                                 read_only=True)
+        for index, path in enumerate(files):
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertIsNone(mfst.changed(f"file{index}.txt", path, REMOTE))
+        mfst.save()
+        with open(self.path, "rb") as data:
+            self.assertEqual(data.read(), saved)
+
+    def test_other_target_ignored(self):
+        """ manifest for a different target is ignored """
+        mfst = manifest.Manifest(self.path, "target")
+        mfst.record("file.txt", self.file, self.response)
+        mfst.save()
+        mfst = manifest.Manifest(self.path, "other")
+        self.assertEqual(mfst.changed("file.txt", self.file, REMOTE), "new")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Unit Tests for staged pipeline
+"""
+import threading
+import unittest
+
+from sp_tool.tool.pipeline import Pipeline
+
+
+class PipelineTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.tool.pipeline"""
+
+    def test_items_flow_through_stages(self):
+        """ every item passes all stages """
+        pipeline = Pipeline(depth=2)
+        doubled = pipeline.queue()
+        results = []
+        lock = threading.Lock()
+
+        def produce(emit):
+            for item in range(100):
+                emit(item)
+
+        def collect(item, _emit):
+            with lock:
+                results.append(item)
+
+        numbers = pipeline.queue()
+        pipeline.source(produce, numbers)
+        pipeline.stage(lambda item, emit: emit(item * 2), numbers, doubled)
+        pipeline.stage(collect, doubled, workers=4)
+        pipeline.join()
+        self.assertEqual(sorted(results), [item * 2 for item in range(100)])
+
+    def test_error_stops_pipeline(self):
+        """ an error in a stage is re-raised by join() """
+        pipeline = Pipeline(depth=1)
+        items = pipeline.queue()
+        seen = []
+
+        def produce(emit):
+            for item in range(1000):
+                emit(item)
+
+        def fail(item, _emit):
+            seen.append(item)
+            if item == 3:
+                raise ValueError("boom")
+
+        pipeline.source(produce, items)
+        pipeline.stage(fail, items)
+        with self.assertRaises(ValueError):
+            pipeline.join()
+        self.assertEqual(seen, [0, 1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Unit Tests for publish phase profiling
+"""
+import os
+import pstats
+import tempfile
+import unittest
+
+from sp_tool.tool.profiler import PhaseProfiler, MIB
+
+
+class FakeClock:
+    """ Clock advanced by hand """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        """ Initialize """
+        self.now = 0.0
+
+    def __call__(self):
+        """ Current time """
+        return self.now
+
+
+class ProfilerTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.tool.profiler"""
+
+    def setUp(self):
+        """ Profiler with fake clocks """
+        self.clock = FakeClock()
+        self.cpu = FakeClock()
+        self.profiler = PhaseProfiler(clock=self.clock, cpu_clock=self.cpu)
+
+    def section(self, name, wall, cpu):
+        """ Run a phase section taking `wall` and `cpu` seconds """
+        with self.profiler.phase(name):
+            self.clock.now += wall
+            self.cpu.now += cpu
+
+    def test_phases(self):
+        """ Wall, CPU and span are added up per phase """
+        self.section("upload", 2.0, 0.5)
+        self.section("scan", 1.0, 1.0)
+        self.section("upload", 3.0, 0.25)
+        self.profiler.finish()
+        summary = self.profiler.summary()
+        self.assertEqual(list(summary["phases"]), ["scan", "upload"])
+        self.assertEqual(summary["phases"]["upload"],
+                         {"calls": 2, "wall": 5.0, "cpu": 0.75, "span": 6.0})
+        self.assertEqual(summary["total"], 6.0)
+        self.assertTrue(self.profiler.table()[1].startswith("scan"))
+
+    def test_uploads(self):
+        """ Upload times are bucketed by file size """
+        self.profiler.upload(1000, 0.5)
+        self.profiler.upload(2000, 1.5)
+        self.profiler.upload(20 * MIB, 2.0)
+        uploads = self.profiler.summary()["uploads"]
+        self.assertEqual(uploads["< 64KiB"]["files"], 2)
+        self.assertEqual(uploads["< 64KiB"]["mean"], 1.0)
+        self.assertEqual(uploads["< 64KiB"]["max"], 1.5)
+        self.assertEqual(uploads["10-100MiB"]["mib_per_second"], 10.0)
+
+    def test_disabled(self):
+        """ A disabled profiler records nothing """
+        profiler = PhaseProfiler(enabled=False)
+        with profiler.phase("upload"):
+            pass
+        profiler.upload(1, 1.0)
+        self.assertEqual(profiler.summary()["phases"], {})
+        self.assertEqual(profiler.summary()["uploads"], {})
+
+    def test_cprofile(self):
+        """ The profiled phase is dumped in pstats format """
+        profiler = PhaseProfiler(profile_phase="upload")
+        with profiler.phase("upload"):
+            sorted(range(1000))
+        path = os.path.join(tempfile.mkdtemp(), "upload.prof")
+        profiler.dump_profile(path)
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+        with self.assertRaises(Exception):
+            PhaseProfiler().dump_profile(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Unit Tests for the publish report
+"""
+import threading
+import unittest
+
+from sp_tool.tool.logging import LOG
+from sp_tool.tool.report import PublishReport
+
+
+class PublishReportTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.tool.report"""
+
+    def test_results(self):
+        """ PublishReport counts successes, failures and skips """
+        report = PublishReport()
+        self.assertTrue(report.ok)
+        self.assertEqual(report.total, 0)
+        report.success("a.txt")
+        report.skip("b.txt", "unchanged")
+        self.assertTrue(report.ok)
+        report.failure("c.txt", Exception("HTTP 500"))
+        self.assertFalse(report.ok)
+        self.assertEqual(report.total, 3)
+        self.assertEqual(report.succeeded, ["a.txt"])
+        self.assertEqual(report.skipped, [("b.txt", "unchanged")])
+        self.assertEqual(report.failed, [("c.txt", "HTTP 500")])
+
+    def test_threads(self):
+        """ PublishReport can be updated from many threads """
+        report = PublishReport()
+
+        def record(index):
+            for file in range(100):
+                report.success(f"{index}/{file}")
+
+        threads = [threading.Thread(target=record, args=(index,))
+                   for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(report.total, 800)
+
+    def test_log(self):
+        """ PublishReport.log() logs failures and a summary """
+        report = PublishReport()
+        report.success("a.txt")
+        report.failure("d.txt", "second")
+        report.failure("c.txt", "first")
+        with self.assertLogs(LOG, "INFO") as logs:
+            report.log()
+        self.assertEqual(logs.output, [
+            f"ERROR:{LOG.name}:FAILED: c.txt: first",
+            f"ERROR:{LOG.name}:FAILED: d.txt: second",
+            f"INFO:{LOG.name}:Published 3 file(s): 1 uploaded, 0 skipped, "
+            f"2 failed"])
+
+
+if __name__ == '__main__':
+    unittest.main()
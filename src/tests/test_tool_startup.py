@@ -0,0 +1,89 @@
+"""
+Startup Tests for the sp-tool CLI
+
+Runs `sp-tool` commands under `python -X importtime` and checks that the
+connector stack is not imported by commands that do not need it.
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("requests", "urllib3", "yaml", "aiohttp", "orjson",
+                 "sp_tool.sharepoint.connector", "sp_tool.tool.sp_tool")
+CONNECTOR_MODULES = ("requests", "urllib3", "aiohttp",
+                     "sp_tool.sharepoint.connector", "sp_tool.tool.sp_tool")
+
+
+def import_times(*args):
+    """
+    Run the CLI with arguments under `-X importtime`
+
+    :return: (exit code, {module: cumulative microseconds})
+    """
+    env = {**os.environ, "PYTHONPATH": SRC_DIR}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import sys; from sp_tool.tool.main import main; "
+         "sys.argv[0] = 'sp-tool'; main()", *args],
+        env=env, capture_output=True, text=True, check=False)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative)
+    return proc.returncode, times
+
+
+class StartupTests(unittest.TestCase):
+    """ Import cost of sp_tool.tool.main"""
+
+    def assert_light(self, *args, modules=HEAVY_MODULES):
+        """ Run CLI and check none of `modules` was imported """
+        code, times = import_times(*args)
+        self.assertEqual(code, 0)
+        self.assertIn("sp_tool.tool.main", times)
+        heavy = sorted(module for module in times
+                       if module.split(".")[0] in modules or
+                       module in modules)
+        self.assertEqual(heavy, [])
+        return times
+
+    def test_help(self):
+        """ sp-tool --help only imports the CLI """
+        self.assert_light("--help")
+
+    def test_publish_help(self):
+        """ sp-tool publish --help does not load the connector """
+        self.assert_light("--tenant", "t", "publish", "--help")
+
+    def test_register_help(self):
+        """ sp-tool register --help does not load the connector """
+        self.assert_light("--tenant", "t", "register", "--help")
+
+    def test_config(self):
+        """ sp-tool config only loads YAML output, not the connector """
+        times = self.assert_light("--tenant", "t", "config",
+                                  modules=CONNECTOR_MODULES)
+        self.assertIn("yaml", times)
+
+    def test_lazy_exports(self):
+        """ Package exports resolve to the defining modules """
+        code = ("import sys, sp_tool, sp_tool.sharepoint as sharepoint; "
+                "assert 'requests' not in sys.modules; "
+                "from sp_tool.sharepoint.connector import "
+                "SharepointConnector; "
+                "assert sp_tool.SharepointConnector is SharepointConnector; "
+                "assert sharepoint.SharepointConnector is SharepointConnector;"
+                " assert 'RequestHooks' in dir(sharepoint)")
+        proc = subprocess.run([sys.executable, "-c", code],
+                              env={**os.environ, "PYTHONPATH": SRC_DIR},
+                              capture_output=True, text=True, check=False)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Unit Tests for sp_tool utils
+"""
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from sp_tool import utils
+
+
+class UtilsTests(unittest.TestCase):
+    """ Unit Tests for sp_tool.utils"""
+
+    def setUp(self):
+        """ Create a temp dir """
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """ Remove temp dir """
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def read(self, path):
+        """ Read text file """
+        with open(path, encoding="utf-8") as data:
+            return data.read()
+
+    def test_atomic_write(self):
+        """ utils.atomic_write() replaces the file, creating its dir """
+        path = os.path.join(self.tmp, "sub", "file.json")
+        with utils.atomic_write(path) as out:
+            out.write("first")
+        with utils.atomic_write(path, mode=0o644) as out:
+            out.write("sëcond")
+        self.assertEqual(self.read(path), "sëcond")
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["file.json"])
+
+    def test_atomic_write_error(self):
+        """ utils.atomic_write() keeps the old file if writing fails """
+        path = os.path.join(self.tmp, "file.json")
+        with utils.atomic_write(path) as out:
+            out.write("old")
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        with self.assertRaises(ValueError):
+            with utils.atomic_write(path) as out:
+                out.write("new")
+                raise ValueError("failed")
+        self.assertEqual(self.read(path), "old")
+        self.assertEqual(os.listdir(self.tmp), ["file.json"])
+
+
+if __name__ == '__main__':
+    unittest.main()